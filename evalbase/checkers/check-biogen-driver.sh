@@ -0,0 +1,16 @@
+#!/bin/bash
+# Validate a TREC BioGen run.  start-me.sh starts the validator service,
+# which keeps the spaCy model and PMID list loaded; if it isn't running, the
+# validator loads them itself.
+
+RUN_HOME=`pwd`
+SCRIPT_HOME=$(dirname $(readlink -f $0))
+
+. $SCRIPT_HOME/../../venv/bin/activate
+
+cd $SCRIPT_HOME
+python3 -m trec_biogen_validator \
+    --socket_path $SCRIPT_HOME/biogen-validator.sock \
+    --output_fname $RUN_HOME/$1.errlog \
+    $RUN_HOME/$1 aux/pubmed_ids_last_20_years.json.gz aux/BioGen2024topics-json.txt
+exit $?
@@ -7,4 +7,4 @@ SCRIPT_HOME=$(dirname $(readlink -f $0))
 
 cd $SCRIPT_HOME/check-ikat
 python3 main.py -f files $RUN_HOME/$1
-exit $!
+exit $?
@@ -0,0 +1,69 @@
+import argparse
+import random
+import time
+from typing import List
+
+from passage_id_db import PassageIDDatabase, VALIDATE_CHUNK_SIZE
+
+
+def validate_each(hdb: PassageIDDatabase, ids: List[str]) -> List[bool]:
+    """
+    The original PassageIDDatabase.validate: one SELECT per passage ID.
+    """
+    results = []
+    cur = hdb._conn.cursor()
+    for id in ids:
+        cur.execute(f'SELECT {PassageIDDatabase.COL_NAME} FROM {PassageIDDatabase.TABLE_NAME} \
+                WHERE {PassageIDDatabase.COL_NAME} = ?', (id, ))
+        results.append(cur.fetchone() is not None)
+    cur.close()
+    return results
+
+
+def sample_ids(hdb: PassageIDDatabase, count: int, invalid_fraction: float) -> List[str]:
+    """
+    Pick count IDs from the database, replacing a fraction of them with IDs that don't exist.
+    """
+    cur = hdb._conn.cursor()
+    cur.execute(f'SELECT {PassageIDDatabase.COL_NAME} FROM {PassageIDDatabase.TABLE_NAME} \
+            ORDER BY RANDOM() LIMIT ?', (count, ))
+    ids = [row[0] for row in cur]
+    cur.close()
+    for i in range(len(ids)):
+        if random.random() < invalid_fraction:
+            ids[i] = ids[i].replace('clueweb22-', 'invalid-')
+    return ids
+
+
+def timed(name: str, func, repeats: int):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{name:>10}: {best:.3f}s')
+    return results, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare per-ID and batched passage ID validation')
+    parser.add_argument('db_path', help='SQLite database path')
+    parser.add_argument('-n', '--num_ids', help='Number of IDs to validate (218 turns x 1000 passages by default)',
+                        type=int, default=218_000)
+    parser.add_argument('-i', '--invalid_fraction', help='Fraction of IDs that are invalid', type=float, default=0.05)
+    parser.add_argument('-c', '--chunk_size', help='IDs per query for the batched lookup', type=int,
+                        default=VALIDATE_CHUNK_SIZE)
+    parser.add_argument('-r', '--repeats', help='Number of timed repeats (best is reported)', type=int, default=3)
+    args = parser.parse_args()
+
+    with PassageIDDatabase(args.db_path) as hdb:
+        ids = sample_ids(hdb, args.num_ids, args.invalid_fraction)
+        print(f'Validating {len(ids)} IDs')
+
+        loop_results, loop_time = timed('loop', lambda: validate_each(hdb, ids), args.repeats)
+        batch_results, batch_time = timed('batched', lambda: hdb.validate(ids, args.chunk_size), args.repeats)
+
+        if loop_results != batch_results:
+            print('Error: batched results differ from the per-ID loop!')
+        print(f'Speedup: {loop_time / batch_time:.1f}x')
@@ -14,7 +14,7 @@ sys.path.append(os.path.join(test_root, 'compiled_protobufs'))
 
 from passage_validator import PassageValidator as PassageValidatorServicer
 from passage_validator_pb2_grpc import add_PassageValidatorServicer_to_server
-from passage_id_db import PassageIDDatabase, IKAT_PASSAGE_COUNT
+from passage_id_db import PassageIDDatabase, PassageIDIndex, IKAT_PASSAGE_COUNT
 from main import load_run_file, get_stub, GRPC_DEFAULT_TIMEOUT
 
 # this file just contains the first 10k lines of the full hash file
@@ -45,6 +45,16 @@ def sample_database(tmp_path: pathlib.PurePath):
     yield hdb
     hdb.close()
 
+@pytest.fixture(params=[False, True], ids=['fingerprints', 'verify'])
+def sample_index(tmp_path: pathlib.PurePath, request):
+    # create a temporary fingerprint index from the contents of sample_hashes.tsv,
+    # with and without the exact-verify strings
+    hdb = PassageIDIndex(str(tmp_path / 'temp.fpidx'))
+    hdb.open()
+    hdb.populate(SAMPLE_HASHES_PATH, 5000, 10000, verify=request.param)
+    yield hdb
+    hdb.close()
+
 @pytest.fixture
 def sample_ids():
     # return a list of the valid IDs from sample_hashes.tsv
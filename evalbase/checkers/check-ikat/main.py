@@ -9,7 +9,14 @@ from typing import Any
 import grpc
 from google.protobuf.json_format import ParseDict
 
-from utils import check_passage_provenance, check_ptkb_provenance, check_response, validate_passages
+from utils import (
+    check_passage_provenance,
+    check_ptkb_provenance,
+    check_response,
+    report_invalid_passages,
+    validate_passages,
+    validate_run_passages,
+)
 
 sys.path.append("./compiled_protobufs")
 from passage_validator_pb2_grpc import PassageValidatorStub
@@ -18,6 +25,10 @@ from run_pb2 import Turn, iKATRun
 # a default timeout for gRPC calls to the passage validator
 GRPC_DEFAULT_TIMEOUT = 3.0
 
+# exit status when the run couldn't be checked because the validator service
+# failed (EX_TEMPFAIL); evalbase doesn't cache these outcomes
+EXIT_TEMPFAIL = 75
+
 # the number of entries that should be parsed from the topics JSON file
 EXPECTED_TOPIC_ENTRIES = 17
 
@@ -115,11 +126,20 @@ def load_run_file(run_file_path: str) -> iKATRun:
 
 
 def validate_turn(
-    run_type: str, turn: Turn, ptkb_data: dict[str, Any], stub: PassageValidatorStub | None, timeout: float
+    run_type: str,
+    turn: Turn,
+    ptkb_data: dict[str, Any],
+    stub: PassageValidatorStub | None,
+    timeout: float,
+    invalid_ids: set[str] | None = None,
 ) -> tuple[int, int]:
     """
     Validate a single turn from a run.
 
+    If invalid_ids is given, it's the set of invalid passage IDs from validating
+    the whole run (see validate_run_passages) and the turn's passages are checked
+    against it instead of calling the validator service.
+
     Returns a 2-tuple of (number of warnings, number of service errors)
     """
     warning_count, service_errors = 0, 0
@@ -127,8 +147,10 @@ def validate_turn(
     logger.debug(f"Validating turn {turn.turn_id}")
     previous_rank = 0
 
+    if invalid_ids is not None:
+        warning_count += report_invalid_passages(logger, turn, invalid_ids)
     # will be None if skip_passage_validation was used
-    if stub is not None:
+    elif stub is not None:
         try:
             # if passage validation is enabled, this is where we make a gRPC call to the
             # validation service to perform the passage ID checks
@@ -257,6 +279,20 @@ def validate_run(
 
     run_topics_dict = validate_all_turns(run, topics_dict)
 
+    # validate the passage IDs for the whole run in one call to the validator
+    # service. warnings are logged turn by turn below
+    invalid_ids = None
+    if stub is not None:
+        try:
+            invalid_ids = validate_run_passages(stub, run.turns, timeout)
+        except grpc.RpcError as rpce:
+            logger.warning(
+                f"A gRPC error occurred when validating passages (name={rpce.code().name}, message={rpce.details()})"
+            )
+            # always abort if a passage ID validation error occurs
+            logger.error("Validation service errors encountered")
+            sys.exit(EXIT_TEMPFAIL)
+
     for topic_id, topic_data in run_topics_dict.items():
         for turn in topic_data:
             topic_id, turn_id = list(map(int, turn.turn_id.split("_")))
@@ -266,7 +302,9 @@ def validate_run(
                 logger.error(f"Turn {turn.turn_id} has an invalid turn ID {turn_id}, expected range: 1-{max_turn_id}")
                 sys.exit(255)
 
-            _warnings, _service_errors = validate_turn(run.run_type, turn, topics_dict[topic_id]["ptkb"], stub, timeout)
+            _warnings, _service_errors = validate_turn(
+                run.run_type, turn, topics_dict[topic_id]["ptkb"], stub, timeout, invalid_ids
+            )
             total_warnings += _warnings
             service_errors += _service_errors
             turns_validated += 1
@@ -278,7 +316,7 @@ def validate_run(
             if service_errors > 0:
                 # always abort if a passage ID validation error occurs
                 logger.error("Validation service errors encountered")
-                sys.exit(255)
+                sys.exit(EXIT_TEMPFAIL)
 
     logger.info(
         f"Validation completed on {turns_validated}/{len(run.turns)} turns with {total_warnings} warnings, {service_errors} service errors"
@@ -307,7 +345,7 @@ def validate(
 
     if not skip_validation and validator_stub is None:
         logger.error("Failed to set up validation service")
-        raise Exception("Failed to set up validation service")
+        sys.exit(EXIT_TEMPFAIL)
 
     topics_dict = load_topic_data(f"{fileroot}/2024_test_topics.json")
 
@@ -1,11 +1,20 @@
 import argparse
+import array
 import csv
+import hashlib
 import logging
 import os
+import shutil
 import sqlite3
+import struct
 import sys
-from typing import List, Optional
+import threading
+import time
+import urllib.parse
+from multiprocessing import Pool
+from typing import List, Optional, Tuple, Union
 
+import numpy as np
 import tqdm
 
 # expected number of passages in the collection (=number of lines in the hashes .tsv file)
@@ -14,6 +23,18 @@ IKAT_PASSAGE_COUNT = 116838987
 # default number of rows to insert into a single insert when building the database
 DEFAULT_BATCH_SIZE = 20000
 
+# default size in bytes of the pieces of the .tsv file parsed by each worker
+# in a parallel build. each piece is loaded in one transaction, and is the
+# unit of progress that an interrupted build resumes from
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+# default page cache size in MB for each read-only connection (see PassageIDDatabase)
+DEFAULT_CACHE_MB = 64
+
+# number of IDs looked up per query by validate(). older SQLite builds limit
+# a statement to 999 parameters, so stay under that
+VALIDATE_CHUNK_SIZE = 900
+
 LOGLEVEL = logging.INFO
 
 logger = logging.Logger(__file__)
@@ -22,20 +43,63 @@ logger.setLevel(LOGLEVEL)
 logger.addHandler(logging.StreamHandler(sys.stdout))
 logger.addHandler(logging.FileHandler(__file__ + '.log'))
 
+def _read_chunk(args: Tuple[str, int, int]) -> str:
+    """
+    Parse the rows of a .tsv file that start between byte offsets start and end.
+
+    Returns the passage IDs joined with newlines, which is much cheaper to send
+    back from a worker process than a list.
+    """
+    hash_file, start, end = args
+    ids = []
+    with open(hash_file, 'rb') as hf:
+        if start > 0:
+            # skip the rest of the line that started in the previous chunk
+            hf.seek(start - 1)
+            hf.readline()
+        while hf.tell() < end:
+            line = hf.readline()
+            if not line:
+                break
+            row = line.rstrip(b'\r\n').split(b'\t', 2)
+            if len(row) < 2 or not row[0] or not row[1]:
+                # blank or truncated line
+                continue
+            ids.append(row[0] + b':' + row[1])
+    return b'\n'.join(ids).decode('utf-8')
+
 class PassageIDDatabase:
 
     TABLE_NAME = 'passage_ids'
     COL_NAME = 'id'
 
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, read_only: bool = False, cache_mb: int = DEFAULT_CACHE_MB) -> None:
+        """
+        With read_only=True the database can only be queried, but each thread
+        that calls validate() gets its own connection, so lookups from several
+        threads (like the validator service's workers) run in parallel. These
+        connections open the file as immutable and memory-mapped, with a page
+        cache of cache_mb each.
+        """
         self.path = path
+        self.read_only = read_only
+        self.cache_mb = cache_mb
         self._conn: Optional[sqlite3.Connection] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._thread_conns: List[sqlite3.Connection] = []
 
     def open(self) -> bool:
         """
         Open a database file at the location given by self.path. If there's an 
         existing file there it will be opened, otherwise a new file is created.
+
+        In read-only mode the file must exist, and the calling thread's
+        connection is opened to check that it can be read.
         """
+        if self.read_only:
+            return self._connection() is not None
+
         try:
             # using check_same_thread=False should be safe here because the
             # database is either going to be populated or used for reads, not
@@ -47,6 +111,31 @@ class PassageIDDatabase:
 
         return True
 
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """
+        Return the connection to query with: the shared one, or in read-only
+        mode the calling thread's own, which is opened the first time.
+        """
+        if not self.read_only:
+            return self._conn
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                uri = f'file:{urllib.parse.quote(os.path.abspath(self.path))}?mode=ro&immutable=1'
+                # check_same_thread=False only so that close() can close
+                # every thread's connection, each is used by one thread
+                conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+                conn.execute(f'PRAGMA cache_size = -{self.cache_mb * 1024}')
+                conn.execute(f'PRAGMA mmap_size = {os.path.getsize(self.path)}')
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f'Error opening database: {e}')
+                return None
+            self._local.conn = conn
+            with self._lock:
+                self._thread_conns.append(conn)
+        return conn
+
     def __enter__(self):
         self.open()
         return self
@@ -113,28 +202,124 @@ class PassageIDDatabase:
             logger.info('Database population complete!')
         return True
 
-    def validate(self, ids: List[str]) -> List[bool]:
+    def populate_parallel(self, hash_file: str, workers: int, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                          num_lines: int = IKAT_PASSAGE_COUNT) -> bool:
+        """
+        Populate the database from a .tsv file, like populate(), but faster.
+
+        The file is split into chunks of about chunk_bytes which are parsed by
+        a pool of worker processes. Rows are appended to an unindexed staging
+        table in a separate database file (self.path + '.staging'), and the
+        indexed table is built from it in one sorted pass at the end. Each chunk
+        is committed along with a record that it's been loaded, so an interrupted
+        build picks up from the last complete chunk when it's run again.
+
+        Progress is reported in rows/sec.
+        """
+        if self._conn is None:
+            raise Exception('Database connection has not been opened')
+
+        staging_path = self.path + '.staging'
+        stat = os.stat(hash_file)
+        source = (os.path.abspath(hash_file), stat.st_size, stat.st_mtime_ns, chunk_bytes)
+        chunks = [(hash_file, start, min(start + chunk_bytes, stat.st_size))
+                  for start in range(0, stat.st_size, chunk_bytes)]
+
+        cur = self._conn.cursor()
+        try:
+            cur.execute('ATTACH DATABASE ? AS staging', (staging_path, ))
+            cur.execute('CREATE TABLE IF NOT EXISTS staging.source (hash_file TEXT, size INTEGER, mtime INTEGER, chunk_bytes INTEGER)')
+            cur.execute('CREATE TABLE IF NOT EXISTS staging.chunks (chunk INTEGER PRIMARY KEY, rows INTEGER)')
+            cur.execute(f'CREATE TABLE IF NOT EXISTS staging.{PassageIDDatabase.TABLE_NAME} ({PassageIDDatabase.COL_NAME} TEXT NOT NULL)')
+
+            # a staging database left over from building something else can't be resumed
+            if cur.execute('SELECT * FROM staging.source').fetchone() != source:
+                cur.execute('DELETE FROM staging.source')
+                cur.execute('DELETE FROM staging.chunks')
+                cur.execute(f'DELETE FROM staging.{PassageIDDatabase.TABLE_NAME}')
+                cur.execute('INSERT INTO staging.source VALUES (?, ?, ?, ?)', source)
+            self._conn.commit()
+        except sqlite3.Error as sqle:
+            logger.error(f'Error initialising staging database: {sqle}')
+            return False
+
+        cur.execute('PRAGMA staging.cache_size = -500000')
+        cur.execute('PRAGMA staging.synchronous = OFF')
+
+        done = dict(cur.execute('SELECT chunk, rows FROM staging.chunks').fetchall())
+        inserted = sum(done.values())
+        if done:
+            logger.info(f'Resuming build, {len(done)}/{len(chunks)} chunks ({inserted} rows) already loaded')
+        todo = [i for i in range(len(chunks)) if i not in done]
+
+        start_time = time.time()
+        loaded = 0
+        with tqdm.tqdm(total=num_lines, initial=inserted) as progress, Pool(workers) as pool:
+            for i, ids in zip(todo, pool.imap(_read_chunk, [chunks[i] for i in todo])):
+                rows = ids.split('\n') if ids else []
+                cur.executemany(f'INSERT INTO staging.{PassageIDDatabase.TABLE_NAME} VALUES (?)', ((id, ) for id in rows))
+                cur.execute('INSERT INTO staging.chunks VALUES (?, ?)', (i, len(rows)))
+                self._conn.commit()
+                loaded += len(rows)
+                progress.update(len(rows))
+        inserted += loaded
+        elapsed = time.time() - start_time
+        logger.info(f'Staged {loaded} rows in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):.0f} rows/sec), building index...')
+
+        # now build the indexed table in one go. inserting in key order means
+        # the B-tree is filled by appending, and WITHOUT ROWID stores the IDs
+        # only once, in the index itself
+        index_time = time.time()
+        cur.execute('PRAGMA cache_size = -500000')
+        # the ORDER BY sorts every row, far too many to sort in memory
+        cur.execute('PRAGMA temp_store = FILE')
+        cur.execute('PRAGMA journal_mode = OFF')
+        cur.execute('PRAGMA synchronous = OFF')
+        try:
+            cur.execute(f'DROP TABLE IF EXISTS main.{PassageIDDatabase.TABLE_NAME}')
+            cur.execute(f'CREATE TABLE main.{PassageIDDatabase.TABLE_NAME} ({PassageIDDatabase.COL_NAME} TEXT PRIMARY KEY NOT NULL) WITHOUT ROWID')
+            cur.execute(f'INSERT OR IGNORE INTO main.{PassageIDDatabase.TABLE_NAME} \
+                    SELECT {PassageIDDatabase.COL_NAME} FROM staging.{PassageIDDatabase.TABLE_NAME} ORDER BY {PassageIDDatabase.COL_NAME}')
+            self._conn.commit()
+            cur.execute('DETACH DATABASE staging')
+        except sqlite3.Error as sqle:
+            logger.error(f'Error building index: {sqle}')
+            return False
+        os.unlink(staging_path)
+
+        elapsed = time.time() - start_time
+        logger.info(f'Index built in {time.time() - index_time:.1f}s')
+        logger.info(f'Database populated with {inserted} rows in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):.0f} rows/sec)')
+        return True
+
+    def validate(self, ids: List[str], chunk_size: int = VALIDATE_CHUNK_SIZE) -> List[bool]:
         """
         Check a list of passage IDs are in the database.
 
         Expects a list of passage IDs in the standard ClueWeb22-ID:passage number format.
 
+        The unique IDs are looked up chunk_size at a time with "WHERE id IN (...)"
+        queries rather than one query per ID.
+
         Returns a list of bools the same size as the input list indicating if each ID is valid/invalid.
         """
-        if self._conn is None:
+        conn = self._connection()
+        if conn is None:
             raise Exception('Database connection has not been opened')
 
-        results = []
-        cur = self._conn.cursor()
-        for id in ids:
+        unique_ids = list(set(ids))
+        found = set()
+        cur = conn.cursor()
+        for i in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[i:i + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
             cur.execute(f'SELECT {PassageIDDatabase.COL_NAME} FROM {PassageIDDatabase.TABLE_NAME} \
-                    WHERE {PassageIDDatabase.COL_NAME} = ?', (id, ))
-            result = cur.fetchone()
-            results.append(False if result is None else True)
-            logger.debug(f'Validate {id} = {result is not None}')
-
+                    WHERE {PassageIDDatabase.COL_NAME} IN ({placeholders})', chunk)
+            found.update(row[0] for row in cur)
         cur.close()
-        return results
+
+        logger.debug(f'Validated {len(ids)} IDs ({len(unique_ids)} unique), {len(found)} found')
+        return [id in found for id in ids]
 
     def close(self) -> bool:
         """
@@ -143,16 +328,24 @@ class PassageIDDatabase:
         if self._conn is not None:
             self._conn.commit()
             self._conn.close()
+            self._conn = None
+
+        with self._lock:
+            for conn in self._thread_conns:
+                conn.close()
+            self._thread_conns = []
+            self._local = threading.local()
         return True
 
     def rowcount(self) -> int:
         """
         Returns the number of rows in the database.
         """
-        if self._conn is None:
+        conn = self._connection()
+        if conn is None:
             raise Exception('Database connection has not been opened')
 
-        cur = self._conn.cursor()
+        cur = conn.cursor()
         try:
             cur.execute(f'SELECT COUNT({PassageIDDatabase.COL_NAME}) FROM {PassageIDDatabase.TABLE_NAME}')
         except sqlite3.OperationalError as sqle:
@@ -160,27 +353,268 @@ class PassageIDDatabase:
             return -1
         return cur.fetchone()[0]
 
+class PassageIDIndex:
+    """
+    A compact alternative to PassageIDDatabase.
+
+    The index file holds the 64-bit fingerprints of every passage ID, sorted,
+    and is memory-mapped and searched with numpy's binary search. At 8 bytes
+    per passage it is a fraction of the size of the SQLite database.
+
+    Two different IDs can share a fingerprint, so an ID that isn't in the
+    collection could (very rarely) be reported as valid. Building with
+    verify=True adds the ID strings themselves to the file, and validate()
+    then checks each fingerprint match against the exact ID.
+
+    File layout (all integers little-endian):
+        header:        MAGIC, row count (u64), flags (u64)
+        fingerprints:  row count x u64, sorted
+    and if the VERIFY flag is set:
+        offsets:       row count x u64, where each ID starts in the strings block
+        lengths:       row count x u32, length of each ID
+        strings:       the IDs, UTF-8
+    """
+
+    MAGIC = b'IKATFP64'
+    HEADER = struct.Struct('<8sQQ')
+    FLAG_VERIFY = 1
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._opened = False
+        self._count = 0
+        self._fingerprints: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._lengths: Optional[np.ndarray] = None
+        self._strings: Optional[np.ndarray] = None
+
+    @staticmethod
+    def fingerprints(ids: List[str]) -> np.ndarray:
+        """
+        Return the 64-bit fingerprints of a list of passage IDs.
+        """
+        digests = b''.join(hashlib.blake2b(id.encode('utf-8'), digest_size=8).digest() for id in ids)
+        return np.frombuffer(digests, dtype='<u8')
+
+    def open(self) -> bool:
+        """
+        Memory-map the index file at self.path. A missing file is treated
+        as an empty index, which populate() will create.
+        """
+        self._close_maps()
+        if not os.path.exists(self.path):
+            self._opened = True
+            return True
+
+        try:
+            with open(self.path, 'rb') as f:
+                magic, count, flags = PassageIDIndex.HEADER.unpack(f.read(PassageIDIndex.HEADER.size))
+        except (OSError, struct.error) as e:
+            logger.error(f'Error opening index: {e}')
+            return False
+        if magic != PassageIDIndex.MAGIC:
+            logger.error(f'Error opening index: {self.path} is not a passage ID index')
+            return False
+
+        self._opened = True
+        self._count = count
+        if count == 0:
+            return True
+
+        offset = PassageIDIndex.HEADER.size
+        self._fingerprints = np.memmap(self.path, dtype='<u8', mode='r', offset=offset, shape=(count, ))
+        if flags & PassageIDIndex.FLAG_VERIFY:
+            offset += 8 * count
+            self._offsets = np.memmap(self.path, dtype='<u8', mode='r', offset=offset, shape=(count, ))
+            offset += 8 * count
+            self._lengths = np.memmap(self.path, dtype='<u4', mode='r', offset=offset, shape=(count, ))
+            offset += 4 * count
+            self._strings = np.memmap(self.path, dtype=np.uint8, mode='r', offset=offset)
+        return True
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def populate(self, hash_file: str, batch_size: int, num_lines: int = IKAT_PASSAGE_COUNT,
+                 verify: bool = False) -> bool:
+        """
+        Build the index from a .tsv file, replacing any existing index at self.path.
+
+        Rows are expected to contain ClueWeb22-ID<tab>passage number<tab>passage hash.
+
+        IDs are fingerprinted batch_size rows at a time. If verify is True the
+        ID strings are stored too, see the class docstring.
+        """
+        self._close_maps()
+
+        fingerprints = array.array('Q')
+        offsets = array.array('Q')
+        lengths = array.array('I')
+        strings_path = self.path + '.strings.tmp'
+        strings_size = 0
+
+        try:
+            with open(strings_path, 'wb') as strings_file, tqdm.tqdm(total=num_lines) as progress:
+                def add_batch(batch: List[str]) -> None:
+                    nonlocal strings_size
+                    fingerprints.frombytes(PassageIDIndex.fingerprints(batch).tobytes())
+                    if verify:
+                        for id in batch:
+                            encoded = id.encode('utf-8')
+                            offsets.append(strings_size)
+                            lengths.append(len(encoded))
+                            strings_file.write(encoded)
+                            strings_size += len(encoded)
+                    progress.update(len(batch))
+
+                with open(hash_file, 'r') as hf:
+                    batch = []
+                    for row in csv.reader(hf, delimiter='\t'):
+                        batch.append(f'{row[0]}:{row[1]}')
+                        if len(batch) == batch_size:
+                            add_batch(batch)
+                            batch = []
+                    add_batch(batch)
+
+            logger.info(f'Fingerprinted {len(fingerprints)} rows, sorting...')
+            fps = np.frombuffer(fingerprints, dtype='<u8')
+            order = np.argsort(fps, kind='stable')
+
+            with open(self.path, 'wb') as f:
+                flags = PassageIDIndex.FLAG_VERIFY if verify else 0
+                f.write(PassageIDIndex.HEADER.pack(PassageIDIndex.MAGIC, len(fps), flags))
+                f.write(fps[order].tobytes())
+                if verify:
+                    f.write(np.frombuffer(offsets, dtype='<u8')[order].tobytes())
+                    f.write(np.frombuffer(lengths, dtype='<u4')[order].tobytes())
+                    with open(strings_path, 'rb') as strings_file:
+                        shutil.copyfileobj(strings_file, f)
+        except (OSError, IndexError) as e:
+            logger.error(f'Error building index: {e}')
+            return False
+        finally:
+            if os.path.exists(strings_path):
+                os.unlink(strings_path)
+
+        logger.info('Index build complete!')
+        return self.open()
+
+    def validate(self, ids: List[str]) -> List[bool]:
+        """
+        Check a list of passage IDs are in the index.
+
+        Expects a list of passage IDs in the standard ClueWeb22-ID:passage number format.
+
+        Returns a list of bools the same size as the input list indicating if each ID is valid/invalid.
+        """
+        if not self._opened:
+            raise Exception('Index has not been opened')
+        if self._count == 0:
+            return [False for id in ids]
+
+        query = PassageIDIndex.fingerprints(ids)
+        positions = np.searchsorted(self._fingerprints, query)
+        found = self._fingerprints[np.minimum(positions, self._count - 1)] == query
+
+        if self._strings is not None:
+            for i in np.flatnonzero(found):
+                found[i] = self._exact_match(ids[i], query[i], positions[i])
+
+        return found.tolist()
+
+    def _exact_match(self, id: str, fingerprint: int, position: int) -> bool:
+        """
+        Compare id against the stored IDs sharing its fingerprint, starting at position.
+        """
+        encoded = id.encode('utf-8')
+        while position < self._count and self._fingerprints[position] == fingerprint:
+            start = int(self._offsets[position])
+            if self._strings[start:start + int(self._lengths[position])].tobytes() == encoded:
+                return True
+            position += 1
+        return False
+
+    def _close_maps(self) -> None:
+        self._opened = False
+        self._count = 0
+        self._fingerprints = self._offsets = self._lengths = self._strings = None
+
+    def close(self) -> bool:
+        """
+        Unmap the index file.
+        """
+        self._close_maps()
+        return True
+
+    def rowcount(self) -> int:
+        """
+        Returns the number of passage IDs in the index.
+        """
+        return self._count
+
+
+def open_passage_id_db(path: str, read_only: bool = False,
+                       cache_mb: int = DEFAULT_CACHE_MB) -> Union[PassageIDDatabase, PassageIDIndex]:
+    """
+    Return a PassageIDDatabase or PassageIDIndex for path, depending on the
+    type of the file. The returned object has not been opened yet.
+
+    read_only and cache_mb are passed on to PassageIDDatabase. A PassageIDIndex
+    is always read-only, and is shared between threads as it is.
+    """
+    if not os.path.exists(path):
+        return PassageIDDatabase(path, read_only, cache_mb)
+    with open(path, 'rb') as f:
+        magic = f.read(len(PassageIDIndex.MAGIC))
+    if magic == PassageIDIndex.MAGIC:
+        return PassageIDIndex(path)
+    return PassageIDDatabase(path, read_only, cache_mb)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('hash_file')
     parser.add_argument('-b', '--batch_size', help='Number of rows in each insert transaction', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('-f', '--format', help='Build an SQLite database or a fingerprint index', choices=['sqlite', 'fingerprint'], default='sqlite')
+    parser.add_argument('-p', '--parallel', help='Build the SQLite database with this many worker processes (resumable if interrupted)', type=int, default=0)
+    parser.add_argument('-c', '--chunk_mb', help='Size in MB of the pieces of the .tsv file loaded by each worker in a parallel build', type=int, default=DEFAULT_CHUNK_BYTES // (1024 * 1024))
+    parser.add_argument('-V', '--verify', help='Store passage IDs in a fingerprint index to verify matches exactly', action='store_true')
     args = parser.parse_args()
 
     if not os.path.exists(args.hash_file):
         print(f'Error: {args.hash_file} does not exist!')
         sys.exit(255)
 
-    # create database in same location as the input, replacing the extension with .sqlite3
+    # create database in same location as the input, replacing the extension
+    # with .sqlite3 (or .fpidx for a fingerprint index)
     db_name, db_ext = os.path.splitext(args.hash_file)
-    db_name = db_name + '.sqlite3'
+    db_name = db_name + ('.sqlite3' if args.format == 'sqlite' else '.fpidx')
     print(f'Creating database at {db_name}')
 
     if os.path.exists(db_name):
         os.unlink(db_name)
 
-    with PassageIDDatabase(db_name) as hdb:
-        if not hdb.populate(args.hash_file, args.batch_size):
-            print('Error: failed to populate the database!')
-            sys.exit(255)
-
-        print(f'Database populated, row count is {hdb.rowcount()}')
+    if args.format == 'sqlite' and args.parallel > 0:
+        with PassageIDDatabase(db_name) as hdb:
+            if not hdb.populate_parallel(args.hash_file, args.parallel, args.chunk_mb * 1024 * 1024):
+                print('Error: failed to populate the database!')
+                sys.exit(255)
+
+            print(f'Database populated, row count is {hdb.rowcount()}')
+    elif args.format == 'sqlite':
+        with PassageIDDatabase(db_name) as hdb:
+            if not hdb.populate(args.hash_file, args.batch_size):
+                print('Error: failed to populate the database!')
+                sys.exit(255)
+
+            print(f'Database populated, row count is {hdb.rowcount()}')
+    else:
+        with PassageIDIndex(db_name) as hdb:
+            if not hdb.populate(args.hash_file, args.batch_size, verify=args.verify):
+                print('Error: failed to build the index!')
+                sys.exit(255)
+
+            print(f'Index built, row count is {hdb.rowcount()}')
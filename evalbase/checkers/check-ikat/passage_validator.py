@@ -1,8 +1,9 @@
 import sys
+from typing import Iterator
 
 import grpc
 
-from passage_id_db import PassageIDDatabase
+from passage_id_db import DEFAULT_CACHE_MB, open_passage_id_db
 
 sys.path.append('./compiled_protobufs')
 from passage_validator_pb2 import PassageValidation, PassageValidationRequest, PassageValidationResult
@@ -10,15 +11,20 @@ from passage_validator_pb2_grpc import PassageValidatorServicer
 
 class PassageValidator(PassageValidatorServicer):
 
-    def __init__(self, db_path: str, expected_rows: int) -> None:
-        self.db = PassageIDDatabase(db_path)
+    def __init__(self, db_path: str, expected_rows: int, cache_mb: int = DEFAULT_CACHE_MB) -> None:
+        # either an SQLite database or a fingerprint index, depending on the file.
+        # an SQLite database is opened read-only with a connection per worker
+        # thread, so concurrent requests don't queue up on a single connection
+        self.db = open_passage_id_db(db_path, read_only=True, cache_mb=cache_mb)
         if not self.db.open():
             print('Error: failed to open database, service cannot start!')
             sys.exit(255)
 
-        if expected_rows > 0 and self.db.rowcount() != expected_rows:
-            print(f'Error: Database row count of {self.db.rowcount()} vs expected {expected_rows}, invalid path?')
-            sys.exit(255)
+        if expected_rows > 0:
+            rowcount = self.db.rowcount()
+            if rowcount != expected_rows:
+                print(f'Error: Database row count of {rowcount} vs expected {expected_rows}, invalid path?')
+                sys.exit(255)
 
         print('>> Service ready')
 
@@ -38,3 +44,19 @@ class PassageValidator(PassageValidatorServicer):
             passage_validation_result.passage_validations.append(passage_validation)
 
         return passage_validation_result
+
+    def validate_run_passages(self, request_iterator: Iterator[PassageValidationRequest], context: grpc.ServicerContext) -> PassageValidationResult:
+        """
+        Takes in a stream of lists of passage ids, usually all the ids in a run,
+        and checks if they appear in the database. The results for all the
+        requests are returned together, in the same order.
+        """
+        passage_validation_result = PassageValidationResult()
+
+        for request in request_iterator:
+            for result in self.db.validate(request.passage_ids):
+                passage_validation = PassageValidation()
+                passage_validation.is_valid = result
+                passage_validation_result.passage_validations.append(passage_validation)
+
+        return passage_validation_result
@@ -3,16 +3,20 @@ import sys
 from concurrent import futures
 
 import grpc
-from passage_id_db import IKAT_PASSAGE_COUNT
+from passage_id_db import DEFAULT_CACHE_MB, IKAT_PASSAGE_COUNT
 from passage_validator import PassageValidator as PassageValidatorServicer
 
 sys.path.append("./compiled_protobufs")
 from compiled_protobufs.passage_validator_pb2_grpc import add_PassageValidatorServicer_to_server
 
 
-def serve(db_path: str, expected_rows: int) -> None:
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    add_PassageValidatorServicer_to_server(PassageValidatorServicer(db_path, expected_rows), server)
+# default number of threads handling requests. each has its own database connection
+DEFAULT_WORKERS = 10
+
+
+def serve(db_path: str, expected_rows: int, workers: int = DEFAULT_WORKERS, cache_mb: int = DEFAULT_CACHE_MB) -> None:
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    add_PassageValidatorServicer_to_server(PassageValidatorServicer(db_path, expected_rows, cache_mb), server)
 
     server.add_insecure_port("[::]:8000")
     server.start()
@@ -20,7 +24,9 @@ def serve(db_path: str, expected_rows: int) -> None:
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('db_path', type=str, help='SQLite database path', default='./files/ikat_2023_passages_hashes.sqlite3')
+    parser.add_argument('db_path', type=str, help='Passage ID database path (SQLite database or fingerprint index)', default='./files/ikat_2023_passages_hashes.sqlite3')
     parser.add_argument('expected_rows', type=int, nargs='?', default=IKAT_PASSAGE_COUNT, help='Expected number of rows in the database (0 to skip checking)')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS, help='Number of threads handling requests')
+    parser.add_argument('-c', '--cache_mb', type=int, default=DEFAULT_CACHE_MB, help='SQLite page cache size (MB) for each thread')
     args = parser.parse_args()
-    serve(args.db_path, args.expected_rows)
+    serve(args.db_path, args.expected_rows, args.workers, args.cache_mb)
@@ -17,6 +17,6 @@ then
     echo "> Hash database already exists. Delete ${hash_db} and rerun setup.sh to regenerate it if needed."
 else
     echo "> Building passage ID database ${hash_db}"
-    python3 passage_id_db.py files/ikat_2023_passages_hashes.tsv
+    python3 passage_id_db.py files/ikat_2023_passages_hashes.tsv --parallel 4
 fi
 
@@ -1,9 +1,13 @@
 import pathlib
 import os
+from concurrent import futures
 
-from passage_id_db import PassageIDDatabase
+import pytest
 
-from conftest import SAMPLE_DB_COUNT
+import passage_id_db
+from passage_id_db import PassageIDDatabase, PassageIDIndex, open_passage_id_db
+
+from conftest import SAMPLE_DB_COUNT, SAMPLE_HASHES_PATH
 
 TEMP_FILE = 'temp.sqlite3'
 
@@ -49,3 +53,163 @@ def test_validation_all_invalid(sample_database):
     results = sample_database.validate(valid_passage_ids)
     assert results == [True, False, False, True]
 
+def test_validation_order_and_duplicates(sample_database, sample_ids):
+    """
+    Test that results follow the input order, including repeated IDs and
+    lists longer than one lookup chunk.
+    """
+    ids = []
+    expected = []
+    for i, passage_id in enumerate(sample_ids[:2500]):
+        ids.append(passage_id)
+        expected.append(True)
+        if i % 3 == 0:
+            ids.append(f'invalid-{i}')
+            expected.append(False)
+        if i % 7 == 0:
+            ids.append(passage_id)
+            expected.append(True)
+
+    assert sample_database.validate(ids, chunk_size=100) == expected
+    assert sample_database.validate(ids) == expected
+
+def test_validation_empty(sample_database):
+    """
+    Test validating an empty list of IDs.
+    """
+    assert sample_database.validate([]) == []
+
+def test_read_only_threads(sample_database, sample_ids):
+    """
+    Test that a read-only database gives each thread its own connection, and
+    that lookups from several threads are all correct.
+    """
+    chunks = [sample_ids[i::8] + ['foo'] for i in range(8)]
+    with PassageIDDatabase(sample_database.path, read_only=True, cache_mb=8) as hdb:
+        with futures.ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(hdb.validate, chunks * 4))
+
+        for chunk, result in zip(chunks * 4, results):
+            assert result == [True for x in chunk[:-1]] + [False]
+        assert 1 < len(hdb._thread_conns) <= 5
+
+def test_read_only_missing_file(tmp_path: pathlib.PurePath):
+    """
+    Test that opening a missing file read-only fails rather than creating it.
+    """
+    path = tmp_path / TEMP_FILE
+    hdb = PassageIDDatabase(str(path), read_only=True)
+    assert not hdb.open()
+    assert not os.path.exists(path)
+
+class InProcessPool:
+    """
+    Stands in for multiprocessing.Pool, running chunks in this process and
+    optionally stopping with KeyboardInterrupt after a number of them.
+    """
+    requested = []
+
+    def __init__(self, workers, stop_after=None):
+        self.stop_after = stop_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def imap(self, func, chunks):
+        for i, chunk in enumerate(chunks):
+            if i == self.stop_after:
+                raise KeyboardInterrupt()
+            InProcessPool.requested.append(chunk)
+            yield func(chunk)
+
+def test_populate_parallel(tmp_path: pathlib.PurePath, sample_ids):
+    """
+    Test that a parallel build loads every row, whatever the chunk boundaries.
+    """
+    with PassageIDDatabase(str(tmp_path / TEMP_FILE)) as hdb:
+        assert hdb.populate_parallel(SAMPLE_HASHES_PATH, 2, chunk_bytes=10_000, num_lines=SAMPLE_DB_COUNT)
+        assert hdb.rowcount() == SAMPLE_DB_COUNT
+        assert hdb.validate(sample_ids + ['foo']) == [True for x in sample_ids] + [False]
+    assert not os.path.exists(str(tmp_path / TEMP_FILE) + '.staging')
+
+def test_populate_parallel_malformed_lines(tmp_path: pathlib.PurePath):
+    """
+    Test that a parallel build skips blank and truncated lines.
+    """
+    hash_file = tmp_path / 'hashes.tsv'
+    hash_file.write_text('clueweb22-en0004-24-00788\t3\tabc\n'
+                         '\n'
+                         'clueweb22-en0004-30-06847\n'
+                         'clueweb22-en0004-50-06631\t20\tdef\n')
+    with PassageIDDatabase(str(tmp_path / TEMP_FILE)) as hdb:
+        assert hdb.populate_parallel(str(hash_file), 2, chunk_bytes=20, num_lines=2)
+        assert hdb.rowcount() == 2
+        assert hdb.validate(['clueweb22-en0004-24-00788:3', 'clueweb22-en0004-50-06631:20']) == [True, True]
+
+def test_populate_parallel_resume(tmp_path: pathlib.PurePath, sample_ids, monkeypatch):
+    """
+    Test that an interrupted parallel build resumes without reloading finished chunks.
+    """
+    path = str(tmp_path / TEMP_FILE)
+    monkeypatch.setattr(passage_id_db, 'Pool', lambda workers: InProcessPool(workers, stop_after=5))
+    with pytest.raises(KeyboardInterrupt):
+        with PassageIDDatabase(path) as hdb:
+            hdb.populate_parallel(SAMPLE_HASHES_PATH, 2, chunk_bytes=10_000, num_lines=SAMPLE_DB_COUNT)
+
+    InProcessPool.requested = []
+    monkeypatch.setattr(passage_id_db, 'Pool', InProcessPool)
+    with PassageIDDatabase(path) as hdb:
+        assert hdb.populate_parallel(SAMPLE_HASHES_PATH, 2, chunk_bytes=10_000, num_lines=SAMPLE_DB_COUNT)
+        assert hdb.rowcount() == SAMPLE_DB_COUNT
+        assert hdb.validate(sample_ids) == [True for x in sample_ids]
+    assert InProcessPool.requested[0][1] == 5 * 10_000
+
+def test_create_sample_index(sample_index):
+    """
+    Test that building a fingerprint index produces the expected rowcount.
+    """
+    assert sample_index.rowcount() == SAMPLE_DB_COUNT
+
+def test_index_validation(sample_index):
+    """
+    Test validating a mix of valid and invalid IDs against a fingerprint index.
+    """
+    ids = ['clueweb22-en0004-67-04151:9', 'foo', 'bar', 'clueweb22-en0004-50-06631:20', '']
+    assert sample_index.validate(ids) == [True, False, False, True, False]
+    assert sample_index.validate([]) == []
+
+def test_index_matches_database(sample_database, sample_index, sample_ids):
+    """
+    Test that the fingerprint index and the SQLite database agree.
+    """
+    ids = sample_ids[::7] + [id.replace(':', ':9') for id in sample_ids[::13]]
+    assert sample_index.validate(ids) == sample_database.validate(ids)
+
+def test_index_verify_rejects_collisions(sample_index, sample_ids, monkeypatch):
+    """
+    Test that an index with the verify strings rejects an ID whose fingerprint
+    matches a stored one but whose text doesn't.
+    """
+    real_fingerprint = PassageIDIndex.fingerprints(sample_ids[:1])
+    monkeypatch.setattr(PassageIDIndex, 'fingerprints', staticmethod(lambda ids: real_fingerprint))
+
+    # without the strings a fingerprint collision can't be detected
+    assert sample_index.validate(['not-a-passage']) == [sample_index._strings is None]
+
+def test_reopen_index(sample_index):
+    """
+    Test that a built index can be opened again from its file.
+    """
+    with PassageIDIndex(sample_index.path) as hdb:
+        assert hdb.rowcount() == SAMPLE_DB_COUNT
+        assert hdb.validate(['clueweb22-en0004-24-00788:3']) == [True]
+
+def test_open_passage_id_db(sample_database, sample_index):
+    """
+    Test that the backend is chosen from the file type.
+    """
+    assert isinstance(open_passage_id_db(sample_database.path), PassageIDDatabase)
+    assert isinstance(open_passage_id_db(sample_index.path), PassageIDIndex)
@@ -1,8 +1,9 @@
 import pytest
 
 from compiled_protobufs.passage_validator_pb2 import PassageValidationRequest
-from compiled_protobufs.run_pb2 import PassageProvenance
-from utils import validate_passages
+from compiled_protobufs.run_pb2 import PassageProvenance, Response, Turn
+from utils import validate_passages, validate_run_passages, report_invalid_passages
+import utils
 from main import GRPC_DEFAULT_TIMEOUT, validate_turn, load_topic_data
 
 def build_request(ids):
@@ -84,3 +85,33 @@ def test_empty(grpc_stub_test):
     """
     response = grpc_stub_test.validate_passages(build_request([]))
     assert(len(get_invalid_indices(response)) == 0)
+
+def build_turn(turn_id, ids):
+    turn = Turn(turn_id=turn_id)
+    response = Response(rank=1, text='...')
+    for i, id in enumerate(ids):
+        response.passage_provenance.append(PassageProvenance(id=id, score=-i, used=True))
+    turn.responses.append(response)
+    return turn
+
+def test_validate_run_passages(grpc_stub_test, test_logger, sample_ids, monkeypatch):
+    """
+    Test that validating a whole run returns the invalid IDs across all its turns,
+    when they're sent in several requests.
+    """
+    monkeypatch.setattr(utils, 'RUN_REQUEST_BATCH_SIZE', 100)
+    turns = [
+        build_turn('1_1', sample_ids[0:500] + ['foo']),
+        build_turn('1_2', sample_ids[250:750] + ['foo', 'bar']),
+        build_turn('1_3', []),
+    ]
+    invalid_ids = validate_run_passages(grpc_stub_test, turns, GRPC_DEFAULT_TIMEOUT)
+
+    assert(invalid_ids == set(['foo', 'bar']))
+    assert([report_invalid_passages(test_logger, turn, invalid_ids) for turn in turns] == [1, 2, 0])
+
+def test_validate_run_passages_empty(grpc_stub_test):
+    """
+    Test that validating a run with no passages doesn't fail.
+    """
+    assert(validate_run_passages(grpc_stub_test, [build_turn('1_1', [])], GRPC_DEFAULT_TIMEOUT) == set())
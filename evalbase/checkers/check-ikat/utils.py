@@ -1,13 +1,17 @@
 import sys
 
 from logging import Logger
-from typing import Any
+from typing import Any, Iterable
 
 sys.path.append("./compiled_protobufs")
 from passage_validator_pb2 import PassageValidationRequest
 from passage_validator_pb2_grpc import PassageValidatorStub
 from run_pb2 import Turn, PassageProvenance, Response
 
+# the number of passage IDs sent in each request of a validate_run_passages call,
+# which keeps the messages well under gRPC's default 4MB limit
+RUN_REQUEST_BATCH_SIZE = 10000
+
 
 def check_response(run_type: str, response: Response, logger: Logger, previous_rank: int, turn_id: str) -> int:
     """
@@ -128,3 +132,58 @@ def validate_passages(passage_validation_client: PassageValidatorStub, logger: L
         logger.warning(f"Provenance with ID {passage_ids[index]} does not exist in the passage collection")
 
     return len(invalid_indexes)
+
+
+def turn_passage_ids(turn: Turn) -> list[str]:
+    """
+    Return the unique passage IDs referenced in the given Turn, in the order they appear.
+    """
+    return list(dict.fromkeys(provenance.id for response in turn.responses for provenance in response.passage_provenance))
+
+
+def validate_run_passages(
+    passage_validation_client: PassageValidatorStub, turns: Iterable[Turn], timeout: float
+) -> set[str]:
+    """
+    Validate the passage IDs of a whole run using the gRPC validation service.
+
+    The unique passage IDs across all the turns are streamed to the service
+    in requests of RUN_REQUEST_BATCH_SIZE IDs, and the service answers them all
+    in a single result. The timeout applies to each request, so the call as a
+    whole is allowed timeout x number of requests.
+
+    Return value is the set of passage IDs found to be invalid.
+    """
+    passage_ids = list(dict.fromkeys(id for turn in turns for id in turn_passage_ids(turn)))
+
+    requests = []
+    for i in range(0, len(passage_ids), RUN_REQUEST_BATCH_SIZE):
+        passage_validation_request = PassageValidationRequest()
+        passage_validation_request.passage_ids.MergeFrom(passage_ids[i : i + RUN_REQUEST_BATCH_SIZE])
+        requests.append(passage_validation_request)
+
+    passage_validation_result = passage_validation_client.validate_run_passages(
+        iter(requests), timeout=timeout * max(len(requests), 1)
+    )
+
+    return set(
+        passage_ids[i]
+        for i, passage_validation in enumerate(passage_validation_result.passage_validations)
+        if not passage_validation.is_valid
+    )
+
+
+def report_invalid_passages(logger: Logger, turn: Turn, invalid_ids: set[str]) -> int:
+    """
+    Log a warning for each passage ID in the given Turn that is in invalid_ids,
+    as returned by validate_run_passages.
+
+    Return value is the number of passage IDs in the turn found to be invalid.
+    """
+    invalid_count = 0
+    for passage_id in turn_passage_ids(turn):
+        if passage_id in invalid_ids:
+            logger.warning(f"Provenance with ID {passage_id} does not exist in the passage collection")
+            invalid_count += 1
+
+    return invalid_count
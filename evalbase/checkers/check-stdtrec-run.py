@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
+import os
 import re
+import json
 import sys
 import traceback
 import collections
@@ -44,6 +46,17 @@ class Errlog():
         print(f'WARNING Line {line}: {msg}', file=self.fp)
 
 
+# How often, in lines, to report progress
+PROGRESS_LINES = 10000
+
+def report_progress(**counts):
+    '''If evalbase asked for progress reports, append one to its file.'''
+    path = os.environ.get('EVALBASE_PROGRESS')
+    if path:
+        with open(path, 'a') as fp:
+            print(json.dumps(counts), file=fp)
+
+
 def check_retrieval_run(args, log):
     the_runtag = None
     warned_about_q0 = False
@@ -69,6 +82,9 @@ def check_retrieval_run(args, log):
         for line in run:
             fields = line.strip().split()
             count += 1
+            if count % PROGRESS_LINES == 0:
+                report_progress(lines=count,
+                                topics=sum(1 for n in topics.values() if n > 0))
 
             if len(fields) == 6:
                 topic, q0, docno, rank, sim, runtag = fields
@@ -117,6 +133,8 @@ def check_retrieval_run(args, log):
                 continue
             topics[topic] += 1
 
+    report_progress(lines=count,
+                    topics=sum(1 for n in topics.values() if n > 0))
     for topic in topics:
         if topics[topic] == 0:
             log.error(count, f'No documents retrieved for topic {topic}')
@@ -12,6 +12,7 @@ from trec_biogen_validator.util.validator import (
     DEFAULT_MAX_SENTENCES_PER_ANSWER,
     DEFAULT_SPACY_MODEL,
 )
+from trec_biogen_validator.service import DEFAULT_TIMEOUT, results_to_json, validate_remote
 from jsonargparse import CLI
 from rich.console import Console
 
@@ -31,6 +32,8 @@ def cmd(
     dump_sentence_tokenization: bool = False,
     console_output: bool = False,
     output_fname: Optional[str] = None,
+    socket_path: Optional[str] = None,
+    socket_timeout: float = DEFAULT_TIMEOUT,
 ):
     """
     Perform validation of a TREC Biogen submission, according to the rules described
@@ -47,6 +50,8 @@ def cmd(
     :param dump_sentence_tokenization: If true, print out the sentence tokenization for topics that have errors or warnings, to help with debugging.
     :param console_output: If true, print output to console; otherwise (default) write to output file
     :param output_fname: The name of the output file; defaults to basename(PATH_TO_SUBMISSION).err in current working directory
+    :param socket_path: If given, send the submission to the validator service listening on this socket (see trec_biogen_validator.service) instead of loading the model and PMIDs here
+    :param socket_timeout: Seconds to wait for the validator service's reply before validating here instead
     :return:
     """
 
@@ -70,17 +75,6 @@ def cmd(
         target_width = 1024
     console = Console(file=output_fp, width=target_width)
 
-    val = Validator(
-        path_to_valid_pmids,
-        path_to_topics,
-        max_words_per_output=max_words_per_output,
-        max_sentences_per_output=max_sentences_per_output,
-        spacy_model=spacy_model,
-    )
-
-    if not os.path.exists(path_to_valid_pmids):
-        raise FileNotFoundError(f"{path_to_valid_pmids} does not exist")
-
     try:
         with open(path_to_submission, "r") as submission_io:
             s = Submission.model_validate(json.load(submission_io))
@@ -92,7 +86,25 @@ def cmd(
             output_fp.close()
         sys.exit(ERROR_RETURN_CODE)
 
-    v = val.validate_submission(path_to_submission)
+    v = None
+    if socket_path is not None:
+        try:
+            v = validate_remote(socket_path, s, timeout=socket_timeout)
+        except (OSError, RuntimeError, json.JSONDecodeError) as e:
+            logger.warning(f"Validator service unavailable ({e}), validating locally")
+
+    if v is None:
+        if not os.path.exists(path_to_valid_pmids):
+            raise FileNotFoundError(f"{path_to_valid_pmids} does not exist")
+
+        val = Validator(
+            path_to_valid_pmids,
+            path_to_topics,
+            max_words_per_output=max_words_per_output,
+            max_sentences_per_output=max_sentences_per_output,
+            spacy_model=spacy_model,
+        )
+        v = results_to_json(val.validate(s))
 
     found_error = False
 
@@ -101,35 +113,34 @@ def cmd(
             f"Topic {topic.topic_id} ({top_idx+1}/{len(s.results)})", style="bold"
         )
 
-        if validation_results.is_valid():
+        if len(validation_results["errors"]) == 0:
             console.print("\tOverall: OK", style="green")
         else:
             console.print("\tOverall: Invalid", style="red")
 
-        if len(validation_results.errors) == 0:
+        if len(validation_results["errors"]) == 0:
             console.print("\t✅ No errors", style="green")
         else:
             found_error = True
-            console.print(f"\t{len(validation_results.errors)} errors", style="red")
-            for err_type, msg in validation_results.errors:
+            console.print(f"\t{len(validation_results['errors'])} errors", style="red")
+            for err_type, msg in validation_results["errors"]:
                 console.print(f"\t\t❌ {msg}")
-        if len(validation_results.warnings) == 0:
+        if len(validation_results["warnings"]) == 0:
             console.print("\t✅ No warnings", style="green")
         else:
             console.print(
-                f"\t{len(validation_results.warnings)} warnings", style="dark_orange"
+                f"\t{len(validation_results['warnings'])} warnings", style="dark_orange"
             )
-            for err_type, msg in validation_results.warnings:
+            for err_type, msg in validation_results["warnings"]:
                 console.print(f"\t\t⚠️ {msg}")
 
         if (
-            len(validation_results.errors) > 0 or len(validation_results.warnings) > 0
+            len(validation_results["errors"]) > 0
+            or len(validation_results["warnings"]) > 0
         ) and dump_sentence_tokenization:
             console.print("\tSentence-level tokenization, in case it helps:")
-            for sentence_idx, parsed_sentence in enumerate(
-                validation_results.parsed_answer.sentences
-            ):
-                console.print(f"\t\t{sentence_idx+1}. {parsed_sentence.answer_content}")
+            for sentence_idx, sentence in enumerate(validation_results["sentences"]):
+                console.print(f"\t\t{sentence_idx+1}. {sentence}")
     if not console_output:
         output_fp.close()
     if found_error:
@@ -0,0 +1,157 @@
+"""
+A resident TREC BioGen validator.
+
+Loading the spaCy model and the PMID list takes several seconds and a few GB
+of memory, which the command line validator pays on every run.  This service
+loads them once and then validates submissions sent to it over a local Unix
+socket.  Start it with
+
+    python -m trec_biogen_validator.service <pmids> <topics> -s <socket>
+
+and run the validator with --socket_path <socket> to use it.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+
+from trec_biogen_validator.util import Submission, ValidationResults
+from trec_biogen_validator.util.answer import DEFAULT_BATCH_SIZE
+from trec_biogen_validator.util.validator import (
+    Validator,
+    DEFAULT_MAX_WORDS_PER_ANSWER,
+    DEFAULT_MAX_SENTENCES_PER_ANSWER,
+    DEFAULT_SPACY_MODEL,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "biogen-validator.sock"
+
+# Seconds to wait for the service before validating locally instead.  The
+# service takes a few seconds for a whole submission; this is well under the
+# checker's timeout, so a hung service still leaves time for the fallback.
+DEFAULT_TIMEOUT = 300
+
+
+def results_to_json(results: list[ValidationResults]) -> list[dict]:
+    """
+    Turn validation results into plain lists and dicts, which is what the
+    service sends back and what the command line validator prints from.
+    """
+    return [
+        {
+            "errors": [(err_type.name, msg) for err_type, msg in r.errors],
+            "warnings": [(err_type.name, msg) for err_type, msg in r.warnings],
+            "sentences": [s.answer_content for s in r.parsed_answer.sentences],
+        }
+        for r in results
+    ]
+
+
+class ValidationHandler(socketserver.StreamRequestHandler):
+    """
+    Each request is one line of JSON, {"submission": <submission>}.  The reply
+    is one line of JSON, {"results": [...]} or {"error": <message>}.
+    """
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            s = Submission.model_validate(request["submission"])
+            results = self.server.validator.validate(
+                s, batch_size=self.server.batch_size
+            )
+            reply = {"results": results_to_json(results)}
+        except Exception as e:
+            logger.exception("Validation failed")
+            reply = {"error": f"{e}"}
+        self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+
+class ValidatorServer(socketserver.UnixStreamServer):
+    """
+    Handles one submission at a time; the spaCy pipeline isn't thread-safe,
+    and batching the answers of a submission is where the speed comes from.
+    """
+
+    def __init__(self, socket_path: str, validator: Validator, batch_size: int):
+        self.validator = validator
+        self.batch_size = batch_size
+        super().__init__(socket_path, ValidationHandler)
+
+
+def validate_remote(
+    socket_path: str, s: Submission, timeout: float = DEFAULT_TIMEOUT
+) -> list[dict]:
+    """
+    Send a submission to the validator service and return its results.
+    Raises OSError if the service can't be reached, doesn't reply within
+    timeout seconds, or hangs up without replying.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        with sock.makefile("rw", encoding="utf-8") as sock_io:
+            sock_io.write(json.dumps({"submission": s.model_dump()}) + "\n")
+            sock_io.flush()
+            line = sock_io.readline()
+    if not line:
+        raise ConnectionError("Validator service closed the connection without replying")
+    reply = json.loads(line)
+
+    if "error" in reply:
+        raise RuntimeError(f"Validator service error: {reply['error']}")
+    return reply["results"]
+
+
+def serve(
+    socket_path: str,
+    path_to_valid_pmids: str,
+    path_to_topics: str,
+    max_sentences_per_output: int = DEFAULT_MAX_SENTENCES_PER_ANSWER,
+    max_words_per_output: int = DEFAULT_MAX_WORDS_PER_ANSWER,
+    spacy_model: str = DEFAULT_SPACY_MODEL,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> None:
+    if not os.path.exists(path_to_valid_pmids):
+        raise FileNotFoundError(f"{path_to_valid_pmids} does not exist")
+
+    validator = Validator(
+        path_to_valid_pmids,
+        path_to_topics,
+        max_words_per_output=max_words_per_output,
+        max_sentences_per_output=max_sentences_per_output,
+        spacy_model=spacy_model,
+    )
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    with ValidatorServer(socket_path, validator, batch_size) as server:
+        print(">> Service ready")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path_to_valid_pmids", help='The "pubmed_ids_last_20_years.json.gz" file')
+    parser.add_argument("path_to_topics", help='The "BioGen2024topics-json.txt" file')
+    parser.add_argument("-s", "--socket_path", default=DEFAULT_SOCKET_PATH, help="Unix socket to listen on")
+    parser.add_argument("-b", "--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="Number of answers per nlp.pipe batch")
+    parser.add_argument("--max_sentences_per_output", type=int, default=DEFAULT_MAX_SENTENCES_PER_ANSWER)
+    parser.add_argument("--max_words_per_output", type=int, default=DEFAULT_MAX_WORDS_PER_ANSWER)
+    parser.add_argument("--spacy_model", default=DEFAULT_SPACY_MODEL)
+    args = parser.parse_args()
+    serve(
+        args.socket_path,
+        args.path_to_valid_pmids,
+        args.path_to_topics,
+        max_sentences_per_output=args.max_sentences_per_output,
+        max_words_per_output=args.max_words_per_output,
+        spacy_model=args.spacy_model,
+        batch_size=args.batch_size,
+    )
@@ -0,0 +1,228 @@
+"""
+Tests for the validator service and the command line validator's fallback
+to validating in-process.  Run from the checkers directory with
+
+    python -m pytest trec_biogen_validator/tests
+"""
+import gzip
+import json
+import socketserver
+import threading
+
+import pytest
+import spacy
+
+from trec_biogen_validator.__main__ import cmd
+from trec_biogen_validator.service import (
+    ValidatorServer,
+    results_to_json,
+    validate_remote,
+)
+from trec_biogen_validator.util import Submission
+from trec_biogen_validator.util.validator import Validator
+
+GOOD_ANSWER = {
+    "topic_id": "116",
+    "answer": "Losing weight can help [1234]. So can sleeping on your side [1234, 5678].",
+    "references": ["1234", "5678"],
+}
+BAD_ANSWER = {
+    "topic_id": "999",
+    "answer": "Nobody knows [4321].",
+    "references": ["4321"],
+}
+
+
+def submission(*answers):
+    return Submission.model_validate(
+        {
+            "team_id": "team",
+            "run_name": "run",
+            "contact_email": "team@example.com",
+            "results": list(answers),
+        }
+    )
+
+
+@pytest.fixture(scope="session")
+def validator_args(tmp_path_factory):
+    """
+    A PMID list, topics, and a small spaCy pipeline that only splits sentences.
+    """
+    tmp = tmp_path_factory.mktemp("biogen")
+    pmids = tmp / "pmids.json.gz"
+    with gzip.open(pmids, "wt") as fp:
+        json.dump(["1234", "5678"], fp)
+    topics = tmp / "topics.json"
+    topics.write_text(
+        json.dumps(
+            {
+                "topics": [
+                    {
+                        "id": 116,
+                        "topic": "natural treatments for sleep apnea",
+                        "question": "Are there ways to treat sleep apnea naturally?",
+                        "narrative": "The patient is looking for natural remedies.",
+                    }
+                ]
+            }
+        )
+    )
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    nlp.to_disk(tmp / "model")
+    return str(pmids), str(topics), str(tmp / "model")
+
+
+@pytest.fixture(scope="session")
+def validator(validator_args):
+    pmids, topics, model = validator_args
+    return Validator(pmids, topics, spacy_model=model)
+
+
+def start_server(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def service(tmp_path, validator):
+    socket_path = str(tmp_path / "biogen-validator.sock")
+    with ValidatorServer(socket_path, validator, batch_size=2) as server:
+        start_server(server)
+        yield socket_path
+        server.shutdown()
+
+
+class FailingValidator:
+    def validate(self, s, batch_size):
+        raise ValueError("no model")
+
+
+class SilentHandler(socketserver.StreamRequestHandler):
+    """
+    Reads the request and hangs up without replying, like a service that
+    crashed partway through.
+    """
+
+    def handle(self):
+        self.rfile.readline()
+
+
+class HangingHandler(socketserver.StreamRequestHandler):
+    """
+    Reads the request and never replies, like a service that's stuck,
+    until the test lets it go.
+    """
+
+    def handle(self):
+        self.rfile.readline()
+        self.server.release.wait()
+
+
+@pytest.fixture
+def hanging_service(tmp_path):
+    socket_path = str(tmp_path / "biogen-validator.sock")
+    with socketserver.UnixStreamServer(socket_path, HangingHandler) as server:
+        server.release = threading.Event()
+        start_server(server)
+        yield socket_path
+        server.release.set()
+        server.shutdown()
+
+
+def run_cmd(tmp_path, validator_args, answers, socket_path, **kwargs):
+    pmids, topics, model = validator_args
+    run = tmp_path / "run.json"
+    run.write_text(submission(*answers).model_dump_json())
+    errlog = tmp_path / "run.json.errlog"
+    with pytest.raises(SystemExit) as exit:
+        cmd(
+            str(run),
+            pmids,
+            topics,
+            spacy_model=model,
+            output_fname=str(errlog),
+            socket_path=socket_path,
+            **kwargs,
+        )
+    return exit.value.code, errlog.read_text()
+
+
+def test_service_matches_local(service, validator):
+    """
+    The service returns what validating in-process does.
+    """
+    s = submission(GOOD_ANSWER, BAD_ANSWER)
+    results = validate_remote(service, s)
+    assert results == json.loads(json.dumps(results_to_json(validator.validate(s))))
+    assert results[0]["errors"] == []
+    assert len(results[0]["sentences"]) == 2
+    assert {err_type for err_type, _ in results[1]["errors"]} == {
+        "INVALID_TOPIC",
+        "INVALID_PMID",
+    }
+
+
+def test_service_handles_many_requests(service):
+    for _ in range(3):
+        assert validate_remote(service, submission(GOOD_ANSWER))[0]["errors"] == []
+
+
+def test_service_error(tmp_path):
+    socket_path = str(tmp_path / "biogen-validator.sock")
+    with ValidatorServer(socket_path, FailingValidator(), batch_size=2) as server:
+        start_server(server)
+        with pytest.raises(RuntimeError, match="no model"):
+            validate_remote(socket_path, submission(GOOD_ANSWER))
+        server.shutdown()
+
+
+def test_cmd_uses_service(tmp_path, validator_args, service):
+    code, errlog = run_cmd(tmp_path, validator_args, [GOOD_ANSWER], service)
+    assert code == 0
+    assert "No errors" in errlog
+
+    code, errlog = run_cmd(tmp_path, validator_args, [GOOD_ANSWER, BAD_ANSWER], service)
+    assert code == 255
+    assert "999 is not a valid topic" in errlog
+
+
+def test_fallback_no_service(tmp_path, validator_args):
+    code, errlog = run_cmd(
+        tmp_path, validator_args, [BAD_ANSWER], str(tmp_path / "missing.sock")
+    )
+    assert code == 255
+    assert "999 is not a valid topic" in errlog
+
+
+def test_fallback_service_error(tmp_path, validator_args):
+    socket_path = str(tmp_path / "biogen-validator.sock")
+    with ValidatorServer(socket_path, FailingValidator(), batch_size=2) as server:
+        start_server(server)
+        code, errlog = run_cmd(tmp_path, validator_args, [GOOD_ANSWER], socket_path)
+        server.shutdown()
+    assert code == 0
+    assert "No errors" in errlog
+
+
+def test_fallback_no_reply(tmp_path, validator_args):
+    socket_path = str(tmp_path / "biogen-validator.sock")
+    with socketserver.UnixStreamServer(socket_path, SilentHandler) as server:
+        start_server(server)
+        code, errlog = run_cmd(tmp_path, validator_args, [BAD_ANSWER], socket_path)
+        server.shutdown()
+    assert code == 255
+    assert "999 is not a valid topic" in errlog
+
+
+def test_no_reply_times_out(hanging_service):
+    with pytest.raises(TimeoutError):
+        validate_remote(hanging_service, submission(GOOD_ANSWER), timeout=0.5)
+
+
+def test_fallback_hung_service(tmp_path, validator_args, hanging_service):
+    code, errlog = run_cmd(
+        tmp_path, validator_args, [BAD_ANSWER], hanging_service, socket_timeout=0.5
+    )
+    assert code == 255
+    assert "999 is not a valid topic" in errlog
@@ -1,7 +1,7 @@
 import logging
 from typing import Optional
 
-from spacy.tokens import Span
+from spacy.tokens import Doc, Span
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +22,8 @@ CITATION_SECTION_REGEX = re.compile(r"(\[(?:\d+,?\s*)+\])")
 INDIVIDUAL_CITATION_REGEX = re.compile(r"\d+")
 SENTENCE_FINAL_PUNCTUATION_REGEX = re.compile(r"([\.\!\?])")
 
+DEFAULT_BATCH_SIZE = 64
+
 
 class AnswerParser:
     def __init__(self, nlp: Language):
@@ -31,6 +33,19 @@ class AnswerParser:
 
         doc = self.nlp(some_output.answer)  # sentence tokenize
 
+        return self._parse_doc(some_output, doc)
+
+    def parse_many(
+        self, outputs: list[Output], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> list[ParsedAnswer]:
+        """
+        Parse a list of outputs, running the answers through the spaCy pipeline
+        in batches with nlp.pipe rather than one at a time.
+        """
+        docs = self.nlp.pipe((o.answer for o in outputs), batch_size=batch_size)
+        return [self._parse_doc(o, doc) for o, doc in zip(outputs, docs)]
+
+    def _parse_doc(self, some_output: Output, doc: Doc) -> ParsedAnswer:
         parsed_sentences = []
 
         for sentence_idx, this_sent in enumerate(doc.sents):
@@ -226,7 +241,8 @@ class AnswerParser:
         )
 
     def _non_punct_word_count(self, some_text: str) -> int:
-        as_span = self.nlp(some_text)
+        # is_punct is a lexical attribute, so the tokenizer is all we need here
+        as_span = self.nlp.make_doc(some_text)
         return len([tok for tok in as_span if not tok.is_punct])
 
 
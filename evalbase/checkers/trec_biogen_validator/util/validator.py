@@ -9,7 +9,7 @@ from trec_biogen_validator.util import (
 )
 import spacy
 
-from trec_biogen_validator.util.answer import AnswerParser
+from trec_biogen_validator.util.answer import AnswerParser, DEFAULT_BATCH_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -55,13 +55,26 @@ class Validator:
         with open(path_to_submission, "r") as submission_io:
             s = Submission.model_validate(json.load(submission_io))
 
-        # visit each Output, validate it
-        for o in s.results:
-            to_ret.append(self._validate_output(o))
+        return self.validate(s)
 
-        return to_ret
+    def validate(
+        self, s: Submission, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> list[ValidationResults]:
+        """
+        Validate an already-loaded submission.  All the answers are parsed
+        in batches before any of them are checked.
+        """
+        parsed_answers = self.parser.parse_many(s.results, batch_size=batch_size)
 
-    def _validate_output(self, this_output: Output) -> ValidationResults:
+        # visit each Output, validate it
+        return [
+            self._validate_output(o, parsed)
+            for o, parsed in zip(s.results, parsed_answers)
+        ]
+
+    def _validate_output(
+        self, this_output: Output, parsed: ParsedAnswer
+    ) -> ValidationResults:
         to_ret = ValidationResults()
         to_ret.errors = []
         to_ret.warnings = []
@@ -74,7 +87,6 @@ class Validator:
                 )
             )
 
-        parsed = self.parser.parse(this_output)
         to_ret.parsed_answer = parsed
 
         # checks: length
@@ -91,7 +103,7 @@ class Validator:
             to_ret.errors.append(
                 (
                     SubmissionValidationError.TOO_MANY_SENTENCES,
-                    f"{len(this_output.sentences)} sentences found, max is {self.max_sentences_per_output}",
+                    f"{len(parsed.sentences)} sentences found, max is {self.max_sentences_per_output}",
                 )
             )
 
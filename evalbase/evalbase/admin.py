@@ -167,6 +167,12 @@ class SubmissionAdmin(admin.ModelAdmin):
         for submission in queryset:
             submission.delete()
 
+@admin.register(CheckResult)
+class CheckResultAdmin(admin.ModelAdmin):
+    list_display = ['key', 'checker', 'is_validated', 'date']
+    list_filter = ['checker', 'is_validated']
+    ordering = ['-date']
+
 @admin.register(Evaluation)
 class EvaluationAdmin(admin.ModelAdmin):
     list_display = ['get_runtag', 'get_task', 'name', 'date']
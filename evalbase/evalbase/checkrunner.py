@@ -0,0 +1,308 @@
+'''Run checker scripts with resource limits, and Python checkers in
+long-lived interpreters.
+
+Starting a fresh Python and importing a checker's modules can take longer
+than the check itself.  A WarmChecker keeps a 'python -m evalbase.checkrunner'
+process per checker script, which compiles the script once and then runs it
+for each submission as if it had been started from the command line: in the
+submission directory, with the same argv, writing <runtag>.errlog, and
+returning the exit status.
+
+Checkers run in their own process group, so that if one runs past its
+time limit the whole group (any children it started included) can be
+killed.  run_limited() and WarmChecker.run() raise CheckerTimeout when
+that happens.  Address space and CPU time are capped with setrlimit.
+
+Checkers can report how far along they are.  If the environment variable
+EVALBASE_PROGRESS is set, it names a file to append progress reports to,
+one JSON object per line, like {"lines": 120000, "topics": 35}.  While a
+checker runs, on_progress is called every PROGRESS_INTERVAL seconds so
+the caller can pick up the latest report; see read_progress().
+
+This module must not import Django, since the runner processes don't set it up.
+'''
+import json
+import logging
+import os
+import resource
+import select
+import signal
+import subprocess
+import sys
+import time
+import traceback
+from pathlib import Path
+
+PROGRESS_ENV = 'EVALBASE_PROGRESS'
+
+# Exit status for a checker that couldn't check the run at all, say because
+# a service it needs is down (EX_TEMPFAIL in sysexits.h).  Those outcomes
+# aren't cached.
+EXIT_TEMPFAIL = 75
+
+# Seconds between on_progress calls while a checker runs
+PROGRESS_INTERVAL = 5
+
+class WarmCheckerError(Exception):
+    pass
+
+class CheckerTimeout(Exception):
+    pass
+
+
+def limit_resources(memory_mb=None, cpu_seconds=None):
+    '''A preexec_fn for subprocess that caps the child's address space and
+    CPU time.  The CPU limit sends SIGXCPU, and SIGKILL a little later.'''
+    def preexec():
+        if memory_mb:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        if cpu_seconds:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+    return preexec
+
+def kill_group(proc):
+    '''Kill the process group that proc leads.'''
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def read_progress(path):
+    '''The last complete progress report in the file at path, or None.'''
+    try:
+        with open(path, 'rb') as fp:
+            fp.seek(0, os.SEEK_END)
+            fp.seek(max(fp.tell() - 4096, 0))
+            lines = fp.read().split(b'\n')
+    except OSError:
+        return None
+    # The last line is incomplete or empty
+    for line in reversed(lines[:-1]):
+        try:
+            report = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(report, dict):
+            return report
+    return None
+
+def _wait_steps(timeout, on_progress):
+    '''How long to wait at a time (None for as long as it takes) until
+    timeout seconds are up, calling on_progress in between.'''
+    deadline = None if timeout is None else time.monotonic() + timeout
+    step = PROGRESS_INTERVAL if on_progress else None
+    while True:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            return
+        if step is None or (remaining is not None and remaining < step):
+            yield remaining
+        else:
+            yield step
+        if on_progress:
+            on_progress()
+
+def run_limited(command, cwd, timeout=None, memory_mb=None, cpu_seconds=None,
+                env=None, on_progress=None):
+    '''Run command in cwd, in a new process group with the given limits, and
+    return its exit status.  Raises CheckerTimeout if it's still running
+    after timeout seconds.  Either way, anything left in the process group
+    afterwards is killed.  env adds to this process's environment.'''
+    proc = subprocess.Popen(command,
+                            cwd=cwd,
+                            stderr=subprocess.STDOUT,
+                            env={**os.environ, **env} if env else None,
+                            start_new_session=True,
+                            preexec_fn=limit_resources(memory_mb, cpu_seconds))
+    try:
+        for wait in _wait_steps(timeout, on_progress):
+            try:
+                return proc.wait(timeout=wait)
+            except subprocess.TimeoutExpired:
+                pass
+        raise CheckerTimeout(f'{command[0]} ran for more than {timeout} seconds')
+    finally:
+        kill_group(proc)
+        proc.wait()
+
+class WarmChecker:
+    '''The parent side of a checker runner process for one script.
+    The process is started on first use and restarted if it dies.
+    Its address space is capped at memory_mb; CPU time is limited per run.'''
+
+    def __init__(self, script_path, memory_mb=None):
+        self.script_path = str(script_path)
+        self.memory_mb = memory_mb
+        self.proc = None
+
+    def start(self):
+        self.proc = subprocess.Popen([sys.executable, '-m', 'evalbase.checkrunner'],
+                                     stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE,
+                                     text=True,
+                                     cwd=Path(__file__).parent.parent,
+                                     start_new_session=True,
+                                     preexec_fn=limit_resources(self.memory_mb))
+
+    def run(self, args, cwd, timeout=None, cpu_seconds=None, env=None, on_progress=None):
+        '''Run the checker with args in cwd, and return its exit status.
+        If it takes more than timeout seconds, the runner is killed and
+        CheckerTimeout is raised.  env is set in the runner for this run.'''
+        if self.proc is None or self.proc.poll() is not None:
+            self.start()
+
+        request = {'script': self.script_path,
+                   'args': [str(a) for a in args],
+                   'cwd': str(cwd),
+                   'cpu_seconds': cpu_seconds,
+                   'env': env or {}}
+        try:
+            self.proc.stdin.write(json.dumps(request) + '\n')
+            self.proc.stdin.flush()
+            for wait in _wait_steps(timeout, on_progress):
+                ready, _, _ = select.select([self.proc.stdout], [], [], wait)
+                if ready:
+                    break
+            else:
+                self.close()
+                raise CheckerTimeout(f'{self.script_path} ran for more than {timeout} seconds')
+            reply = self.proc.stdout.readline()
+        except OSError:
+            reply = None
+        if not reply:
+            try:
+                returncode = self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                returncode = None
+            self.close()
+            if returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+                # Killed for going over its limits, like a cold checker would be
+                return 128 - returncode
+            raise WarmCheckerError(f'Checker runner for {self.script_path} died')
+        return json.loads(reply)['status']
+
+    def close(self):
+        if self.proc is not None:
+            kill_group(self.proc)
+            self.proc.wait()
+            self.proc = None
+
+
+_warm_checkers = {}
+
+def run_warm(script_path, args, cwd, timeout=None, memory_mb=None, cpu_seconds=None,
+             env=None, on_progress=None):
+    '''Run a checker script in this process's warm runner for it.'''
+    key = (str(script_path), memory_mb)
+    if key not in _warm_checkers:
+        _warm_checkers[key] = WarmChecker(script_path, memory_mb)
+    return _warm_checkers[key].run(args, cwd, timeout=timeout, cpu_seconds=cpu_seconds,
+                                   env=env, on_progress=on_progress)
+
+
+# The runner process side.
+
+_compiled = {}
+
+def _all_loggers():
+    return [logging.getLogger(), *[logger for logger in logging.Logger.manager.loggerDict.values()
+                                   if isinstance(logger, logging.Logger)]]
+
+def _limit_cpu(cpu_seconds):
+    '''Allow cpu_seconds more CPU time from now.  The runner lives for many
+    runs, so the limit is on top of the time already used.'''
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    else:
+        soft = hard
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def run_script(script_path, args, cwd, cpu_seconds=None, env=None):
+    '''Run a checker script as __main__ in this interpreter and return its exit
+    status.  Modules the script imports stay loaded for the next run.'''
+    mtime = os.stat(script_path).st_mtime_ns
+    if _compiled.get(script_path, (None,))[0] != mtime:
+        with open(script_path, 'rb') as fp:
+            _compiled[script_path] = (mtime, compile(fp.read(), script_path, 'exec'))
+    code = _compiled[script_path][1]
+
+    saved_argv = sys.argv
+    saved_path = list(sys.path)
+    saved_cwd = os.getcwd()
+    saved_handlers = { logger: list(logger.handlers) for logger in _all_loggers() }
+    saved_env = { name: os.environ.get(name) for name in env or {} }
+    saved_stdout, saved_stderr = sys.stdout, sys.stderr
+
+    # Look like 'cd cwd; script_path *args'
+    sys.argv = [script_path, *args]
+    sys.path.insert(0, str(Path(script_path).parent))
+    os.chdir(cwd)
+    os.environ.update(env or {})
+    _limit_cpu(cpu_seconds)
+    try:
+        exec(code, {'__name__': '__main__',
+                    '__file__': script_path,
+                    '__builtins__': __builtins__})
+        status = 0
+    except SystemExit as e:
+        if e.code is None:
+            status = 0
+        elif isinstance(e.code, int):
+            status = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+    finally:
+        # Some checkers point sys.stdout at their errlog.  Close any
+        # replacement, so it's written out and doesn't get the next run's
+        # output.
+        for stream, saved in ((sys.stdout, saved_stdout), (sys.stderr, saved_stderr)):
+            try:
+                if stream is not saved:
+                    stream.close()
+                else:
+                    stream.flush()
+            except (OSError, ValueError):
+                pass
+        sys.stdout, sys.stderr = saved_stdout, saved_stderr
+        # Checkers often attach log handlers (to the errlog, say) at
+        # module level.  Drop them so they don't leak into the next run.
+        for logger in _all_loggers():
+            for handler in list(logger.handlers):
+                if handler not in saved_handlers.get(logger, []):
+                    logger.removeHandler(handler)
+                    handler.close()
+        sys.argv = saved_argv
+        sys.path[:] = saved_path
+        os.chdir(saved_cwd)
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return status % 256
+
+
+def serve():
+    '''Read run requests from stdin, one JSON object per line, and reply
+    on stdout.  Anything the checkers print goes to stderr.'''
+    replies = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+    for line in sys.stdin:
+        request = json.loads(line)
+        status = run_script(request['script'], request['args'], request['cwd'],
+                            cpu_seconds=request.get('cpu_seconds'),
+                            env=request.get('env'))
+        print(json.dumps({'status': status}), file=replies, flush=True)
+
+
+if __name__ == '__main__':
+    serve()
@@ -5,11 +5,119 @@ from django.http import Http404, HttpResponseRedirect
 from django.db.models import Q
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from .models import *
 
 # These permission decorators follow a general API pattern,
 # where keywords in the URLconf that are retrieved from
 # the database are returned as extra kwargs entries.
+#
+# The objects themselves come from the request's RequestAuth, so
+# stacking several decorators, and the view asking again, doesn't
+# look anything up twice.
+
+class RequestAuth:
+    '''What the permission checks need to know about a request: the
+    conference, task, org and run named in the URL, and the user's orgs,
+    coordinated tracks and signed agreements in that conference.  Each is
+    looked up the first time it's asked for and kept for the rest of the
+    request.  Missing URL objects raise Http404.'''
+
+    def __init__(self, request, kwargs):
+        self.request = request
+        self.user = request.user
+        self.kwargs = kwargs
+
+    def _kwarg(self, name):
+        if name not in self.kwargs:
+            raise Http404(f'No such {name}')
+        return self.kwargs[name]
+
+    @cached_property
+    def conf(self):
+        return get_object_or_404(Conference, shortname=self._kwarg('conf'))
+
+    @cached_property
+    def task(self):
+        return get_object_or_404(Task.objects.select_related('track'),
+                                 shortname=self._kwarg('task'),
+                                 track__conference=self.conf)
+
+    @cached_property
+    def track(self):
+        if 'task' in self.kwargs:
+            return self.task.track
+        return get_object_or_404(Track,
+                                 shortname=self._kwarg('track'),
+                                 conference=self.conf)
+
+    @cached_property
+    def org(self):
+        return get_object_or_404(Organization,
+                                 shortname=self._kwarg('org'),
+                                 conference=self.conf)
+
+    @cached_property
+    def sub(self):
+        runs = Submission.objects.select_related('task__track__conference', 'org', 'submitted_by')
+        return get_object_or_404(runs,
+                                 task__track__conference=self.conf,
+                                 runtag=self._kwarg('runtag'))
+
+    @cached_property
+    def orgs(self):
+        '''The orgs in this conference that the user is a member of.'''
+        return list(Organization.objects
+                    .filter(conference=self.conf)
+                    .filter(members__pk=self.user.pk))
+
+    @cached_property
+    def coordinated_tracks(self):
+        '''The pks of the tracks in this conference that the user coordinates.'''
+        return set(Track.objects
+                   .filter(conference=self.conf)
+                   .filter(coordinators__pk=self.user.pk)
+                   .values_list('pk', flat=True))
+
+    def is_coordinator(self, track):
+        return self.user.is_staff or track.pk in self.coordinated_tracks
+
+    @cached_property
+    def agreements(self):
+        return list(self.conf.agreements.all())
+
+    @cached_property
+    def signed_agreements(self):
+        '''The pks of the conference's agreements that the user has signed.
+        These are looked up on every request, so a signature that's deleted
+        stops counting straight away.'''
+        if not self.agreements:
+            return set()
+        return set(Signature.objects
+                   .filter(user__pk=self.user.pk)
+                   .filter(agreement__in=self.agreements)
+                   .values_list('agreement_id', flat=True))
+
+    @cached_property
+    def unsigned_agreements(self):
+        return [ag for ag in self.agreements if ag.pk not in self.signed_agreements]
+
+
+def has_signed(user, agreement):
+    '''Whether the user has signed the agreement.'''
+    return (Signature.objects
+            .filter(user__pk=user.pk)
+            .filter(agreement=agreement)
+            .exists())
+
+
+def request_auth(request, kwargs):
+    '''The RequestAuth for this request, made on first use.'''
+    auth = getattr(request, '_evalbase_auth', None)
+    if auth is None:
+        auth = request._evalbase_auth = RequestAuth(request, kwargs)
+    return auth
+
 
 def evalbase_login_required(view_func):
     '''A convenience wrapper around the Django login_required
@@ -24,20 +132,17 @@ def user_is_member_of_org(view_func):
     '''Confirm that the request.user is a member of the org named
     by the kwargs 'org' and 'conf'
     kwargs: org, conf
-    returns: _org
+    returns: _org, _conf
     '''
     @functools.wraps(view_func)
     def wrapped_view(request, *args, **kwargs):
         if 'org' not in kwargs or 'conf' not in kwargs:
             raise Http404('No such org or conf')
-        org = get_object_or_404(Organization,
-                                shortname=kwargs['org'],
-                                conference__shortname=kwargs['conf'])
-        if (org.owner == request.user or
-            org.members.filter(pk=request.user.pk).exists()):
+        auth = request_auth(request, kwargs)
+        org = auth.org
+        if (org.owner_id == request.user.pk or org in auth.orgs):
             kwargs['_org'] = org
-            kwargs['_conf'] = get_object_or_404(Conference,
-                                                shortname=kwargs['conf'])
+            kwargs['_conf'] = auth.conf
             return view_func(request, *args, **kwargs)
         raise PermissionDenied('User is not member of org')
     return wrapped_view
@@ -47,19 +152,17 @@ def user_owns_org(view_func):
     '''Confirm that the request.user is the owner of the org
     named by the kwarg 'org'.
     kwargs: org
-    returns: _org
+    returns: _org, _conf
     '''
     @functools.wraps(view_func)
     def wrapped_view(request, *args, **kwargs):
         if 'org' not in kwargs or 'conf' not in kwargs:
             raise Http404('No such org or conf')
-        org = get_object_or_404(Organization,
-                                shortname=kwargs['org'],
-                                conference__shortname=kwargs['conf'])
-        if (org.owner == request.user):
+        auth = request_auth(request, kwargs)
+        org = auth.org
+        if (org.owner_id == request.user.pk):
             kwargs['_org'] = org
-            kwargs['_conf'] = get_object_or_404(Conference,
-                                                shortname=kwargs['conf'])
+            kwargs['_conf'] = auth.conf
             return view_func(request, *args, **kwargs)
         raise PermissionDenied('User is not org owner')
     return wrapped_view
@@ -76,14 +179,12 @@ def user_is_active_participant(view_func):
     def wrapped_view(request, *args, **kwargs):
         if 'conf' not in kwargs:
             raise Http404('No such conf')
-        valid_orgs = (Organization.objects
-                      .filter(conference__shortname=kwargs['conf'])
-                      .filter(members__pk=request.user.pk))
+        auth = request_auth(request, kwargs)
         subs = (Submission.objects
-                .filter(task__conference__shortname=kwargs['conf'])
-                .filter(submitted_by_in=valid_orgs))
+                .filter(task__track__conference=auth.conf)
+                .filter(org__in=auth.orgs))
         if subs:
-            kwargs['_valid_orgs'] = valid_orgs
+            kwargs['_valid_orgs'] = auth.orgs
             kwargs['_subs'] = subs
             return view_func(request, *args, **kwargs)
         raise PermissionDenied('User is not active participant')
@@ -96,17 +197,16 @@ def user_is_participant(view_func):
     the same permission as user_is_member_of_org, except there's
     no org in kwargs.
     kwargs: conf
-    returns: _valid_orgs
+    returns: _valid_orgs, _conf
     '''
     @functools.wraps(view_func)
     def wrapped_view(request, *args, **kwargs):
         if 'conf' not in kwargs:
             raise Http404('No such conf')
-        valid_orgs = (Organization.objects
-                      .filter(conference__shortname=kwargs['conf'])
-                      .filter(members__pk=request.user.pk))
-        if valid_orgs:
-            kwargs['_valid_orgs'] = valid_orgs
+        auth = request_auth(request, kwargs)
+        if auth.orgs:
+            kwargs['_valid_orgs'] = auth.orgs
+            kwargs['_conf'] = auth.conf
             return view_func(request, *args, **kwargs)
         raise PermissionDenied('User is not a member of a participating group')
     return wrapped_view
@@ -114,27 +214,22 @@ def user_is_participant(view_func):
 def user_is_track_coordinator(view_func):
     '''Confirm that the user is a coordinator for this task.
     Staff are coordinators for all tasks.
+    kwargs: conf, and task or track
+    returns: _is_coord
     '''
     @functools.wraps(view_func)
     def wrapped_view(request, *args, **kwargs):
+        if 'conf' not in kwargs:
+            raise Http404('No such conf')
+        auth = request_auth(request, kwargs)
         if request.user.is_staff:
-            if 'conf' not in kwargs:
-                raise Http404('No such conf')
-            is_coord = (Track.objects.
-                        filter(conference__shortname=kwargs['conf']))
+            is_coord = (Track.objects
+                        .filter(conference=auth.conf)
+                        .exists())
         else:
-            if 'conf' not in kwargs:
-                raise Http404('No such conf')
-            if 'task' in kwargs:
-                task = get_object_or_404(Task, track__conference__shortname=kwargs['conf'],
-                                        shortname=kwargs['task'])
-                track = task.track
-            elif 'track' in kwargs:
-                track = get_object_or_404(Track, conference__shortname=kwargs['conf'],
-                                          shortname=kwargs['track'])
-            if not track:
+            if 'task' not in kwargs and 'track' not in kwargs:
                 raise Http404('No such track')
-            is_coord = track.coordinators.filter(pk=request.user.pk)
+            is_coord = auth.is_coordinator(auth.track)
 
         if is_coord:
             kwargs['_is_coord'] = is_coord
@@ -163,11 +258,9 @@ def user_may_edit_submission(view_func):
     def wrapped_view(request, *args, **kwargs):
         if 'conf' not in kwargs or 'runtag' not in kwargs:
             raise Http404('No such conf or runtag')
-        sub = get_object_or_404(Submission,
-                                Q(task__track__conference__shortname=kwargs['conf']) &
-                                Q(runtag=kwargs['runtag']))
-        if (sub.submitted_by == request.user or
-            request.user == sub.org.owner):
+        sub = request_auth(request, kwargs).sub
+        if (sub.submitted_by_id == request.user.pk or
+            sub.org.owner_id == request.user.pk):
             kwargs['_sub'] = sub
             return view_func(request, *args, **kwargs)
         raise PermissionDenied('User may not edit submission')
@@ -183,7 +276,7 @@ def conference_is_open(view_func):
     def wrapped_view(request, *args, **kwargs):
         if 'conf' not in kwargs:
             raise Http404('No such conf')
-        conf = get_object_or_404(Conference, shortname=kwargs['conf'])
+        conf = request_auth(request, kwargs).conf
         if not conf.complete:
             kwargs['_conf'] = conf
             return view_func(request, *args, **kwargs)
@@ -200,11 +293,10 @@ def task_is_open(view_func):
     def wrapped_view(request, *args, **kwargs):
         if 'conf' not in kwargs or 'task' not in kwargs:
             raise Http404('No such conf or task')
-        conf = get_object_or_404(Conference, shortname=kwargs['conf'])
-        task = get_object_or_404(Task, shortname=kwargs['task'], track__conference=conf)
-        if task.task_open:
-            kwargs['_conf'] = conf
-            kwargs['_task'] = task
+        auth = request_auth(request, kwargs)
+        if auth.task.task_open:
+            kwargs['_conf'] = auth.conf
+            kwargs['_task'] = auth.task
             return view_func(request, *args, **kwargs)
         raise PermissionDenied('Task is not open')
     return wrapped_view
@@ -217,20 +309,13 @@ def agreements_signed(view_func):
     def wrapped_view(request, *args, **kwargs):
         if 'conf' not in kwargs:
             raise Http404('No such conf')
-        conf = get_object_or_404(Conference, shortname=kwargs['conf'])
-        signed = True
-        for ag in conf.agreements.all():
-            signed = False
-            to_sign = ag
-            for sig in ag.signature_set.all():
-                if sig.user == request.user:
-                    signed = True
-        if not signed:
+        auth = request_auth(request, kwargs)
+        if auth.unsigned_agreements:
             # raise PermissionDenied('You haven\'t signed the necessary agreements')
             return HttpResponseRedirect(
                 reverse('sign-agreement',
-                        kwargs={'conf': conf,
-                                'agreement': to_sign}))
+                        kwargs={'conf': auth.conf,
+                                'agreement': auth.unsigned_agreements[0]}))
 
         return view_func(request, *args, **kwargs)
     return wrapped_view
@@ -244,12 +329,9 @@ def check_conf_and_task(view_func):
     def wrapped_view(request, *args, **kwargs):
         if 'conf' not in kwargs or 'task' not in kwargs:
             raise Http404('No such conf')
-        conf = get_object_or_404(Conference, shortname=kwargs['conf'])
-        task = get_object_or_404(Task, shortname=kwargs['task'],
-                                 track__conference=conf)
-
-        kwargs['_conf'] = conf
-        kwargs['_task'] = task
+        auth = request_auth(request, kwargs)
+        kwargs['_conf'] = auth.conf
+        kwargs['_task'] = auth.task
         return view_func(request, *args, **kwargs)
     return wrapped_view
 
@@ -261,9 +343,7 @@ def check_conf(view_func):
     def wrapped_view(request, *args, **kwargs):
         if 'conf' not in kwargs:
             raise Http404('No such conf')
-        conf = get_object_or_404(Conference, shortname=kwargs['conf'])
-        
-        kwargs['_conf'] = conf
+        kwargs['_conf'] = request_auth(request, kwargs).conf
         return view_func(request, *args, **kwargs)
     return wrapped_view
 
@@ -276,7 +356,7 @@ def conference_in_event_phase(view_func):
         if '_conf' in kwargs:
             conf = kwargs['_conf']
         elif 'conf' in kwargs:
-            conf = get_object_or_404(Conference, shortname=kwargs['conf'])
+            conf = request_auth(request, kwargs).conf
             kwargs['_conf'] = conf
         else:
             raise Http404('No such conf')
@@ -286,4 +366,3 @@ def conference_in_event_phase(view_func):
         else:
             raise Http404('Conference not in event phase')
     return wrapped_view
-       
\ No newline at end of file
@@ -90,16 +90,16 @@ class RuntagField(forms.Field):
                            message='Runtags can be at most 20 characters long'),
     ]
 
-    def __init__(self, existing_runtags, *args, **kwargs):
+    def __init__(self, conference, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.existing_runtags = existing_runtags
+        self.conference = conference
 
     def to_python(self, value):
         return super().to_python(value)
     
     def validate(self, value):
         super().validate(value)
-        if value in self.existing_runtags:
+        if runtag_taken(self.conference, value):
             raise ValidationError(
                 _('Another submission with the runtag %(runtag)s has already been submitted'),
                 params={'runtag': value}
@@ -112,39 +112,59 @@ class RuntagField(forms.Field):
                 _('Runtags must be in ASCII'))
 
 class SubmitFormForm(forms.Form):
+    '''Submission forms are built from the SubmitFormFields of a SubmitForm.
+    get_form_class() compiles a form class for a SubmitForm once and keeps it
+    until the form's revision changes; the conference and task, the parts
+    that depend on who is submitting (their name, email and orgs) and the
+    runtag check are filled in when the form is made, from the same context:
+
+        form_class = SubmitFormForm.get_form_class(context)
+        form = form_class(request.POST, request.FILES, context=context)
+    '''
+
+    def __init__(self, *args, context, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['conf'].initial = context['conf'].shortname
+        self.fields['task'].initial = context['task'].shortname
+        self.fields['user'].widget.attrs['value'] = context['user'].username
+        self.fields['email'].widget.attrs['value'] = context['user'].email
+        self.fields['org'].choices = [(org.shortname, org.longname)
+                                      for org in context['orgs']]
+        if 'runtag' in self.fields:
+            self.fields['runtag'].conference = context['conf']
+
     def get_form_class(context):
+        submit_form = context['form']
+        key = (submit_form.pk, submit_form.revision, context['mode'])
+        if key not in _form_classes:
+            for old_key in [k for k in _form_classes if k[0] == submit_form.pk]:
+                del _form_classes[old_key]
+            _form_classes[key] = SubmitFormForm.compile(context)
+        return _form_classes[key]
+
+    def compile(context):
         fields = {}
         # Set up standard fields
-        fields['conf'] = forms.CharField(
-            widget=forms.HiddenInput(),
-            initial=context['conf'].shortname)
-        fields['task'] = forms.CharField(
-            widget=forms.HiddenInput(),
-            initial=context['task'].shortname)
+        fields['conf'] = forms.CharField(widget=forms.HiddenInput())
+        fields['task'] = forms.CharField(widget=forms.HiddenInput())
         fields['user'] = forms.CharField(
             label='User name',
             widget=forms.TextInput(
-                attrs={'value': context['user'].username,
-                       'readonly': 'readonly',
+                attrs={'readonly': 'readonly',
                        'class': 'form-control-plaintext'}))
         fields['email'] = forms.EmailField(
             label='Email',
             widget=forms.EmailInput(
-                attrs={'value': context['user'].email,
-                       'readonly': 'readonly',
+                attrs={'readonly': 'readonly',
                        'class': 'form-control-plaintext'}))
-        org_choices = list(map(lambda x: (x.shortname, x.longname), context['orgs']))
-        fields['org'] = forms.ChoiceField(label='Organization', choices=org_choices)
+        fields['org'] = forms.ChoiceField(label='Organization')
 
         if context['mode'] == 'submit':
             fields['runfile'] = forms.FileField(label='Submission file')
             if context['track'].shortname != 'papers':
-                existing_runtags = set(Submission.objects
-                                    .filter(task__track__conference=context['conf'])
-                                    .values_list('runtag', flat=True))
                 fields['runtag'] = RuntagField(
                     label='Runtag: a short identifier for the run (letters, numbers, underscores, periods (not first character) or hyphens only, 20 characters or less)',
-                    existing_runtags=existing_runtags)
+                    conference=None)
 
         # Set up custom fields
         other_fields = (SubmitFormField.objects
@@ -165,6 +185,7 @@ class SubmitFormForm(forms.Form):
 
             elif field.question_type == SubmitFormField.QuestionType.CHECKBOX:
                 if field.choices.startswith('TRACKS'):
+                    # The queryset is run again for each form
                     fields[field. meta_key] = forms.ModelMultipleChoiceField(
                         label=field.question,
                         widget=forms.CheckboxSelectMultiple,
@@ -194,4 +215,7 @@ class SubmitFormForm(forms.Form):
             fields[field.meta_key].blank = not field.required
             fields[field.meta_key].help_text = field.help_text
 
-        return type('SubmitFormForm', (forms.Form,), fields)
+        return type('SubmitFormForm', (SubmitFormForm,), fields)
+
+# Compiled submission form classes, by (SubmitForm pk, revision, mode)
+_form_classes = {}
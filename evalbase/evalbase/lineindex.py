@@ -0,0 +1,133 @@
+'''Byte-offset line indexes for evaluation output files.
+
+Per-topic eval outputs can run to tens of MB.  A LineIndex records where
+each line of the file starts and which measure and topic it's for, so a
+page of lines, or the lines for one measure or topic, can be read by
+seeking straight to them.  The index is saved next to the eval file as
+<file>.idx.npz and rebuilt if the file changes.
+
+This module doesn't use Django.
+'''
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+def index_path(path):
+    return Path(f'{path}.idx.npz')
+
+
+class LineIndex:
+    def __init__(self, offsets, measures, topics, measure_codes, topic_codes):
+        # offsets has one more entry than there are lines, the file size
+        self.offsets = offsets
+        self.measures = measures
+        self.topics = topics
+        self.measure_codes = measure_codes
+        self.topic_codes = topic_codes
+
+    def __len__(self):
+        return len(self.measure_codes)
+
+    @classmethod
+    def build(cls, path, measure_field, topic_field):
+        '''Index the file at path, whose lines are whitespace-separated
+        fields with the measure and topic in the given columns.  Lines
+        without those columns get code -1 for both.'''
+        offsets = [0]
+        measures = {}
+        topics = {}
+        measure_codes = []
+        topic_codes = []
+        with open(path, 'rb') as fp:
+            for line in fp:
+                offsets.append(offsets[-1] + len(line))
+                fields = line.split()
+                if len(fields) > max(measure_field, topic_field):
+                    measure = fields[measure_field].decode('utf-8', errors='replace')
+                    topic = fields[topic_field].decode('utf-8', errors='replace')
+                    measure_codes.append(measures.setdefault(measure, len(measures)))
+                    topic_codes.append(topics.setdefault(topic, len(topics)))
+                else:
+                    measure_codes.append(-1)
+                    topic_codes.append(-1)
+        return cls(np.array(offsets, dtype=np.int64),
+                   list(measures),
+                   list(topics),
+                   np.array(measure_codes, dtype=np.int32),
+                   np.array(topic_codes, dtype=np.int32))
+
+    def save(self, path, stamp):
+        with open(path, 'wb') as fp:
+            np.savez(fp,
+                     stamp=np.array(stamp, dtype=np.int64),
+                     offsets=self.offsets,
+                     measures=np.array(self.measures, dtype=str),
+                     topics=np.array(self.topics, dtype=str),
+                     measure_codes=self.measure_codes,
+                     topic_codes=self.topic_codes)
+
+    @classmethod
+    def load(cls, path, stamp):
+        '''Load a saved index, or return None if it's missing or was built
+        from a different version of the file.'''
+        try:
+            with np.load(path) as data:
+                if data['stamp'].tolist() != list(stamp):
+                    return None
+                return cls(data['offsets'],
+                           data['measures'].tolist(),
+                           data['topics'].tolist(),
+                           data['measure_codes'],
+                           data['topic_codes'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def select(self, measure=None, topic=None):
+        '''The numbers of the lines for a measure and/or topic, or all lines.'''
+        selected = np.ones(len(self), dtype=bool)
+        if measure is not None:
+            if measure not in self.measures:
+                return np.array([], dtype=np.int64)
+            selected &= self.measure_codes == self.measures.index(measure)
+        if topic is not None:
+            if topic not in self.topics:
+                return np.array([], dtype=np.int64)
+            selected &= self.topic_codes == self.topics.index(topic)
+        return np.flatnonzero(selected)
+
+    def read_lines(self, path, line_numbers):
+        '''Read the given lines from the file, without their newlines.'''
+        lines = []
+        with open(path, 'rb') as fp:
+            for n in line_numbers:
+                fp.seek(self.offsets[n])
+                line = fp.read(self.offsets[n + 1] - self.offsets[n])
+                lines.append(line.decode('utf-8', errors='replace').rstrip('\r\n'))
+        return lines
+
+
+# how many indexes to keep in memory
+MAX_INDEXES = 32
+
+_indexes = {}
+
+def line_index(path, measure_field, topic_field):
+    '''The LineIndex for the file at path, loaded from its saved index or
+    built and saved if that's missing or out of date.  Indexes are also
+    kept in memory until the file changes.'''
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_mtime_ns, measure_field, topic_field)
+    memo_key = (str(path), *stamp)
+    if memo_key not in _indexes:
+        index = LineIndex.load(index_path(path), stamp)
+        if index is None:
+            index = LineIndex.build(path, measure_field, topic_field)
+            index.save(index_path(path), stamp)
+        for key in [k for k in _indexes if k[0] == str(path)]:
+            del _indexes[key]
+        while len(_indexes) >= MAX_INDEXES:
+            del _indexes[next(iter(_indexes))]
+        _indexes[memo_key] = index
+    return _indexes[memo_key]
@@ -1,10 +1,40 @@
-import json
 import os
-from pathlib import Path
+import shutil
 import sys
-from django.core.files import File
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand, CommandError
-from evalbase.models import Task, Submission, Evaluation
+from django.db import transaction
+from django.utils import timezone
+from evalbase.lineindex import index_path
+from evalbase.models import Task, Submission, Evaluation, get_eval_path
+from evalbase.utils import file_digest
+
+
+def index_directory(startpath, suffix):
+    '''Map the names of files under startpath ending in suffix to their
+    paths, walking the directory once.  If a name appears more than once,
+    the first one found wins.'''
+    found = {}
+    for root, dirs, files in os.walk(startpath):
+        dirs.sort()
+        for filename in files:
+            if filename.endswith(suffix):
+                found.setdefault(filename, Path(root) / filename)
+    return found
+
+
+def copy_eval(source, dest):
+    '''Copy an eval file to a temporary name next to dest, and return it.'''
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + '.importing')
+    shutil.copyfile(source, tmp)
+    if settings.FILE_UPLOAD_PERMISSIONS is not None:
+        os.chmod(tmp, settings.FILE_UPLOAD_PERMISSIONS)
+    return tmp
+
 
 class Command(BaseCommand):
     help = 'Import evaluation outputs for a task.'
@@ -27,18 +57,17 @@ class Command(BaseCommand):
                             default=Path('.'))
 
         parser.add_argument('-f', '--force',
-                            help='Overwrite existing evals',
+                            help='Overwrite existing evals, even if they are unchanged',
                             action='store_true')
-        
+
         parser.add_argument('-m', '--missing-ok',
                             help='Skip over missing evaluations with a warning',
                             action='store_true')
 
-    def find(filename, startpath):
-        for root, dir, files in os.walk(startpath):
-            if filename in files:
-                return Path(root) / filename
-        return None
+        parser.add_argument('-j', '--jobs',
+                            help='Number of files to copy at once',
+                            type=int,
+                            default=8)
 
     def handle(self, *args, **options):
         if options['task'] == 'list':
@@ -52,35 +81,96 @@ class Command(BaseCommand):
             if not task:
                 raise CommandError(f'Task {options["task"]} not found')
 
-            eval = options['eval']
-
-            for run in Submission.objects.filter(task=task):
-                evalfile = f'{run.runtag}.{eval}'
-                evalpath = Command.find(evalfile, options['directory'])
-                if not evalpath:
-                    evalfile = evalfile.replace(' ', '_')
-                    evalpath = Command.find(evalfile, options['directory'])
-                    if not evalpath:
-                        if args.missing_ok:
-                            print(f'Can\'t find {eval} eval for run {run.runtag}', file=sys.stderr)
-                        else:
-                            raise CommandError(f'Can\'t find {eval} eval for run {run.runtag}')
-
-                try:
-                    old_eval = Evaluation.objects.get(submission=run, name=eval)
-                    if old_eval:
-                        if options['force']:
-                            old_eval.delete()
-                        else:
-                            raise CommandError(f'Found existing eval.  To overwrite, use -f')
-                except Evaluation.DoesNotExist:
-                    pass
-
-                new_eval = Evaluation()
-                new_eval.name = eval
-                new_eval.submission = run
-                with evalpath.open(mode='r') as fp:
-                    new_eval.filename = File(fp, name=evalpath.name)
-                    new_eval.save()
-
-                print(f'Evaluation {eval} for {run.runtag} imported.')
+            self.import_evals(task, options)
+
+    def import_evals(self, task, options):
+        eval = options['eval']
+        found = index_directory(options['directory'], f'.{eval}')
+        runs = (Submission.objects
+                .filter(task=task)
+                .select_related('task__track__conference'))
+        existing = { e.submission_id: e for e in
+                     Evaluation.objects.filter(submission__task=task, name=eval) }
+
+        # Work out what to do with every run before changing anything.
+        to_import = []
+        unchanged = 0
+        for run in runs:
+            evalfile = f'{run.runtag}.{eval}'
+            evalpath = found.get(evalfile) or found.get(evalfile.replace(' ', '_'))
+            if not evalpath:
+                if options['missing_ok']:
+                    print(f'Can\'t find {eval} eval for run {run.runtag}', file=sys.stderr)
+                    continue
+                raise CommandError(f'Can\'t find {eval} eval for run {run.runtag}')
+
+            old_eval = existing.get(run.pk)
+            if old_eval and not options['force']:
+                old_path = Path(old_eval.filename.path)
+                if old_path.exists() and file_digest(old_path) == file_digest(evalpath):
+                    unchanged += 1
+                    continue
+                raise CommandError(f'Found existing eval for {run.runtag}.  To overwrite, use -f')
+
+            new_eval = old_eval or Evaluation(name=eval)
+            new_eval.submission = run
+            to_import.append((new_eval, evalpath))
+
+        if to_import:
+            self.copy_and_save(to_import, options['jobs'])
+        for new_eval, evalpath in to_import:
+            print(f'Evaluation {eval} for {new_eval.submission.runtag} imported.')
+        print(f'{len(to_import)} imported, {unchanged} unchanged.')
+
+    def copy_and_save(self, to_import, jobs):
+        '''Copy the eval files next to where they go in parallel, then save
+        the Evaluations and their Scores in one transaction.  The files are
+        moved into place once that commits, so if it doesn't the old files
+        are left as they were.'''
+        dests = []
+        for new_eval, evalpath in to_import:
+            name = str(get_eval_path(new_eval, evalpath.name))
+            dests.append((name, Path(default_storage.path(name))))
+
+        with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+            tmps = list(pool.map(copy_eval,
+                                 [evalpath for _, evalpath in to_import],
+                                 [dest for _, dest in dests]))
+
+        old_files = []
+        def install():
+            for (_, dest), tmp in zip(dests, tmps):
+                os.replace(tmp, dest)
+            for path in old_files:
+                Path(path).unlink(missing_ok=True)
+                index_path(path).unlink(missing_ok=True)
+            for new_eval, _ in to_import:
+                new_eval.line_index()
+
+        try:
+            today = timezone.now().date()
+            with transaction.atomic():
+                for (new_eval, _), (name, _) in zip(to_import, dests):
+                    if new_eval.pk and new_eval.filename.name != name:
+                        old_files.append(new_eval.filename.path)
+                    new_eval.filename.name = name
+                    new_eval.date = today
+                created = [e for e, _ in to_import if e.pk is None]
+                Evaluation.objects.bulk_create(created)
+                if created and created[0].pk is None:
+                    # MySQL doesn't return the new ids
+                    pks = dict(Evaluation.objects
+                               .filter(submission__in=[e.submission_id for e in created],
+                                       name=created[0].name)
+                               .values_list('submission_id', 'pk'))
+                    for e in created:
+                        e.pk = pks[e.submission_id]
+                Evaluation.objects.bulk_update([e for e, _ in to_import if e.pk is not None],
+                                               ['filename', 'date'])
+                for (new_eval, _), tmp in zip(to_import, tmps):
+                    new_eval.load_scores(path=tmp)
+                transaction.on_commit(install)
+        except BaseException:
+            for tmp in tmps:
+                tmp.unlink(missing_ok=True)
+            raise
@@ -1,6 +1,41 @@
+import collections
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from evalbase.models import Submission, Task
 from evalbase.views import run_check_script
+from evalbase import tasks
+
+# How many of the slowest runs the --bulk summary lists
+SLOWEST_RUNS = 10
+
+def check_one(sub_pk, use_cache):
+    '''Check one submission in this process and return
+    (pk, name, checker, state, seconds, error).  Warm interpreters are kept
+    per process, so each pool worker starts a checker at most once.'''
+    sub = Submission.objects.select_related('task__track__conference').get(pk=sub_pk)
+    checker = sub.task.checker_file
+    start = time.monotonic()
+    error = None
+    try:
+        # Report timeouts in the summary rather than queueing retries
+        tasks.check_submission(sub, checker, use_cache=use_cache,
+                               attempt=settings.CHECKER_RETRIES)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    sub.refresh_from_db(fields=['is_validated'])
+    return (sub.pk, str(sub), checker.split()[0], sub.is_validated,
+            time.monotonic() - start, error)
+
+def check_failed(sub_pk, e):
+    '''The result for a check that check_one couldn't report itself, because
+    it raised or its worker process died.'''
+    return (sub_pk, f'submission {sub_pk}', None, None, 0.0, f'{type(e).__name__}: {e}')
+
 
 class Command(BaseCommand):
     help = 'Kick validation for any submissions waiting for validation in the specified task'
@@ -9,13 +44,36 @@ class Command(BaseCommand):
         parser.add_argument('-f', '--force',
                             action='store_true',
                             help='Force validation to run on all submissions')
+        parser.add_argument('-n', '--no-cache',
+                            action='store_true',
+                            help='Run the checker even if the run file, checker, and aux files are unchanged since the last check')
         parser.add_argument('-r', '--run',
                             help='Run validation for a specific run (default is all runs)',
                             default=None)
+        parser.add_argument('-b', '--bulk',
+                            action='store_true',
+                            help='Run the checks here in a process pool instead of queueing them, and summarize '
+                            '(use -v 2 to see each run as it finishes).  Timeouts are reported rather than retried later.')
+        parser.add_argument('-c', '--conf',
+                            help='Conference shortname; with --bulk and no task or track, check the whole conference',
+                            default=None)
+        parser.add_argument('-t', '--track',
+                            help='With --bulk, check all tasks in this track',
+                            default=None)
+        parser.add_argument('-j', '--jobs',
+                            type=int,
+                            default=os.cpu_count(),
+                            help='With --bulk, how many checks to run at once')
         parser.add_argument('task',
+                            nargs='?',
                             help='Run validation over all runs in a task')
 
     def handle(self, *args, **options):
+        if options['bulk']:
+            return self.bulk(**options)
+        if not options['task']:
+            raise CommandError('Which task?')
+
         task = Task.objects.get(shortname=options['task'])
         if not task:
             raise CommandError(f'Task {options["task"]} not found.')
@@ -26,7 +84,8 @@ class Command(BaseCommand):
                 if (options['force'] or
                     sub.is_validated == Submission.ValidationState.WAITING or
                     (options['run'] and sub.runtag == options['run'])):
-                    checktask = run_check_script(sub, task.checker_file)
+                    checktask = run_check_script(sub, task.checker_file,
+                                                 use_cache=not options['no_cache'])
                     print('Running', task.checker_file, 'for submission',
                             sub, '(', checktask, ')')
                     run_one = True
@@ -37,3 +96,99 @@ class Command(BaseCommand):
 
         if not run_one:
             print('No submissions to check')
+
+    def bulk_submissions(self, options):
+        '''The submissions to check in bulk mode, ordered by checker.'''
+        subs = (Submission.objects
+                .exclude(task__checker_file='')
+                .exclude(task__checker_file='NONE'))
+        if options['conf']:
+            subs = subs.filter(task__track__conference__shortname=options['conf'])
+        if options['task']:
+            subs = subs.filter(task__shortname=options['task'])
+        elif options['track']:
+            subs = subs.filter(task__track__shortname=options['track'])
+        elif not options['conf']:
+            raise CommandError('Give a task, --track, or --conf')
+        if options['run']:
+            subs = subs.filter(runtag=options['run'])
+        elif not options['force']:
+            subs = subs.filter(is_validated=Submission.ValidationState.WAITING)
+        return list(subs
+                    .order_by('task__checker_file', 'pk')
+                    .values_list('pk', flat=True))
+
+    def bulk(self, **options):
+        self.verbosity = options['verbosity']
+        sub_pks = self.bulk_submissions(options)
+        if not sub_pks:
+            print('No submissions to check')
+            return
+        use_cache = not options['no_cache']
+        jobs = max(1, min(options['jobs'] or 1, len(sub_pks)))
+        print(f'Checking {len(sub_pks)} submissions, {jobs} at a time')
+
+        results = []
+        start = time.monotonic()
+        if jobs == 1:
+            for pk in sub_pks:
+                try:
+                    results.append(check_one(pk, use_cache))
+                except Exception as e:
+                    results.append(check_failed(pk, e))
+                self.report(results[-1])
+        else:
+            # Don't let the worker processes inherit our database connections.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=jobs,
+                                     mp_context=multiprocessing.get_context('fork')) as pool:
+                futures = {pool.submit(check_one, pk, use_cache): pk for pk in sub_pks}
+                for future in as_completed(futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        results.append(check_failed(futures[future], e))
+                    self.report(results[-1])
+        self.summarize(results, time.monotonic() - start)
+
+    def report(self, result):
+        if self.verbosity < 2:
+            return
+        pk, name, checker, state, seconds, error = result
+        print(f'{name}\t{checker}\t{state}\t{seconds:.1f}s' + (f'\t{error}' if error else ''))
+
+    def summarize(self, results, elapsed):
+        states = collections.Counter(r[3] for r in results if not r[5])
+        errors = [r for r in results if r[5]]
+        print()
+        print(f'{len(results)} submissions in {elapsed:.1f}s '
+              f'({sum(r[4] for r in results):.1f}s of checking), '
+              f'{len(results) / elapsed:.2f} per second')
+        for state in Submission.ValidationState:
+            if states[state]:
+                print(f'  {state.label}: {states[state]}')
+        if errors:
+            print(f'  checker errors: {len(errors)}')
+
+        by_checker = collections.defaultdict(list)
+        for r in results:
+            if r[2] is not None:
+                by_checker[r[2]].append(r[4])
+        print()
+        print('Checker durations (runs, mean, max seconds):')
+        for checker, durations in sorted(by_checker.items()):
+            print(f'  {checker}\t{len(durations)}\t'
+                  f'{sum(durations) / len(durations):.1f}\t{max(durations):.1f}')
+
+        failed = [r for r in results
+                  if r[5] or r[3] != Submission.ValidationState.SUCCESS]
+        if failed:
+            print()
+            print('Failed:')
+            for r in sorted(failed, key=lambda r: r[1]):
+                print(f'  {r[1]}\t{r[3] or "-"}\t{r[5] or ""}')
+
+        print()
+        print('Slowest runs:')
+        for r in sorted(results, key=lambda r: -r[4])[:SLOWEST_RUNS]:
+            print(f'  {r[1]}\t{r[4]:.1f}s')
@@ -0,0 +1,44 @@
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from huey.consumer_options import ConsumerConfig
+from evalbase.tasks import CHECK_QUEUES
+
+class Command(BaseCommand):
+    help = 'Run the worker pool for a checker queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queue',
+                            help='Checker queue to run (\'list\' to list them)')
+        parser.add_argument('-w', '--workers',
+                            help='Number of worker processes (default from settings.CHECKER_QUEUES)',
+                            type=int,
+                            default=None)
+
+    def handle(self, *args, **options):
+        if options['queue'] == 'list':
+            for name in CHECK_QUEUES:
+                print(name)
+            return
+
+        if options['queue'] not in CHECK_QUEUES:
+            raise CommandError(f'No checker queue {options["queue"]}')
+        queue = CHECK_QUEUES[options['queue']]
+        queue_conf = settings.CHECKER_QUEUES[options['queue']]
+
+        consumer_options = dict(settings.HUEY.get('consumer', {}))
+        consumer_options['workers'] = options['workers'] or queue_conf.get('workers', 1)
+        consumer_options['worker_type'] = 'process'
+        consumer_options['periodic'] = False
+
+        config = ConsumerConfig(**consumer_options)
+        config.validate()
+        logger = logging.getLogger('huey')
+        if not logger.handlers:
+            config.setup_logger(logger)
+
+        # Don't let the worker processes inherit our database connections.
+        connections.close_all()
+        consumer = queue.create_consumer(**config.values)
+        consumer.run()
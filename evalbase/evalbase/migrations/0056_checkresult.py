@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("evalbase", "0055_alter_submitmeta_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CheckResult",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("checker", models.CharField(max_length=500)),
+                (
+                    "is_validated",
+                    models.CharField(
+                        choices=[
+                            ("W", "waiting for validation"),
+                            ("F", "validation failed"),
+                            ("S", "validation succeeded"),
+                        ],
+                        max_length=1,
+                    ),
+                ),
+                ("check_output", models.TextField(blank=True)),
+                ("date", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("evalbase", "0056_checkresult"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Score",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("measure", models.CharField(max_length=50)),
+                ("topic", models.CharField(blank=True, max_length=50, null=True)),
+                ("value", models.FloatField()),
+                (
+                    "evaluation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="evalbase.evaluation",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["evaluation", "measure", "topic"],
+                        name="evalbase_sc_evaluat_b52e31_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("evalbase", "0057_score"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="signature",
+            index=models.Index(
+                fields=["user", "agreement"], name="evalbase_si_user_id_e34ec8_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def set_submission_conference(apps, schema_editor):
+    Submission = apps.get_model("evalbase", "Submission")
+    Task = apps.get_model("evalbase", "Task")
+    Submission.objects.update(
+        conference=Subquery(
+            Task.objects.filter(pk=OuterRef("task_id")).values("track__conference")[:1]
+        )
+    )
+
+
+def check_duplicate_runtags(apps, schema_editor):
+    Submission = apps.get_model("evalbase", "Submission")
+    duplicates = (
+        Submission.objects.values("task__track__conference__shortname", "runtag")
+        .annotate(runs=Count("pk"))
+        .filter(runs__gt=1)
+        .order_by("task__track__conference__shortname", "runtag")
+    )
+    if duplicates:
+        raise RuntimeError(
+            "These runtags are used more than once in a conference, rename "
+            "all but one of each and migrate again:\n"
+            + "\n".join(
+                f"  {d['task__track__conference__shortname']} {d['runtag']} ({d['runs']} runs)"
+                for d in duplicates
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("evalbase", "0058_signature_user_agreement_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Before changing anything, so the migration can just be run again
+        migrations.RunPython(check_duplicate_runtags, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="submission",
+            name="conference",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="evalbase.conference",
+            ),
+        ),
+        migrations.RunPython(set_submission_conference, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="submission",
+            constraint=models.UniqueConstraint(
+                fields=("conference", "runtag"), name="unique_conference_runtag"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("evalbase", "0059_submission_conference"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submitform",
+            name="revision",
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("evalbase", "0060_submitform_revision"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="checker_cpu_seconds",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="CPU time limit for the checker, in seconds",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="checker_memory_mb",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Address space limit for the checker, in MB",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="checker_timeout",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Seconds before the checker is stopped", null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="checkresult",
+            name="is_validated",
+            field=models.CharField(
+                choices=[
+                    ("W", "waiting for validation"),
+                    ("F", "validation failed"),
+                    ("S", "validation succeeded"),
+                    ("T", "validation timed out"),
+                ],
+                max_length=1,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="submission",
+            name="is_validated",
+            field=models.CharField(
+                choices=[
+                    ("W", "waiting for validation"),
+                    ("F", "validation failed"),
+                    ("S", "validation succeeded"),
+                    ("T", "validation timed out"),
+                ],
+                default="W",
+                max_length=1,
+            ),
+        ),
+    ]
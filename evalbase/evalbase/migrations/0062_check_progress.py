@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("evalbase", "0061_checker_limits"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="check_duration",
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="check_progress",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="check_queued",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="check_started",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:15
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+
+def set_scores_loaded(apps, schema_editor):
+    # Evals with scores have been parsed; leave the rest for show_appendix
+    Evaluation = apps.get_model("evalbase", "Evaluation")
+    Score = apps.get_model("evalbase", "Score")
+    Evaluation.objects.filter(
+        Exists(Score.objects.filter(evaluation=OuterRef("pk")))
+    ).update(scores_loaded=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("evalbase", "0062_check_progress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="evaluation",
+            name="scores_loaded",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(set_scores_loaded, migrations.RunPython.noop),
+    ]
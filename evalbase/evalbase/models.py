@@ -1,15 +1,25 @@
+import datetime
+import os
 import re
 import shutil
+import uuid
 from pathlib import Path
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.conf import settings
 from django.db.models import Q
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.urls import reverse, reverse_lazy
 from django.db.models.functions import Lower
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.core.cache import cache
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .lineindex import line_index, index_path
 
 class UserProfile(models.Model):
     user = models.OneToOneField(
@@ -118,6 +128,11 @@ class Signature(models.Model):
     sigtext = models.CharField(max_length=50)
     agreement = models.ForeignKey(Agreement, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'agreement']),
+        ]
+
 class Track(models.Model):
     '''A track is one or more tasks on a specific problem.'''
     shortname = models.CharField(
@@ -144,6 +159,16 @@ class Task(models.Model):
     task_open = models.BooleanField()
     deadline = models.DateField(null=True, blank=True)
     checker_file = models.CharField(max_length=500, default="NONE")
+    # Limits for the checker; blank means the defaults in settings
+    checker_timeout = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text='Seconds before the checker is stopped')
+    checker_memory_mb = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text='Address space limit for the checker, in MB')
+    checker_cpu_seconds = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text='CPU time limit for the checker, in seconds')
 
     def __str__(self):
         # return "/".join([self.conference.shortname, self.shortname])
@@ -160,6 +185,9 @@ class SubmitForm(models.Model):
         max_length=30,
         blank=True)
     testing = models.BooleanField(default=False)
+    # A new stamp whenever the form or its fields change, so compiled
+    # form classes (see forms.SubmitFormForm) can be reused until then.
+    revision = models.CharField(max_length=32, blank=True, editable=False)
 
     def __str__(self):
         return "/".join([self.task.track.conference.shortname, self.task.track.shortname, self.task.shortname])
@@ -240,11 +268,18 @@ class Submission(models.Model):
         WAITING = 'W', 'waiting for validation'
         FAIL = 'F', 'validation failed'
         SUCCESS = 'S', 'validation succeeded'
+        TIMEOUT = 'T', 'validation timed out'
 
     runtag = models.CharField(max_length=150)
     task = models.ForeignKey(
         Task,
         on_delete=models.PROTECT)
+    # The task's conference, so runtags can be unique per conference
+    conference = models.ForeignKey(
+        Conference,
+        on_delete=models.PROTECT,
+        null=True,
+        editable=False)
     org = models.ForeignKey(
         Organization,
         on_delete=models.PROTECT)
@@ -262,8 +297,30 @@ class Submission(models.Model):
         default=ValidationState.WAITING)
     has_evaluation = models.BooleanField()
     check_output = models.TextField(blank=True)
+    # When the checker was queued and started, how long it took (seconds),
+    # and the latest progress report from the checker, if it sends them.
+    check_queued = models.DateTimeField(null=True, editable=False)
+    check_started = models.DateTimeField(null=True, editable=False)
+    check_duration = models.FloatField(null=True, editable=False)
+    check_progress = models.JSONField(default=dict, blank=True, editable=False)
+
+    # The task the run had when it was loaded or last saved, see save()
+    _saved_task_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_task_id = instance.__dict__.get('task_id')
+        return instance
 
     def save(self, **kwargs):
+        # Follow the task, in case the run was moved to another task
+        if self.conference_id is None or self.task_id != self._saved_task_id:
+            self.conference_id = self.task.track.conference_id
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'conference'}
+        self._saved_task_id = self.task_id
         if self._state.adding:
             if not self.runtag.isascii():
                 raise ValidationError(_('Runtags must be ASCII'))
@@ -276,11 +333,21 @@ class Submission(models.Model):
             
             if len(self.runtag) > 20:
                 raise ValidationError(_('Runtags cannot be more than 20 characters long'))
-            
-            if Submission.objects.filter(task__track__conference=self.task.track.conference, runtag=self.runtag).exists():
-                raise ValidationError(_('Runtags must be unique, an another submission to %(conf)s already has runtag %(runtag)s',
-                                        params={'conf': self.task.track.conference.longname,
-                                                'runtag': self.runtag}))
+
+            # The unique_conference_runtag constraint catches runtags
+            # that are already taken.
+            try:
+                with transaction.atomic():
+                    super().save(**kwargs)
+            except IntegrityError:
+                if not runtag_taken(self.conference, self.runtag):
+                    raise
+                if self.file:
+                    self.file.delete(save=False)
+                raise ValidationError(_('Runtags must be unique, an another submission to %(conf)s already has runtag %(runtag)s'),
+                                      params={'conf': self.conference.longname,
+                                              'runtag': self.runtag})
+            return
         super().save(**kwargs)
 
     def delete(self, *args, **kwargs):
@@ -291,6 +358,35 @@ class Submission(models.Model):
     def __str__(self):
         return f'{self.task.track.conference.shortname}/{self.runtag}'
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conference', 'runtag'],
+                                    name='unique_conference_runtag'),
+        ]
+
+
+def runtag_taken(conf, runtag):
+    '''Whether a run to the conference already has this runtag.'''
+    return Submission.objects.filter(conference=conf, runtag=runtag).exists()
+
+
+class CheckResult(models.Model):
+    """A CheckResult is a cached checker outcome.  The key is a hash of the run file,
+    the checker command line, and the checker script and aux files it reads, so a
+    result can be reused as long as none of those have changed."""
+    key = models.CharField(
+        max_length=64,
+        unique=True)
+    checker = models.CharField(max_length=500)
+    is_validated = models.CharField(
+        max_length=1,
+        choices=Submission.ValidationState.choices)
+    check_output = models.TextField(blank=True)
+    date = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.checker}:{self.key[:12]}'
+
 
 class SubmitMeta(models.Model):
     """SubmitMetas are values for SubmitFormFields aside from task, org, submitter, file and date."""
@@ -329,10 +425,112 @@ class Evaluation(models.Model):
         upload_to=get_eval_path,
         max_length=250)
     date = models.DateField(auto_now=True)
+    # When the file was last parsed into Scores, see load_scores()
+    scores_loaded = models.DateTimeField(null=True, editable=False)
 
     def __str__(self):
         return f'{self.submission.runtag}:{self.name}'
 
+    def save(self, **kwargs):
+        super().save(**kwargs)
+        # (Re)parse the scores and index the file if it was replaced
+        if self.scores_stale():
+            self.load_scores()
+            self.line_index()
+
+    def scores_stale(self):
+        """Whether the file has changed since its scores were parsed, or
+        they never were.  A missing file has nothing to parse, so it isn't."""
+        try:
+            mtime = os.stat(self.filename.path).st_mtime
+        except FileNotFoundError:
+            return False
+        if self.scores_loaded is None:
+            return True
+        return datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc) >= self.scores_loaded
+
+    def delete(self, *args, **kwargs):
+        index_path(self.filename.path).unlink(missing_ok=True)
+        super().delete(*args, **kwargs)
+
+    def layout(self):
+        """The Appendix describing the columns of the eval file: the one for
+        this eval's task and name, or trec_eval's layout if there isn't one."""
+        appendix = Appendix.objects.filter(task=self.submission.task_id, name=self.name).first()
+        if appendix is None:
+            appendix = Appendix(measure_name_field=0, topic_field=1, score_field=2, average_topic='all')
+        return appendix
+
+    def line_index(self):
+        """The LineIndex of the eval file, for reading it a page at a time."""
+        appendix = self.layout()
+        return line_index(self.filename.path, appendix.measure_name_field, appendix.topic_field)
+
+    def load_scores(self, appendix=None, path=None):
+        """Parse the eval file (or path, if it's somewhere else for now) into
+        Scores, replacing any already stored.  The columns are read according
+        to appendix, or self.layout().
+        Lines that don't have a numeric score are skipped.  If the file has
+        no average_topic line for a measure, the mean over topics is stored."""
+        if appendix is None:
+            appendix = self.layout()
+        loaded = timezone.now()
+        fields_needed = max(appendix.measure_name_field, appendix.topic_field, appendix.score_field) + 1
+
+        measures = {}
+        scores = {}
+        means = {}
+        with open(path or self.filename.path, 'r', errors='replace') as eval_file:
+            for line in eval_file:
+                fields = line.strip().split()
+                if len(fields) < fields_needed:
+                    continue
+                measure = fields[appendix.measure_name_field][:Score._meta.get_field('measure').max_length]
+                topic = fields[appendix.topic_field][:Score._meta.get_field('topic').max_length]
+                try:
+                    value = float(fields[appendix.score_field])
+                except ValueError:
+                    continue
+                measures[measure] = True
+                if topic == appendix.average_topic:
+                    means[measure] = value
+                else:
+                    scores.setdefault(measure, {})[topic] = value
+
+        new_scores = []
+        for measure in measures:
+            topic_scores = scores.get(measure, {})
+            if measure not in means:
+                means[measure] = sum(topic_scores.values()) / len(topic_scores)
+            new_scores.append(Score(evaluation=self, measure=measure, topic=None, value=means[measure]))
+            new_scores.extend(Score(evaluation=self, measure=measure, topic=topic, value=value)
+                              for topic, value in topic_scores.items())
+
+        with transaction.atomic():
+            self.score_set.all().delete()
+            Score.objects.bulk_create(new_scores, batch_size=5000)
+            self.scores_loaded = loaded
+            Evaluation.objects.filter(pk=self.pk).update(scores_loaded=loaded)
+
+
+class Score(models.Model):
+    """A Score is one number from an Evaluation, for a measure and a topic.  The topic is null for the
+    run's mean over topics.  These are parsed from the eval file when it's saved, see Evaluation.load_scores()."""
+    evaluation = models.ForeignKey(
+        Evaluation,
+        on_delete=models.CASCADE)
+    measure = models.CharField(max_length=50)
+    topic = models.CharField(max_length=50, blank=True, null=True)
+    value = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['evaluation', 'measure', 'topic']),
+        ]
+
+    def __str__(self):
+        return f'{self.evaluation}:{self.measure}:{self.topic or "mean"}'
+
 
 class StatsFile(models.Model):
     '''StatsFiles are statistics, like min/med/max tables, that go with a particular task evaluation.'''
@@ -368,3 +566,75 @@ class Appendix(models.Model):
     queryset_field = models.CharField(max_length=25, blank=True, null=True)
     queryset_qtype = models.CharField(max_length=25, blank=True, null=True)
     queryset_target = models.CharField(max_length=25, blank=True, null=True)
+
+    # The fields that say which evals this appendix is for and how their
+    # files are parsed into Scores
+    LAYOUT_FIELDS = ['task_id', 'name', 'measure_name_field', 'topic_field',
+                     'score_field', 'average_topic']
+
+    def save(self, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = {self._meta.get_field(f).attname for f in update_fields}
+            if not update_fields.intersection(self.LAYOUT_FIELDS):
+                super().save(**kwargs)
+                return
+
+        old = Appendix.objects.filter(pk=self.pk).first() if self.pk else None
+        super().save(**kwargs)
+        if old is not None and all(getattr(old, f) == getattr(self, f) for f in self.LAYOUT_FIELDS):
+            return
+        # The stored scores were parsed with the old field layout (or, for
+        # the evals it was for before, with this one); drop them and let
+        # show_appendix parse the evals again.
+        appendices = {(self.task_id, self.name)}
+        if old is not None:
+            appendices.add((old.task_id, old.name))
+        for task_id, name in appendices:
+            evals = Evaluation.objects.filter(submission__task=task_id, name=name)
+            Score.objects.filter(evaluation__in=evals).delete()
+            evals.update(scores_loaded=None)
+
+
+# The conference page caches each conference's tracks, tasks and
+# appendices (see views.conference_tree).  Drop the cached copy
+# whenever one of them changes.
+
+def conference_tree_key(conf_id):
+    return f'conference-tree:{conf_id}'
+
+def _clear_conference_tree(track):
+    if track is not None:
+        cache.delete(conference_tree_key(track.conference_id))
+
+@receiver([post_save, post_delete], sender=Track)
+def track_changed(sender, instance, **kwargs):
+    _clear_conference_tree(instance)
+
+@receiver([post_save, post_delete], sender=Task)
+def task_changed(sender, instance, **kwargs):
+    _clear_conference_tree(instance.track)
+
+@receiver([post_save, post_delete], sender=SubmitForm)
+@receiver([post_save, post_delete], sender=Appendix)
+def task_part_changed(sender, instance, **kwargs):
+    _clear_conference_tree(instance.task.track)
+
+
+# Compiled submission forms are kept until their SubmitForm's revision
+# changes.  Revisions are random rather than counted, so saving a
+# SubmitForm that was loaded before its fields changed can't bring back
+# an old one.
+
+def new_revision():
+    return uuid.uuid4().hex
+
+@receiver(pre_save, sender=SubmitForm)
+def submit_form_changed(sender, instance, **kwargs):
+    instance.revision = new_revision()
+
+@receiver([post_save, post_delete], sender=SubmitFormField)
+def submit_form_field_changed(sender, instance, **kwargs):
+    (SubmitForm.objects
+     .filter(pk=instance.submit_form_id)
+     .update(revision=new_revision()))
@@ -91,6 +91,23 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Checker workers write at the same time; wait for the lock, and
+        # take it up front so transactions don't deadlock upgrading to it.
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Cached pages (the conference page's track list, appendix tables) are
+# cleared when the models change, and that happens in management commands
+# and the huey workers too, so keep the cache where they can all see it.
+# A per-process cache like the default LocMemCache would go stale.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
     }
 }
 
@@ -184,6 +201,78 @@ HUEY = {
     },
 }
 
+# Checker queues.  Each queue is its own Huey queue with its own pool of
+# worker processes (start them with 'manage.py run_checkers <queue>'), so
+# a slow checker only holds up other slow checkers.  'checkers' lists the
+# checker scripts (the first word of Task.checker_file) routed to that
+# queue; anything not listed goes to CHECKER_DEFAULT_QUEUE.
+CHECKER_QUEUES = {
+    'fast': {
+        'workers': 4,
+        'checkers': [],
+    },
+    'heavy': {
+        'workers': 2,
+        'checkers': [
+            # validates locally, loading spaCy and the PMID list, if the
+            # BioGen validator service isn't up
+            'check-biogen-driver.sh',
+            'check-ikat-driver.sh',
+            'tv16.check_avs.pl',
+            'vtt.tv21.run_checker.pl',
+        ],
+    },
+}
+CHECKER_DEFAULT_QUEUE = 'fast'
+
+# Python checkers run in long-lived interpreters (see evalbase/checkrunner.py)
+# instead of starting a new python for every submission.  Only list scripts
+# that do all their work under "if __name__ == '__main__'".
+WARM_CHECKERS = [
+    'check-stdtrec-run.py',
+    'check_trec_rag24_gen.py',
+    'validate_trec_rag25_gen.py',
+]
+
+# Files and directories (relative to CHECK_SCRIPT_PATH) that a checker reads
+# besides its own script and the files named on its command line.  Checker
+# results are cached by the contents of all of these, so changing any of
+# them re-runs the checker.  Directories are digested whole; files bigger
+# than CHECKER_DIGEST_MAX_BYTES, like the iKAT passage database, go by their
+# size and modification time instead of their contents.
+CHECKER_FILES = {
+    'check-biogen-driver.sh': ['trec_biogen_validator', 'aux/BioGen2024topics-json.txt',
+                               'aux/pubmed_ids_last_20_years.json.gz'],
+    'check-ikat-driver.sh': ['check-ikat'],
+    'check-lateral-2024.py': ['trec-2024-lateral-reading-task1-articles.txt'],
+    'check-ragtime.py': ['aux/ragtime25_main_all.jsonl'],
+    'check_deep.pl': ['deep-2022_queries.tsv'],
+    'tv16.check_avs.pl': ['CheckAdhocSubmissions.java', 'xercesImpl-2.11.0.jar',
+                          'xercesSamples.jar', 'aux'],
+    'validate-vqa-ag.py': ['aux'],
+}
+CHECKER_DIGEST_MAX_BYTES = 64 * 1024 * 1024
+
+# Limits for checkers.  Each checker runs in its own process group, which
+# is killed if it runs longer than CHECKER_TIMEOUT seconds.  Its address
+# space is capped at CHECKER_MEMORY_MB, and its CPU time at
+# CHECKER_CPU_SECONDS (None means the same as the timeout).  Tasks can set
+# their own limits.  A run whose checker timed out is checked again up to
+# CHECKER_RETRIES times, waiting CHECKER_RETRY_DELAY seconds the first
+# time and twice as long each time after.
+CHECKER_TIMEOUT = 60 * 60
+CHECKER_MEMORY_MB = 16 * 1024
+CHECKER_CPU_SECONDS = None
+CHECKER_RETRIES = 3
+CHECKER_RETRY_DELAY = 5 * 60
+
+# Run files and eval outputs can be large.  If the front end can send files
+# itself, set this to the header it looks for, and downloads will just send
+# the file's path in it: 'X-Sendfile' for the offload routing in uwsgi.ini
+# or Apache's mod_xsendfile.  If None, Django streams the file.  prod.py
+# sets it; without it the offload settings in uwsgi.ini go unused.
+SENDFILE_HEADER = None
+
 # django-csp Content Security Policy
 # https://django-csp.readthedocs.io/en/latest/configuration.html
 # https://www.w3.org/TR/CSP/#csp-directives
@@ -6,6 +6,9 @@ SECRET_KEY = 'NEED A REAL KEY HERE'
 ALLOWED_HOSTS = ['127.0.0.1']
 EMAIL_HOST = 'smtp.nist.gov'
 
+# uwsgi.ini sends files named in this header with its offload threads
+SENDFILE_HEADER = 'X-Sendfile'
+
 # Authentication
 # These are sandbox settings, change for production
 LOGIN_GOV = {
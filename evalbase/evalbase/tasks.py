@@ -1,19 +1,112 @@
-import subprocess
+import fnmatch
+import hashlib
+import json
+import math
+import os
+import time
 from pathlib import Path
 
-from huey import crontab
-from huey.contrib.djhuey import task, db_task, on_commit_task
+from huey import SqliteHuey, crontab
+from huey.contrib.djhuey import task, db_task, on_commit_task, close_db
 
 from .models import *
+from .utils import file_digest
+from .checkrunner import (run_warm, run_limited, read_progress, WarmCheckerError,
+                          CheckerTimeout, PROGRESS_ENV, EXIT_TEMPFAIL)
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
 
 #    else:
 #        raise FileNotFoundError(errlog_file)
 
 SUBM_ROOT = Path(settings.MEDIA_ROOT)
 
-@task()
-def run_check_script(submission, script, *args):
+# Files in checker directories that don't change what a checker does
+DIGEST_SKIP = ['__pycache__', '*.pyc', '*.errlog', '*.log', '*.progress', '*.pid', '*.sock']
+
+def _digest_skip(name):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in DIGEST_SKIP)
+
+def checker_file_digest(path):
+    '''A digest of a file or directory that a checker reads.  Directories
+    are digested file by file; big files go by size and modification time.'''
+    path = Path(path)
+    if path.is_dir():
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not _digest_skip(d))
+            for name in sorted(files):
+                if _digest_skip(name):
+                    continue
+                file_path = Path(root) / name
+                digest.update(str(file_path.relative_to(path)).encode() + b'\0')
+                digest.update(checker_file_digest(file_path).encode() + b'\0')
+        return digest.hexdigest()
+    stat = path.stat()
+    if stat.st_size > settings.CHECKER_DIGEST_MAX_BYTES:
+        return f'{stat.st_size}:{stat.st_mtime_ns}'
+    return file_digest(path)
+
+
+def check_cache_key(command, subm_file, limits=None):
+    '''The CheckResult key for running command on subm_file.  This covers
+    the run file, the command line, the checker script, any arguments
+    that name files in the checkers directory (topic lists in aux/ and such),
+    the files settings.CHECKER_FILES lists for the checker, and the
+    checker's limits (a Python checker that runs out of memory just fails,
+    so raising the limit has to re-run it).
+    '''
+    check_dir = Path(settings.CHECK_SCRIPT_PATH)
+    key = hashlib.sha256()
+    key.update(file_digest(subm_file).encode())
+    if limits:
+        key.update(json.dumps(limits, sort_keys=True).encode())
+    for arg in command:
+        key.update(b'\0' + str(arg).encode())
+        arg_path = check_dir / arg
+        if arg_path.is_file():
+            key.update(checker_file_digest(arg_path).encode())
+    checker = str(Path(command[0]).relative_to(check_dir))
+    for name in settings.CHECKER_FILES.get(checker, []):
+        path = check_dir / name
+        key.update(b'\0' + name.encode() + b'\0')
+        key.update(checker_file_digest(path).encode() if path.exists() else b'missing')
+    return key.hexdigest()
+
+
+def cacheable(returncode, errlog_file):
+    '''Whether a checker outcome says something about the run itself, and
+    so can be cached.  Not if the checker was killed by a signal (a resource
+    limit, say; shells and the warm runner report those as 128 + the signal
+    number), couldn't check the run (EXIT_TEMPFAIL), or left no errlog.'''
+    if not errlog_file.exists():
+        return False
+    if returncode < 0 or 128 < returncode < 255:
+        return False
+    return returncode != EXIT_TEMPFAIL
+
+
+def checker_limits(task):
+    '''The timeout (seconds), memory (MB) and CPU time (seconds) limits
+    for the task's checker: the task's own, or else the defaults in
+    settings.  CPU time defaults to the timeout.'''
+    timeout = task.checker_timeout or settings.CHECKER_TIMEOUT
+    return {
+        'timeout': timeout,
+        'memory_mb': task.checker_memory_mb or settings.CHECKER_MEMORY_MB,
+        'cpu_seconds': task.checker_cpu_seconds or settings.CHECKER_CPU_SECONDS or timeout,
+    }
+
+
+def check_submission(submission, script, *args, use_cache=True, attempt=0):
+    '''Run the checker script on the submission and record the outcome.
+    If the checker times out, the run is marked TIMEOUT and checked again
+    later, up to settings.CHECKER_RETRIES times with the delay doubling
+    each time.'''
+    queue = checker_queue(script)
+    retry_args = (submission, script, *args)
     argsplit = script.split()
     script = argsplit[0]
     args = [*args, *argsplit[1:]]
@@ -28,28 +121,207 @@ def run_check_script(submission, script, *args):
     if not subm_dir.exists():
         raise FileNotFoundError(subm_dir)
 
-    subm_path = SUBM_ROOT / submission.file.name
     if not subm_file.exists():
         raise FileNotFoundError(subm_file)
 
-    proc = subprocess.run([script_path, *args, subm_file.name],
-                          cwd=subm_dir,
-                          stderr=subprocess.STDOUT,
-                          text=True)
+    command = [script_path, *args, subm_file.name]
+    limits = checker_limits(submission.task)
+    cache_key = check_cache_key(command, subm_file, limits)
+    cached = CheckResult.objects.filter(key=cache_key).first()
+    if use_cache and cached:
+        submission.check_output = cached.check_output
+        submission.is_validated = cached.is_validated
+        submission.save()
+        return
 
-    errlog = 'no errlog'
+    returncode = None
+
+    # The checker can append progress reports to this file, see checkrunner.
+    progress_file = subm_dir / (subm_file.name + '.progress')
+    progress_file.unlink(missing_ok=True)
+    # Don't mistake an errlog from an earlier check for this one's
     errlog_file = subm_dir / (subm_file.name + '.errlog')
+    errlog_file.unlink(missing_ok=True)
+    progress_env = {PROGRESS_ENV: str(progress_file)}
+    submission.check_started = timezone.now()
+    submission.check_progress = {}
+    Submission.objects.filter(pk=submission.pk).update(
+        check_started=submission.check_started,
+        check_progress={})
+
+    def record_progress():
+        report = read_progress(progress_file)
+        if report is not None and report != submission.check_progress:
+            submission.check_progress = report
+            Submission.objects.filter(pk=submission.pk).update(check_progress=report)
+
+    started = time.monotonic()
+    try:
+        if script in settings.WARM_CHECKERS:
+            try:
+                returncode = run_warm(script_path, command[1:], subm_dir, **limits,
+                                      env=progress_env, on_progress=record_progress)
+            except WarmCheckerError:
+                pass
+        if returncode is None:
+            returncode = run_limited(command, subm_dir, **limits,
+                                     env=progress_env, on_progress=record_progress)
+    except CheckerTimeout:
+        record_progress()
+        progress_file.unlink(missing_ok=True)
+        submission.check_output = f'The checker was stopped after {limits["timeout"]} seconds.\n'
+        submission.is_validated = Submission.ValidationState.TIMEOUT
+        if attempt < settings.CHECKER_RETRIES:
+            delay = settings.CHECKER_RETRY_DELAY * 2 ** attempt
+            submission.check_output += f'It will be tried again in {delay} seconds.\n'
+            _check_tasks[queue].schedule(
+                args=retry_args,
+                kwargs={'use_cache': use_cache, 'attempt': attempt + 1},
+                delay=delay)
+        submission.save()
+        return
+
+    submission.check_duration = time.monotonic() - started
+    record_progress()
+    progress_file.unlink(missing_ok=True)
+
+    errlog = 'no errlog'
     if errlog_file.exists():
         with open(errlog_file, 'r') as errlog_fp:
             errlog = errlog_fp.read()
 
-    if proc.stdout:
-        submission.check_output = proc.stdout + '\n' + errlog + '\n'
-    else:
-        submission.check_output = errlog + '\n'
+    submission.check_output = errlog + '\n'
 
-    if proc.returncode == 0:
+    if returncode == 0:
         submission.is_validated = Submission.ValidationState.SUCCESS
     else:
         submission.is_validated = Submission.ValidationState.FAIL
     submission.save()
+
+    if not cacheable(returncode, errlog_file):
+        return
+    CheckResult.objects.update_or_create(
+        key=cache_key,
+        defaults={'checker': script,
+                  'check_output': submission.check_output,
+                  'is_validated': submission.is_validated})
+
+
+# Checker queues.  These share the Huey database with the default queue
+# but each has its own consumer, see the run_checkers management command.
+
+def _make_check_queue(name):
+    huey_config = { k: v for k, v in settings.HUEY.items()
+                    if k not in ('name', 'huey_class', 'consumer') }
+    return SqliteHuey(f'{settings.HUEY["name"]}-{name}', **huey_config)
+
+CHECK_QUEUES = { name: _make_check_queue(name)
+                 for name in settings.CHECKER_QUEUES }
+
+_check_tasks = { name: queue.task()(close_db(check_submission))
+                 for name, queue in CHECK_QUEUES.items() }
+
+
+def checker_queue(script):
+    '''Return the name of the checker queue that runs this checker.'''
+    checker = script.split()[0]
+    for name, queue in settings.CHECKER_QUEUES.items():
+        if checker in queue.get('checkers', []):
+            return name
+    return settings.CHECKER_DEFAULT_QUEUE
+
+
+def run_check_script(submission, script, *args, use_cache=True):
+    '''Queue a checker run for the submission.  Returns the Huey result.
+
+    To give each org a fair share of the workers, a submission is queued
+    behind those from orgs with fewer submissions already waiting.
+    If use_cache is False, the checker is run even if there is a cached
+    result for this run file and checker.
+    '''
+    waiting = (Submission.objects
+               .filter(org=submission.org)
+               .filter(is_validated=Submission.ValidationState.WAITING)
+               .exclude(pk=submission.pk)
+               .count())
+    queue = checker_queue(script)
+    submission.check_queued = timezone.now()
+    submission.check_started = None
+    submission.check_progress = {}
+    Submission.objects.filter(pk=submission.pk).update(
+        check_queued=submission.check_queued,
+        check_started=None,
+        check_progress={})
+    return _check_tasks[queue](submission, script, *args,
+                               use_cache=use_cache,
+                               priority=-waiting)
+
+
+# How many recent runs of a checker to average, and for how long to
+# cache the average
+DURATION_SAMPLE = 50
+DURATION_CACHE_TIMEOUT = 5 * 60
+
+def expected_check_duration(script):
+    '''The average time in seconds the checker took on its recent runs,
+    or None if it hasn't run yet.'''
+    checker = script.split()[0]
+    cache_key = f'check-duration:{checker}'
+    duration = cache.get(cache_key)
+    if duration is None:
+        durations = list(Submission.objects
+                         .filter(Q(task__checker_file=checker) |
+                                 Q(task__checker_file__startswith=checker + ' '))
+                         .filter(check_duration__isnull=False)
+                         .order_by('-check_started')
+                         .values_list('check_duration', flat=True)[:DURATION_SAMPLE])
+        # Cache "no history" too, as -1
+        duration = sum(durations) / len(durations) if durations else -1
+        cache.set(cache_key, duration, DURATION_CACHE_TIMEOUT)
+    return None if duration < 0 else duration
+
+
+def queue_position(submission):
+    '''How many runs are waiting ahead of this one in its checker's queue.
+    This goes by when runs were queued and doesn't account for the
+    per-org priorities, so it's approximate.'''
+    queue = checker_queue(submission.task.checker_file)
+    ahead = (Submission.objects
+             .filter(is_validated=Submission.ValidationState.WAITING,
+                     check_started__isnull=True,
+                     check_queued__lt=submission.check_queued)
+             .values_list('task__checker_file', flat=True))
+    return sum(1 for checker_file in ahead
+               if checker_file and checker_queue(checker_file) == queue)
+
+
+def check_status(submission):
+    '''Where the submission's check is: its state, position in the queue,
+    estimated seconds until it's done, and the checker's latest progress
+    report.'''
+    status = {
+        'state': submission.is_validated,
+        'position': None,
+        'estimated_wait': None,
+        'progress': submission.check_progress,
+        'started': submission.check_started and submission.check_started.isoformat(),
+        'duration': submission.check_duration,
+    }
+    if (submission.is_validated != Submission.ValidationState.WAITING or
+        not submission.task.checker_file):
+        return status
+
+    expected = expected_check_duration(submission.task.checker_file)
+    if submission.check_started:
+        status['position'] = 0
+        if expected is not None:
+            elapsed = (timezone.now() - submission.check_started).total_seconds()
+            status['estimated_wait'] = max(expected - elapsed, 0)
+    elif submission.check_queued:
+        position = queue_position(submission)
+        status['position'] = position
+        if expected is not None:
+            queue = checker_queue(submission.task.checker_file)
+            workers = settings.CHECKER_QUEUES[queue].get('workers', 1)
+            status['estimated_wait'] = math.ceil((position + 1) / workers) * expected
+    return status
@@ -0,0 +1,1364 @@
+import collections
+import contextlib
+import io
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import *
+from . import tasks, utils, views
+from .checkrunner import CheckerTimeout, WarmChecker, run_limited, run_script
+from . import lineindex
+from .lineindex import LineIndex, index_path, line_index
+from .management.commands import kick_validation
+from .utils import stream_zip
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EvalbaseTestCase(TestCase):
+    '''A conference with one track and task, and a participant, the owner
+    and member of an org signed up for it.  Subclasses add what they need
+    in setUpTestData, and can set task_options (more Task fields),
+    event_phase and username.'''
+
+    username = 'part'
+    event_phase = False
+    task_options = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(cls.username, f'{cls.username}@example.org')
+        cls.conf = Conference.objects.create(shortname='trec-test', longname='TREC Test',
+                                             year=2025, open_signup=True,
+                                             tech_contact='t@example.org',
+                                             admin_contact='a@example.org',
+                                             complete=False, event_phase=cls.event_phase)
+        cls.track = Track.objects.create(shortname='trk', longname='Track',
+                                         conference=cls.conf)
+        cls.task = Task.objects.create(shortname='tsk', longname='Task', track=cls.track,
+                                       required=False, task_open=True, **cls.task_options)
+        cls.org = Organization.objects.create(shortname='org', longname='Org',
+                                              owner=cls.user, contact_person=cls.user,
+                                              passphrase='p')
+        cls.org.conference.add(cls.conf)
+        cls.org.members.add(cls.user)
+
+    @classmethod
+    def add_run(cls, runtag, **fields):
+        '''A run by the participant to the task.'''
+        return Submission.objects.create(runtag=runtag, task=cls.task, org=cls.org,
+                                         submitted_by=cls.user,
+                                         file=f'runs/{runtag}/{runtag}',
+                                         has_evaluation=False, **fields)
+
+
+class CheckerTestCase(EvalbaseTestCase):
+    '''Checker scripts in a temporary CHECK_SCRIPT_PATH, and run files in
+    a temporary submissions directory.'''
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.checkers = self.root / 'checkers'
+        self.checkers.mkdir()
+        self.enterContext(override_settings(CHECK_SCRIPT_PATH=self.checkers))
+        self.enterContext(mock.patch.object(tasks, 'SUBM_ROOT', self.root))
+
+    def add_checker(self, name, text):
+        path = self.checkers / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        path.chmod(0o755)
+        return path
+
+    def add_run_file(self, run, text='run\n'):
+        path = self.root / run.file.name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        return path
+
+
+class ListSubmissionsTests(EvalbaseTestCase):
+    '''The list of all runs to a task shouldn't cost a query per run.'''
+
+    username = 'coord'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.track.coordinators.add(cls.user)
+        form = SubmitForm.objects.create(task=cls.task)
+        cls.fields = [SubmitFormField.objects.create(submit_form=form,
+                                                     question=f'Question {i}',
+                                                     meta_key=f'q{i}',
+                                                     sequence=i)
+                      for i in range(15)]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add_runs(self, first, count):
+        for i in range(first, first + count):
+            run = self.add_run(f'run{i:03d}')
+            SubmitMeta.objects.bulk_create(
+                SubmitMeta(submission=run, form_field=field,
+                           key=field.meta_key, value=f'{field.meta_key}-{999 - i:03d}')
+                for field in self.fields)
+
+    def get(self, **params):
+        return self.client.get(reverse('task_submissions', args=[self.conf.shortname,
+                                                                 self.task.shortname]),
+                               params)
+
+    def count_queries(self, **params):
+        self.get(**params)     # warm up the session and content types
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(**params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_constant(self):
+        self.add_runs(0, 2)
+        few = self.count_queries()
+        self.add_runs(2, 2 * views.RUNS_PAGE_SIZE)
+        self.assertEqual(self.count_queries(), few)
+        self.assertEqual(self.count_queries(sort='-q3', page=2), few)
+        self.assertLessEqual(few, 12)
+
+    def test_rows(self):
+        self.add_runs(0, 3)
+        response = self.get(sort='-runtag')
+        self.assertEqual(response.context['keys'], [f.meta_key for f in self.fields])
+        run, values = response.context['rows'][0]
+        self.assertEqual(run.runtag, 'run002')
+        self.assertEqual(values[0], 'q0-997')
+
+    def test_sort_by_meta_and_page(self):
+        self.add_runs(0, views.RUNS_PAGE_SIZE + 5)
+        response = self.get(sort='q1', page=2)
+        rows = response.context['rows']
+        self.assertEqual(len(rows), 5)
+        # q1 values count down as the runtags count up
+        self.assertEqual(rows[-1][0].runtag, 'run000')
+
+
+class ConferenceTreeTests(EvalbaseTestCase):
+    '''The conference page's tracks and tasks are cached until they change.'''
+
+    event_phase = True
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(5):
+            track = Track.objects.create(shortname=f'trk{i}', longname=f'Track {i}',
+                                         conference=cls.conf)
+            for j in range(3):
+                Task.objects.create(shortname=f'tsk{i}{j}', longname=f'Task {i}{j}',
+                                    track=track, required=False, task_open=False)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('tracks', args=[self.conf.shortname]))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_cached_until_changed(self):
+        _, first = self.get()
+        response, cached = self.get()
+        self.assertLess(cached, first)
+        self.assertNotContains(response, 'Appendix (main)')
+
+        task = Task.objects.get(shortname='tsk21')
+        Appendix.objects.create(task=task, name='main', measure_name_field=0,
+                                topic_field=1, score_field=2, measures='all')
+        response, queries = self.get()
+        self.assertEqual(queries, first)
+        self.assertContains(response, 'Appendix (main)')
+
+        SubmitForm.objects.create(task=task, testing=True)
+        task.task_open = True
+        task.save()
+        response, _ = self.get()
+        self.assertContains(response, reverse('submit', args=[self.conf.shortname, 'tsk21']))
+
+    def test_evals_link(self):
+        # The link is there once the task has evals, whoever's runs they're for
+        self.add_run('run1')
+        evals_url = reverse('evals-zip', args=[self.conf.shortname, 'tsk'])
+        response, _ = self.get()
+        self.assertNotContains(response, evals_url)
+
+        other = Organization.objects.create(shortname='other', longname='Other',
+                                            owner=self.user, contact_person=self.user,
+                                            passphrase='q')
+        run = Submission.objects.create(runtag='other1', task=self.task, org=other,
+                                        submitted_by=self.user, file='runs/other1/other1',
+                                        has_evaluation=False)
+        Evaluation.objects.bulk_create([Evaluation(submission=run, name='trec_eval',
+                                                   filename='other1.trec_eval')])
+        response, _ = self.get()
+        self.assertContains(response, evals_url)
+
+
+class RequestAuthTests(EvalbaseTestCase):
+    '''The permission decorators and views look up the conference, task,
+    orgs and agreements once between them.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        agreement = Agreement.objects.create(name='noads', longname='No ads',
+                                             template='noads.html')
+        cls.conf.agreements.add(agreement)
+        Signature.objects.create(user=cls.user, agreement=agreement, sigtext='Part')
+        SubmitForm.objects.create(task=cls.task)
+        cls.add_run('run1')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def lookups(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        tables = collections.Counter()
+        for query in queries:
+            table = re.search(r'FROM "(\w+)"', query['sql'])
+            if table:
+                tables[table.group(1)] += 1
+        return tables
+
+    def test_submit_page(self):
+        tables = self.lookups(reverse('submit', args=['trec-test', 'tsk']))
+        self.assertEqual(tables['evalbase_conference'], 1)
+        self.assertEqual(tables['evalbase_task'], 1)
+        self.assertEqual(tables['evalbase_organization'], 1)
+        self.assertEqual(tables['evalbase_signature'], 1)
+
+    def test_run_page(self):
+        tables = self.lookups(reverse('run', args=['trec-test', 'tsk', 'run1']))
+        self.assertEqual(tables['evalbase_conference'], 1)
+        self.assertEqual(tables['evalbase_task'], 1)
+        self.assertEqual(tables['evalbase_submission'], 1)
+
+    def test_every_agreement_signed(self):
+        # All of the conference's agreements have to be signed, not just
+        # the last one
+        url = reverse('submit', args=['trec-test', 'tsk'])
+        agreement = Agreement.objects.create(name='data', longname='Data',
+                                             template='noads.html')
+        self.conf.agreements.add(agreement)
+        last = Agreement.objects.create(name='last', longname='Last',
+                                        template='noads.html')
+        self.conf.agreements.add(last)
+        Signature.objects.create(user=self.user, agreement=last, sigtext='Part')
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('sign-agreement', args=['trec-test', 'data']),
+                             fetch_redirect_response=False)
+
+        self.client.post(reverse('sign-agreement', args=['trec-test', 'data']),
+                         {'sigtext': 'Part'})
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_deleted_signature(self):
+        url = reverse('submit', args=['trec-test', 'tsk'])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        Signature.objects.filter(user=self.user).delete()
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('sign-agreement', args=['trec-test', 'noads']),
+                             fetch_redirect_response=False)
+
+
+class SubmitMetaWriteTests(EvalbaseTestCase):
+    '''Submitting and editing a run writes its metadata in bulk.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        form = SubmitForm.objects.create(task=cls.task)
+        for i in range(20):
+            SubmitFormField.objects.create(submit_form=form, question=f'Question {i}',
+                                           meta_key=f'q{i}', sequence=i)
+        SubmitFormField.objects.create(submit_form=form, question='Which?',
+                                       meta_key='which', sequence=20, choices='a,b,c',
+                                       question_type=SubmitFormField.QuestionType.CHECKBOX)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+
+    def form_data(self, **values):
+        data = {'conf': 'trec-test', 'task': 'tsk', 'user': 'part',
+                'email': 'part@example.org', 'org': 'org', 'which': ['a', 'c']}
+        data.update({f'q{i}': f'answer {i}' for i in range(20)})
+        data.update(values)
+        return data
+
+    def test_submit_and_edit(self):
+        data = self.form_data(runtag='run1',
+                              runfile=SimpleUploadedFile('run1', b'1 Q0 d1 1 1.0 run1\n'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('submit', args=['trec-test', 'tsk']), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertLess(len(queries), 25)
+        run = Submission.objects.get(runtag='run1')
+        self.assertEqual(run.submitmeta_set.count(), 21)
+        self.assertEqual(run.submitmeta_set.get(key='which').value, "['a', 'c']")
+
+        data = self.form_data(q3='changed', which=['b'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('edit-task', args=['trec-test', 'tsk', 'run1']),
+                                        data)
+        self.assertEqual(response.status_code, 302)
+        self.assertLess(len(queries), 25)
+        metas = dict(run.submitmeta_set.values_list('key', 'value'))
+        self.assertEqual(len(metas), 21)
+        self.assertEqual(metas['q3'], 'changed')
+        self.assertEqual(metas['q4'], 'answer 4')
+        self.assertEqual(metas['which'], "['b']")
+
+    def test_runtag_check(self):
+        url = reverse('runtag-check', args=['trec-test', 'tsk'])
+        self.assertTrue(self.client.get(url, {'runtag': 'run1'}).json()['ok'])
+        self.client.post(reverse('submit', args=['trec-test', 'tsk']),
+                         self.form_data(runtag='run1',
+                                        runfile=SimpleUploadedFile('run1', b'x\n')))
+        result = self.client.get(url, {'runtag': 'run1'}).json()
+        self.assertFalse(result['ok'])
+        self.assertIn('already been submitted', result['errors'][0])
+        self.assertFalse(self.client.get(url, {'runtag': '.run2'}).json()['ok'])
+
+    def test_duplicate_runtag(self):
+        self.add_run('run1')
+        with self.assertRaises(ValidationError):
+            self.add_run('run1')
+        self.assertEqual(Submission.objects.filter(runtag='run1').count(), 1)
+
+    def test_moved_run_follows_conference(self):
+        run = self.add_run('run1')
+        self.assertEqual(run.conference, self.conf)
+        other = Conference.objects.create(shortname='trec-other', longname='TREC Other',
+                                          year=2025, open_signup=True,
+                                          tech_contact='t@example.org',
+                                          admin_contact='a@example.org', complete=False,
+                                          event_phase=False)
+        track = Track.objects.create(shortname='trk', longname='Track', conference=other)
+        run.task = Task.objects.create(shortname='tsk2', longname='Task', track=track,
+                                       required=False, task_open=True)
+        run.save()
+        run.refresh_from_db()
+        self.assertEqual(run.conference, other)
+
+        run = Submission.objects.get(pk=run.pk)
+        run.task = self.task
+        run.save(update_fields=['task'])
+        self.assertEqual(Submission.objects.get(pk=run.pk).conference, self.conf)
+
+    def test_save_without_task_lookup(self):
+        run = Submission.objects.get(pk=self.add_run('run1').pk)
+        run.is_validated = Submission.ValidationState.SUCCESS
+        with self.assertNumQueries(1):
+            run.save()
+        self.assertEqual(Submission.objects.get(pk=run.pk).conference, self.conf)
+
+    def test_form_class_cached(self):
+        url = reverse('submit', args=['trec-test', 'tsk'])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([q for q in queries if 'evalbase_submitformfield' in q['sql']])
+
+        field = SubmitFormField.objects.get(meta_key='q0')
+        field.question = 'A new question'
+        field.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'A new question')
+        self.assertContains(response, 'value="part@example.org"')
+        self.assertContains(response, '<option value="org">Org</option>')
+
+    def test_form_class_cached_task_renamed(self):
+        self.client.get(reverse('submit', args=['trec-test', 'tsk']))
+        self.task.shortname = 'tsk-new'
+        self.task.save()
+        response = self.client.get(reverse('submit', args=['trec-test', 'tsk-new']))
+        self.assertContains(response, 'name="task" value="tsk-new"')
+        self.assertContains(response, 'name="conf" value="trec-test"')
+
+
+class CheckerSandboxTests(SimpleTestCase):
+    '''Checkers are stopped when they run too long or use too much.'''
+
+    def test_timeout_kills_process_group(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pid_file = Path(tmp) / 'pid'
+            start = time.monotonic()
+            with self.assertRaises(CheckerTimeout):
+                run_limited(['sh', '-c', f'sleep 30 & echo $! > {pid_file}; wait'],
+                            tmp, timeout=1)
+            self.assertLess(time.monotonic() - start, 10)
+            child = int(pid_file.read_text())
+            for _ in range(50):
+                try:
+                    os.kill(child, 0)
+                except ProcessLookupError:
+                    break
+                time.sleep(0.1)
+            else:
+                self.fail('Checker child process still running')
+
+    def test_memory_limit(self):
+        status = run_limited([sys.executable, '-c',
+                              'try:\n x = bytearray(2 << 30)\nexcept MemoryError:\n exit(3)'],
+                             '.', memory_mb=512)
+        self.assertEqual(status, 3)
+        self.assertEqual(run_limited([sys.executable, '-c', 'pass'], '.', memory_mb=512), 0)
+
+    def test_warm_checker_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            script = Path(tmp) / 'slow.py'
+            script.write_text('import sys, time\ntime.sleep(float(sys.argv[1]))\n')
+            checker = WarmChecker(script)
+            try:
+                with self.assertRaises(CheckerTimeout):
+                    checker.run(['30'], tmp, timeout=1)
+                self.assertIsNone(checker.proc)
+                self.assertEqual(checker.run(['0'], tmp, timeout=10), 0)
+            finally:
+                checker.close()
+
+
+class WarmCheckerTests(SimpleTestCase):
+    '''A warm runner runs a real checker on one run after another, each
+    writing its own errlog.'''
+
+    script = str(Path(__file__).resolve().parent.parent / 'checkers' / 'validate_trec_rag25_gen.py')
+
+    def setUp(self):
+        self.tmp = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        (self.tmp / 'topics.jsonl').write_text('{"id": "1", "title": "Topic one"}\n')
+        good = {'metadata': {'team_id': 't', 'run_id': 'good', 'narrative_id': '1',
+                             'type': 'automatic', 'narrative': 'n', 'prompt': 'p'},
+                'references': [], 'answer': [{'text': 'An answer.', 'citations': []}]}
+        bad = dict(good, metadata=dict(good['metadata'], run_id='bad', narrative_id='2'))
+        (self.tmp / 'good').write_text(json.dumps(good) + '\n')
+        (self.tmp / 'bad').write_text(json.dumps(bad) + '\n')
+
+    def args(self, run):
+        return ['--topics', str(self.tmp / 'topics.jsonl'), '--input', run]
+
+    def assertErrlogs(self):
+        bad_log = (self.tmp / 'bad.errlog').read_text()
+        good_log = (self.tmp / 'good.errlog').read_text()
+        self.assertIn('ERRORS', bad_log)
+        self.assertNotIn('all lines passed', bad_log)
+        self.assertIn('all lines passed', good_log)
+        self.assertNotIn('ERRORS', good_log)
+
+    def test_runs_are_separate(self):
+        checker = WarmChecker(self.script)
+        try:
+            self.assertEqual(checker.run(self.args('bad'), self.tmp, timeout=60), 1)
+            pid = checker.proc.pid
+            self.assertEqual(checker.run(self.args('good'), self.tmp, timeout=60), 0)
+            self.assertEqual(checker.proc.pid, pid)
+        finally:
+            checker.close()
+        self.assertErrlogs()
+
+    def test_stdout_restored(self):
+        # The checker points sys.stdout at its errlog and exits without
+        # putting it back.
+        stdout, stderr = sys.stdout, sys.stderr
+        self.assertEqual(run_script(self.script, self.args('bad'), self.tmp), 1)
+        self.assertIs(sys.stdout, stdout)
+        self.assertIs(sys.stderr, stderr)
+        self.assertEqual(run_script(self.script, self.args('good'), self.tmp), 0)
+        self.assertIs(sys.stdout, stdout)
+        self.assertErrlogs()
+
+
+@override_settings(CHECKER_RETRIES=2, CHECKER_RETRY_DELAY=60)
+class CheckerTimeoutTests(CheckerTestCase):
+    '''A run whose checker times out is marked so and tried again later.'''
+
+    task_options = {'checker_file': 'slow.sh', 'checker_timeout': 1}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.sub = cls.add_run('run1')
+
+    def setUp(self):
+        super().setUp()
+        self.add_checker('slow.sh', '#!/bin/sh\nsleep 30\n')
+        self.add_run_file(self.sub)
+
+    def test_timeout_is_retried(self):
+        queue = tasks.checker_queue('slow.sh')
+        with mock.patch.object(tasks._check_tasks[queue], 'schedule') as schedule:
+            tasks.check_submission(self.sub, 'slow.sh', attempt=1)
+        self.sub.refresh_from_db()
+        self.assertEqual(self.sub.is_validated, Submission.ValidationState.TIMEOUT)
+        schedule.assert_called_once_with(args=(self.sub, 'slow.sh'),
+                                         kwargs={'use_cache': True, 'attempt': 2},
+                                         delay=120)
+        self.assertFalse(CheckResult.objects.exists())
+
+        with mock.patch.object(tasks._check_tasks[queue], 'schedule') as schedule:
+            tasks.check_submission(self.sub, 'slow.sh', attempt=2)
+        schedule.assert_not_called()
+
+
+class CheckProgressTests(CheckerTestCase):
+    '''Checkers can report progress while they run, and the run page polls
+    a status endpoint for it.'''
+
+    task_options = {'checker_file': 'progress.sh'}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.sub = cls.add_run('run1')
+        cls.earlier = cls.add_run('run0')
+
+    def setUp(self):
+        super().setUp()
+        self.add_checker('progress.sh',
+                         '#!/bin/sh\n'
+                         'echo \'{"lines": 10}\' >> "$EVALBASE_PROGRESS"\n'
+                         'sleep 0.3\n'
+                         'echo \'{"lines": 20, "topics": 2}\' >> "$EVALBASE_PROGRESS"\n')
+        self.run_dir = self.add_run_file(self.sub).parent
+        self.enterContext(mock.patch('evalbase.checkrunner.PROGRESS_INTERVAL', 0.1))
+        cache.clear()
+
+    def test_progress_recorded(self):
+        tasks.check_submission(self.sub, 'progress.sh')
+        self.sub.refresh_from_db()
+        self.assertEqual(self.sub.is_validated, Submission.ValidationState.SUCCESS)
+        self.assertEqual(self.sub.check_progress, {'lines': 20, 'topics': 2})
+        self.assertGreater(self.sub.check_duration, 0.2)
+        self.assertFalse((self.run_dir / 'run1.progress').exists())
+
+    def test_status(self):
+        queued = timezone.now()
+        Submission.objects.filter(pk=self.earlier.pk).update(
+            check_queued=queued - timezone.timedelta(minutes=1))
+        Submission.objects.filter(pk=self.sub.pk).update(check_queued=queued)
+        Submission.objects.filter(task=self.task).update(check_duration=None)
+        self.add_run('run2', check_duration=120,
+                     is_validated=Submission.ValidationState.SUCCESS)
+
+        self.client.force_login(self.user)
+        url = reverse('run-status', args=['trec-test', 'tsk', 'run1'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        status = response.json()
+        self.assertEqual(status['state'], 'W')
+        self.assertEqual(status['position'], 1)
+        self.assertEqual(status['estimated_wait'], 120)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        Submission.objects.filter(pk=self.sub.pk).update(check_progress={'lines': 5})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['progress'], {'lines': 5})
+
+
+class CheckQueueTests(EvalbaseTestCase):
+    '''Checks go on their checker's queue, and each org's runs are queued
+    behind those of orgs with fewer runs waiting.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_org = Organization.objects.create(shortname='other', longname='Other',
+                                                    owner=cls.user, contact_person=cls.user,
+                                                    passphrase='q')
+
+    def setUp(self):
+        self.queues = {name: mock.Mock() for name in tasks._check_tasks}
+        self.enterContext(mock.patch.dict(tasks._check_tasks, self.queues))
+
+    def test_checker_queue(self):
+        self.assertEqual(tasks.checker_queue('check-ikat-driver.sh'), 'heavy')
+        self.assertEqual(tasks.checker_queue('check-biogen-driver.sh'), 'heavy')
+        self.assertEqual(tasks.checker_queue('tv16.check_avs.pl -t topics'), 'heavy')
+        self.assertEqual(tasks.checker_queue('check-stdtrec-run.py'),
+                         settings.CHECKER_DEFAULT_QUEUE)
+
+        sub = self.add_run('run1')
+        tasks.run_check_script(sub, 'check-ikat-driver.sh', use_cache=False)
+        self.queues['heavy'].assert_called_once_with(sub, 'check-ikat-driver.sh',
+                                                     use_cache=False, priority=0)
+        self.queues[settings.CHECKER_DEFAULT_QUEUE].assert_not_called()
+        sub.refresh_from_db()
+        self.assertIsNotNone(sub.check_queued)
+
+    def test_fair_share(self):
+        for runtag in ['run1', 'run2', 'run3']:
+            self.add_run(runtag)
+        self.add_run('done', is_validated=Submission.ValidationState.SUCCESS)
+        other = Submission.objects.create(runtag='other1', task=self.task, org=self.other_org,
+                                          submitted_by=self.user, file='runs/other1/other1',
+                                          has_evaluation=False)
+        queue = self.queues[settings.CHECKER_DEFAULT_QUEUE]
+
+        # Two other runs from org are waiting; none from other
+        tasks.run_check_script(Submission.objects.get(runtag='run3'), 'check.sh')
+        self.assertEqual(queue.call_args.kwargs['priority'], -2)
+        tasks.run_check_script(other, 'check.sh')
+        self.assertEqual(queue.call_args.kwargs['priority'], 0)
+
+
+class BulkValidationTests(CheckerTestCase):
+    '''kick_validation --bulk checks the runs itself and summarizes.'''
+
+    task_options = {'checker_file': 'check.sh'}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for runtag in ['good1', 'good2', 'bad']:
+            cls.add_run(runtag)
+        cls.add_run('done', is_validated=Submission.ValidationState.SUCCESS)
+
+    def setUp(self):
+        super().setUp()
+        self.add_checker('check.sh', '#!/bin/sh\ngrep -q good "$1"\n')
+        for run in Submission.objects.all():
+            self.add_run_file(run, run.runtag)
+
+    def test_bulk(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            call_command('kick_validation', '--bulk', '--track', 'trk', '-j', '1')
+        states = dict(Submission.objects.values_list('runtag', 'is_validated'))
+        self.assertEqual(states, {'good1': 'S', 'good2': 'S', 'bad': 'F', 'done': 'S'})
+        self.assertIn('3 submissions in', out.getvalue())
+        self.assertIn('validation failed: 1', out.getvalue())
+        self.assertRegex(out.getvalue(), r'Failed:\n  trec-test/bad\tF')
+        self.assertIn('Slowest runs:', out.getvalue())
+        self.assertNotRegex(out.getvalue(), r'trec-test/good1\tcheck.sh')
+
+    def test_bulk_verbose(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            call_command('kick_validation', '--bulk', '--track', 'trk', '-j', '1', '-v', '2')
+        self.assertRegex(out.getvalue(), r'trec-test/good1\tcheck.sh\tS\t')
+        self.assertRegex(out.getvalue(), r'trec-test/bad\tcheck.sh\tF\t')
+
+    def test_bulk_check_crashes(self):
+        # A run deleted after the list was made can't even be looked up
+        bulk_submissions = kick_validation.Command.bulk_submissions
+        with mock.patch.object(kick_validation.Command, 'bulk_submissions',
+                               lambda cmd, options: bulk_submissions(cmd, options) + [0]):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                call_command('kick_validation', '--bulk', '--track', 'trk', '-j', '1')
+        states = dict(Submission.objects.values_list('runtag', 'is_validated'))
+        self.assertEqual(states, {'good1': 'S', 'good2': 'S', 'bad': 'F', 'done': 'S'})
+        self.assertIn('4 submissions in', out.getvalue())
+        self.assertIn('checker errors: 1', out.getvalue())
+        self.assertIn('submission 0\t-\tDoesNotExist: ', out.getvalue())
+
+
+class AddEvalsTests(EvalbaseTestCase):
+    '''add_evals imports a directory of eval files in one go, and leaves
+    unchanged ones alone.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.add_run('run1')
+        cls.add_run('run2')
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        evals = tempfile.TemporaryDirectory()
+        self.addCleanup(evals.cleanup)
+        self.evals = Path(evals.name)
+        (self.evals / 'a/b').mkdir(parents=True)
+        (self.evals / 'a/run1.trec_eval').write_text('map\t1\t0.5\nmap\tall\t0.5\n')
+        (self.evals / 'a/b/run2.trec_eval').write_text('map\t1\t0.25\nmap\tall\t0.25\n')
+
+    def add_evals(self, *args):
+        with (contextlib.redirect_stdout(io.StringIO()) as out,
+              self.captureOnCommitCallbacks(execute=True)):
+            call_command('add_evals', 'tsk', 'trec_eval', '-d', str(self.evals), *args)
+        return out.getvalue()
+
+    def test_import(self):
+        out = self.add_evals()
+        self.assertIn('2 imported, 0 unchanged', out)
+        means = dict(Score.objects.filter(topic=None)
+                     .values_list('evaluation__submission__runtag', 'value'))
+        self.assertEqual(means, {'run1': 0.5, 'run2': 0.25})
+        eval = Evaluation.objects.get(submission__runtag='run2')
+        self.assertEqual(Path(eval.filename.path).read_text(),
+                         (self.evals / 'a/b/run2.trec_eval').read_text())
+
+        out = self.add_evals()
+        self.assertIn('0 imported, 2 unchanged', out)
+
+        (self.evals / 'a/run1.trec_eval').write_text('map\t1\t0.75\nmap\tall\t0.75\n')
+        with self.assertRaises(CommandError):
+            self.add_evals()
+        out = self.add_evals('-f')
+        self.assertIn('2 imported, 0 unchanged', out)
+        self.assertEqual(Evaluation.objects.count(), 2)
+        self.assertEqual(Score.objects.get(evaluation__submission__runtag='run1', topic=None).value,
+                         0.75)
+
+    def test_failed_import(self):
+        self.add_evals()
+        eval = Evaluation.objects.get(submission__runtag='run1')
+        old_text = Path(eval.filename.path).read_text()
+        (self.evals / 'a/run1.trec_eval').write_text('map\tall\t0.75\n')
+        with mock.patch.object(Evaluation, 'load_scores', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.add_evals('-f')
+        self.assertEqual(Path(eval.filename.path).read_text(), old_text)
+        self.assertEqual(list(Path(eval.filename.path).parent.glob('*.importing')), [])
+
+    def test_old_files_removed(self):
+        self.add_evals()
+        eval = Evaluation.objects.get(submission__runtag='run1')
+        old_path = Path(eval.filename.path).with_name('old.trec_eval')
+        Path(eval.filename.path).rename(old_path)
+        Evaluation.objects.filter(pk=eval.pk).update(
+            filename=str(Path(eval.filename.name).with_name('old.trec_eval')))
+        eval.refresh_from_db()
+        eval.line_index()
+        self.assertTrue(index_path(old_path).exists())
+
+        self.add_evals('-f')
+        eval.refresh_from_db()
+        self.assertTrue(Path(eval.filename.path).exists())
+        self.assertTrue(index_path(eval.filename.path).exists())
+        self.assertFalse(old_path.exists())
+        self.assertFalse(index_path(old_path).exists())
+
+
+class FileResponseTests(EvalbaseTestCase):
+    '''Run and eval downloads answer conditional and range requests, or
+    leave sending the file to the front end.'''
+
+    content = b'0123456789'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.sub = cls.add_run('run1')
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.path = Path(self.sub.file.path)
+        self.path.parent.mkdir(parents=True)
+        self.path.write_bytes(self.content)
+        self.url = reverse('runfile', args=['trec-test', 'tsk', 'run1'])
+        self.client.force_login(self.user)
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        self.addCleanup(response.close)
+        return response
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Disposition'], 'inline; filename="run1"')
+
+    def test_range(self):
+        response = self.get(Range='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+
+        response = self.get(Range='bytes=-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), b'789')
+
+        response = self.get(Range='bytes=8-')
+        self.assertEqual(self.body(response), b'89')
+        self.assertEqual(response['Content-Range'], 'bytes 8-9/10')
+
+    def test_multiple_ranges(self):
+        # Only single ranges are supported, so this gets the whole file
+        response = self.get(Range='bytes=0-1,4-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_changed_since_range(self):
+        response = self.get(Range='bytes=2-5', If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+        etag = self.get()['ETag']
+        response = self.get(Range='bytes=2-5', If_Range=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_not_modified(self):
+        first = self.get()
+        response = self.get(If_None_Match=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        response = self.get(If_Modified_Since=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        self.path.write_bytes(b'changed')
+        response = self.get(If_None_Match=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), b'changed')
+
+    @override_settings(SENDFILE_HEADER='X-Sendfile')
+    def test_sendfile(self):
+        response = self.get(Range='bytes=2-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Sendfile'], str(self.path))
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Disposition'], 'inline; filename="run1"')
+
+        response = self.get(If_None_Match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.has_header('X-Sendfile'))
+
+
+class EvaluationScoreTests(EvalbaseTestCase):
+    '''Eval files are parsed into Scores once, and again only when the file
+    changes.  The appendix is a table of the runs' mean scores.'''
+
+    event_phase = True
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.run1 = cls.add_run('run1')
+        cls.run2 = cls.add_run('run2')
+        cls.appendix = Appendix.objects.create(task=cls.task, name='trec_eval',
+                                               measure_name_field=0, topic_field=1,
+                                               score_field=2, average_topic='all',
+                                               measures=['map', 'P_10'])
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def add_eval(self, run, text):
+        eval = Evaluation(submission=run, name='trec_eval')
+        eval.filename.name = str(get_eval_path(eval, 'x'))
+        path = Path(eval.filename.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        eval.save()
+        return eval
+
+    def scores(self, eval):
+        return {(s.measure, s.topic): s.value for s in eval.score_set.all()}
+
+    def test_load_scores(self):
+        long_topic = 't' * 60
+        eval = self.add_eval(self.run1, 'runid\tall\trun1\n'
+                                        'map\t1\t0.5\n'
+                                        'map\t2\t0.25\n'
+                                        'map\tall\t0.4\n'
+                                        'P_10\t1\t0.2\n'
+                                        f'P_10\t{long_topic}\t0.4\n'
+                                        'short\n')
+        scores = self.scores(eval)
+        # No average line for P_10, so its mean is worked out
+        self.assertAlmostEqual(scores.pop(('P_10', None)), 0.3)
+        self.assertEqual(scores, {('map', None): 0.4, ('map', '1'): 0.5, ('map', '2'): 0.25,
+                                  ('P_10', '1'): 0.2, ('P_10', 't' * 50): 0.4})
+        self.assertIsNotNone(Evaluation.objects.get(pk=eval.pk).scores_loaded)
+
+    def test_reparse_changed_file(self):
+        eval = self.add_eval(self.run1, 'map\tall\t0.5\n')
+        with mock.patch.object(Evaluation, 'load_scores') as load_scores:
+            eval.save()
+        load_scores.assert_not_called()
+
+        path = Path(eval.filename.path)
+        path.write_text('map\tall\t0.75\n')
+        later = time.time() + 10
+        os.utime(path, (later, later))
+        eval.save()
+        self.assertEqual(self.scores(eval), {('map', None): 0.75})
+
+    def test_appendix_pivot(self):
+        self.add_eval(self.run1, 'map\tall\t0.5\nP_10\tall\t0.3\nndcg\tall\t0.9\n')
+        self.add_eval(self.run2, 'map\t1\t0.5\nmap\t2\t0.7\n')
+        means, ranks, orgs = views.appendix_means(self.appendix, Evaluation.objects.all())
+        self.assertEqual(list(means.columns), ['map', 'P_10'])
+        self.assertEqual(means.loc['run1'].tolist(), [0.5, 0.3])
+        self.assertAlmostEqual(means.loc['run2', 'map'], 0.6)
+        self.assertTrue(math.isnan(means.loc['run2', 'P_10']))
+        self.assertEqual(dict(orgs), {'run1': 'org', 'run2': 'org'})
+
+        response = self.client.get(reverse('appendix', args=['trec-test', 'tsk', 'trec_eval']))
+        self.assertContains(response, '<th>P_10</th>')
+        self.assertContains(response, '<td>0.3000</td>')
+        self.assertContains(response, '<td>0.6000</td>')
+        self.assertNotContains(response, 'ndcg')
+
+    def appendix_rows(self):
+        response = self.client.get(reverse('appendix', args=['trec-test', 'tsk', 'trec_eval']))
+        self.assertEqual(response.status_code, 200)
+        return re.findall(r'<tr>\s*<td>(\d*)</td>\s*<th>\s*<a [^>]*>(\w+)</a>\s*</th>\s*'
+                          r'<td>\w+</td>\s*<td>([\d.]*)</td>',
+                          response.content.decode())
+
+    def test_appendix_order_and_rank(self):
+        self.appendix.sort_column = 'map'
+        self.appendix.save()
+        self.add_eval(self.run1, 'map\tall\t0.5\n')
+        self.add_eval(self.run2, 'map\tall\t0.7\n')
+        self.add_eval(self.add_run('run3'), 'map\tall\t0.5\n')
+        self.add_eval(self.add_run('run4'), 'P_10\tall\t0.9\n')
+
+        means, ranks, _ = views.appendix_means(self.appendix, Evaluation.objects.all())
+        self.assertEqual(list(means.index), ['run2', 'run1', 'run3', 'run4'])
+        self.assertEqual(ranks[['run2', 'run1', 'run3']].tolist(), [1, 2, 2])
+        self.assertTrue(math.isnan(ranks['run4']))
+
+        # Ties share a rank, and runs without the sort measure come last, unranked
+        self.assertEqual(self.appendix_rows(),
+                         [('1', 'run2', '0.7000'), ('2', 'run1', '0.5000'),
+                          ('2', 'run3', '0.5000'), ('', 'run4', '')])
+
+    def test_appendix_cached_until_changed(self):
+        self.appendix.sort_column = 'map'
+        self.appendix.save()
+        eval = self.add_eval(self.run1, 'map\tall\t0.5\n')
+        self.assertEqual(self.appendix_rows(), [('1', 'run1', '0.5000')])
+        with mock.patch.object(views, 'appendix_means') as appendix_means:
+            self.assertEqual(self.appendix_rows(), [('1', 'run1', '0.5000')])
+        appendix_means.assert_not_called()
+
+        self.add_eval(self.run2, 'map\tall\t0.7\n')
+        self.assertEqual(self.appendix_rows(),
+                         [('1', 'run2', '0.7000'), ('2', 'run1', '0.5000')])
+
+        Path(eval.filename.path).write_text('map\tall\t0.9\n')
+        eval.load_scores()
+        self.assertEqual(self.appendix_rows(),
+                         [('1', 'run1', '0.9000'), ('2', 'run2', '0.7000')])
+
+        Evaluation.objects.filter(submission=self.run2).delete()
+        self.assertEqual(self.appendix_rows(), [('1', 'run1', '0.9000')])
+
+    def test_empty_eval_parsed_once(self):
+        eval = self.add_eval(self.run1, 'runid\tall\trun1\n')
+        self.assertEqual(self.scores(eval), {})
+        url = reverse('appendix', args=['trec-test', 'tsk', 'trec_eval'])
+        with mock.patch.object(Evaluation, 'load_scores') as load_scores:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        load_scores.assert_not_called()
+
+        # Changing the appendix's layout drops the scores, and they're parsed again
+        self.appendix.average_topic = 'mean'
+        self.appendix.save()
+        with mock.patch.object(Evaluation, 'load_scores') as load_scores:
+            self.client.get(url)
+        load_scores.assert_called_once()
+
+    def test_appendix_layout_change(self):
+        eval = self.add_eval(self.run1, 'map\tall\t0.5\nmap\tmean\t0.25\n')
+        self.appendix.sort_column = 'map'
+        self.appendix.save()
+        self.appendix.measures = 'all'
+        self.appendix.save(update_fields=['measures'])
+        self.assertEqual(self.scores(eval), {('map', None): 0.5, ('map', 'mean'): 0.25})
+
+        self.appendix.average_topic = 'mean'
+        self.appendix.save()
+        self.assertEqual(self.scores(eval), {})
+        self.assertEqual(self.appendix_rows(), [('1', 'run1', '0.2500')])
+
+        # Moving the appendix to other evals drops the scores of both
+        self.appendix.name = 'ndcg'
+        self.appendix.save(update_fields=['name'])
+        self.assertIsNone(Evaluation.objects.get(pk=eval.pk).scores_loaded)
+
+    def test_missing_file(self):
+        eval = Evaluation(submission=self.run1, name='trec_eval')
+        eval.filename.name = str(get_eval_path(eval, 'x'))
+        eval.save()
+        self.assertIsNone(Evaluation.objects.get(pk=eval.pk).scores_loaded)
+        # The appendix leaves it out rather than failing
+        self.assertEqual(self.appendix_rows(), [])
+
+
+class LineIndexTests(SimpleTestCase):
+    '''Eval files are indexed by line, measure and topic, and the index
+    is saved next to the file until the file changes.'''
+
+    text = ('map\t1\t0.5\n'
+            '\n'
+            'map\t2\t0.25\n'
+            'short\n'
+            'P_10\t1\t0.2\n'
+            'map\tall\t0.375\n')
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / 'run1.trec_eval'
+        self.path.write_text(self.text)
+        self.enterContext(mock.patch.dict(lineindex._indexes, clear=True))
+
+    def test_build(self):
+        index = LineIndex.build(self.path, 0, 1)
+        self.assertEqual(len(index), 6)
+        self.assertEqual(index.measures, ['map', 'P_10'])
+        self.assertEqual(index.topics, ['1', '2', 'all'])
+        # Blank and short lines have no measure or topic
+        self.assertEqual(index.measure_codes.tolist(), [0, -1, 0, -1, 1, 0])
+        self.assertEqual(index.topic_codes.tolist(), [0, -1, 1, -1, 0, 2])
+        self.assertEqual(index.offsets[-1], self.path.stat().st_size)
+
+    def test_select(self):
+        index = LineIndex.build(self.path, 0, 1)
+        self.assertEqual(index.select().tolist(), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(index.select(measure='map').tolist(), [0, 2, 5])
+        self.assertEqual(index.select(topic='1').tolist(), [0, 4])
+        self.assertEqual(index.select(measure='map', topic='1').tolist(), [0])
+        self.assertEqual(index.select(measure='ndcg').tolist(), [])
+        self.assertEqual(index.select(topic='3').tolist(), [])
+        self.assertEqual(index.select(measure='map', topic='3').tolist(), [])
+
+    def test_read_lines(self):
+        index = LineIndex.build(self.path, 0, 1)
+        self.assertEqual(index.read_lines(self.path, [5, 0, 1, 3]),
+                         ['map\tall\t0.375', 'map\t1\t0.5', '', 'short'])
+        self.assertEqual(index.read_lines(self.path, index.select(measure='ndcg')), [])
+
+    def test_saved(self):
+        index = line_index(self.path, 0, 1)
+        self.assertTrue(index_path(self.path).exists())
+        lineindex._indexes.clear()
+        with mock.patch.object(LineIndex, 'build') as build:
+            self.assertEqual(line_index(self.path, 0, 1).measures, index.measures)
+        build.assert_not_called()
+
+    def test_rebuilt_when_file_changes(self):
+        line_index(self.path, 0, 1)
+        stat = self.path.stat()
+
+        # A different size
+        self.path.write_text('ndcg\t1\t0.5\n')
+        self.assertEqual(line_index(self.path, 0, 1).measures, ['ndcg'])
+
+        # The same size, but a later mtime
+        self.path.write_text('P_5\t1\t0.50\n')
+        later = stat.st_mtime + 10
+        os.utime(self.path, (later, later))
+        lineindex._indexes.clear()
+        index = line_index(self.path, 0, 1)
+        self.assertEqual(index.measures, ['P_5'])
+        self.assertEqual(index.read_lines(self.path, [0]), ['P_5\t1\t0.50'])
+
+        # Indexing other columns doesn't use the saved index either
+        self.assertEqual(line_index(self.path, 1, 0).measures, ['1'])
+
+
+class EvalLinesTests(EvalbaseTestCase):
+    '''An eval output can be read a page at a time, by measure and topic,
+    by those who may see the eval.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.sub = cls.add_run('run1')
+        cls.other = User.objects.create_user('other', 'other@example.org')
+        other_org = Organization.objects.create(shortname='org2', longname='Org 2',
+                                                owner=cls.other, contact_person=cls.other,
+                                                passphrase='p')
+        other_org.conference.add(cls.conf)
+        other_org.members.add(cls.other)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.enterContext(mock.patch.dict(lineindex._indexes, clear=True))
+        eval = Evaluation(submission=self.sub, name='trec_eval')
+        eval.filename.name = str(get_eval_path(eval, 'x'))
+        path = Path(eval.filename.path)
+        path.parent.mkdir(parents=True)
+        path.write_text(''.join(f'{measure}\t{topic}\t0.5\n'
+                                for measure in ['map', 'P_10']
+                                for topic in range(1, 6)))
+        eval.save()
+        self.client.force_login(self.user)
+
+    def lines(self, **params):
+        response = self.client.get(reverse('eval-lines', args=['trec-test', 'tsk', 'run1', 'trec_eval']),
+                                   params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages(self):
+        data = self.lines(size=4)
+        self.assertEqual(data['measures'], ['map', 'P_10'])
+        self.assertEqual(data['topics'], ['1', '2', '3', '4', '5'])
+        self.assertEqual((data['page'], data['num_pages'], data['num_lines']), (1, 3, 10))
+        self.assertEqual(data['first_line'], 1)
+        self.assertEqual(data['lines'], ['map\t1\t0.5', 'map\t2\t0.5', 'map\t3\t0.5', 'map\t4\t0.5'])
+
+        data = self.lines(size=4, page=3)
+        self.assertEqual(data['first_line'], 9)
+        self.assertEqual(data['lines'], ['P_10\t4\t0.5', 'P_10\t5\t0.5'])
+
+        # Out-of-range and bad page numbers and sizes fall back
+        self.assertEqual(self.lines(size=4, page=9)['page'], 3)
+        self.assertEqual(self.lines(page='x')['page'], 1)
+        self.assertEqual(len(self.lines(size='x')['lines']), 10)
+
+    def test_filters(self):
+        data = self.lines(measure='P_10', size=2, page=2)
+        self.assertEqual(data['num_lines'], 5)
+        self.assertEqual(data['first_line'], 8)
+        self.assertEqual(data['lines'], ['P_10\t3\t0.5', 'P_10\t4\t0.5'])
+
+        data = self.lines(topic='2')
+        self.assertEqual(data['lines'], ['map\t2\t0.5', 'P_10\t2\t0.5'])
+        self.assertEqual(self.lines(measure='map', topic='5')['lines'], ['map\t5\t0.5'])
+
+        data = self.lines(measure='ndcg')
+        self.assertEqual((data['num_lines'], data['first_line'], data['lines']), (0, None, []))
+        self.assertEqual(self.lines(topic='6')['lines'], [])
+
+    def test_viewer(self):
+        response = self.client.get(reverse('eval-viewer', args=['trec-test', 'tsk', 'run1', 'trec_eval']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['eval'].name, 'trec_eval')
+
+    def test_other_org(self):
+        self.client.force_login(self.other)
+        for name in ['eval-lines', 'eval-viewer']:
+            response = self.client.get(reverse(name, args=['trec-test', 'tsk', 'run1', 'trec_eval']))
+            self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('eval-lines', args=['trec-test', 'tsk', 'run1', 'ndcg']))
+        self.assertEqual(response.status_code, 403)
+
+
+class FileDigestTests(SimpleTestCase):
+    '''File digests are remembered until the file changes, and only so
+    many are kept.'''
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.enterContext(mock.patch.dict(utils._digests, clear=True))
+
+    def test_changed_file(self):
+        path = self.dir / 'run1'
+        path.write_text('run\n')
+        first = utils.file_digest(path)
+        self.assertEqual(utils.file_digest(path), first)
+
+        path.write_text('run, changed\n')
+        self.assertNotEqual(utils.file_digest(path), first)
+        # The old digest is dropped
+        self.assertEqual(len(utils._digests), 1)
+
+    @mock.patch.object(utils, 'MAX_DIGESTS', 2)
+    def test_bounded(self):
+        for name in ['run1', 'run2', 'run3']:
+            (self.dir / name).write_text(f'{name}\n')
+            utils.file_digest(self.dir / name)
+        self.assertEqual([Path(key[0]).name for key in utils._digests], ['run2', 'run3'])
+
+
+class EvalsZipTests(EvalbaseTestCase):
+    '''All of an org's evals for a task, and the task's stats files, can
+    be downloaded as one zip, which is streamed as it's made.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = User.objects.create_user('other', 'other@example.org')
+        other_org = Organization.objects.create(shortname='org2', longname='Org 2',
+                                                owner=cls.other, contact_person=cls.other,
+                                                passphrase='p')
+        other_org.conference.add(cls.conf)
+        cls.other_run = Submission.objects.create(runtag='other1', task=cls.task, org=other_org,
+                                                  submitted_by=cls.other,
+                                                  file='runs/other1/other1',
+                                                  has_evaluation=False)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.client.force_login(self.user)
+
+    def add_file(self, field, text):
+        path = Path(field.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+    def add_eval(self, run, name, text):
+        eval = Evaluation(submission=run, name=name)
+        eval.filename.name = str(get_eval_path(eval, 'x'))
+        self.add_file(eval.filename, text)
+        Evaluation.objects.bulk_create([eval])
+
+    def test_download(self):
+        run1, run2 = self.add_run('run1'), self.add_run('run2')
+        self.add_eval(run1, 'trec_eval', 'map\tall\t0.5\n')
+        self.add_eval(run1, 'ndcg', 'ndcg\tall\t0.7\n')
+        self.add_eval(run2, 'trec_eval', 'map\tall\t0.25\n' * 1000)
+        self.add_eval(self.other_run, 'trec_eval', 'map\tall\t0.9\n')
+        stats = StatsFile(task=self.task, name='trec_eval.stats')
+        stats.filename.name = get_stats_path(stats, 'x')
+        self.add_file(stats.filename, 'map\t0.25\t0.375\t0.5\n')
+        stats.save()
+
+        response = self.client.get(reverse('evals-zip', args=['trec-test', 'tsk']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as zipf:
+            self.assertIsNone(zipf.testzip())
+            self.assertEqual({name: zipf.read(name).decode() for name in zipf.namelist()},
+                             {'run1.trec_eval': 'map\tall\t0.5\n',
+                              'run1.ndcg': 'ndcg\tall\t0.7\n',
+                              'run2.trec_eval': 'map\tall\t0.25\n' * 1000,
+                              'tsk.trec_eval.stats': 'map\t0.25\t0.375\t0.5\n'})
+
+    def test_no_evals(self):
+        self.add_run('run1')
+        response = self.client.get(reverse('evals-zip', args=['trec-test', 'tsk']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_stream_zip(self):
+        data = os.urandom(256 * 1024 + 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            big = Path(tmp) / 'big'
+            big.write_bytes(data)
+            small = Path(tmp) / 'small'
+            small.write_bytes(b'small\n')
+            pieces = list(stream_zip([(big, 'a/big'), (small, 'small')], chunk_size=1024))
+
+        # The big file is sent as it's compressed, not all at the end
+        self.assertLess(max(len(p) for p in pieces), len(data) // 4)
+        with zipfile.ZipFile(io.BytesIO(b''.join(pieces))) as zipf:
+            self.assertIsNone(zipf.testzip())
+            self.assertEqual(zipf.namelist(), ['a/big', 'small'])
+            self.assertEqual(zipf.read('a/big'), data)
+            self.assertEqual(zipf.read('small'), b'small\n')
+
+
+@override_settings(CHECKER_FILES={'check.sh': ['lib']})
+class CheckResultCacheTests(CheckerTestCase):
+    '''Checker outcomes are cached until the run file or anything the
+    checker reads changes, and only if they're about the run.'''
+
+    task_options = {'checker_file': 'check.sh'}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.sub = cls.add_run('run1')
+
+    def setUp(self):
+        super().setUp()
+        self.calls = self.root / 'calls'
+        self.add_checker('check.sh', f'#!/bin/sh\necho >> {self.calls}\n'
+                                     '. "$(dirname "$0")/lib/rules.sh"\n')
+        self.add_checker('lib/rules.sh', 'echo "No errors" > "$1.errlog"\nexit 0\n')
+        self.add_run_file(self.sub)
+
+    def check(self, **kwargs):
+        tasks.check_submission(self.sub, 'check.sh', **kwargs)
+        self.sub.refresh_from_db()
+        return len(self.calls.read_text().splitlines())
+
+    def test_cache_hit(self):
+        self.assertEqual(self.check(), 1)
+        self.assertEqual(self.check(), 1)
+        self.assertEqual(self.sub.is_validated, Submission.ValidationState.SUCCESS)
+        self.assertEqual(CheckResult.objects.count(), 1)
+
+    def test_checker_change(self):
+        self.assertEqual(self.check(), 1)
+        self.add_checker('lib/rules.sh', 'echo "ERROR" > "$1.errlog"\nexit 255\n')
+        self.assertEqual(self.check(), 2)
+        self.assertEqual(self.sub.is_validated, Submission.ValidationState.FAIL)
+        # Logs in the checker's directories don't count
+        (self.checkers / 'lib/rules.log').write_text('log\n')
+        self.assertEqual(self.check(), 2)
+
+    def test_no_cache(self):
+        self.assertEqual(self.check(), 1)
+        self.assertEqual(self.check(use_cache=False), 2)
+
+    def test_not_cached(self):
+        for rules in ['echo "Service down" > "$1.errlog"\nexit 75\n',
+                      'echo "Starting" > "$1.errlog"\nkill -9 $$\n',
+                      'exit 255\n']:
+            self.add_checker('lib/rules.sh', rules)
+            calls = self.check()
+            self.assertEqual(self.sub.is_validated, Submission.ValidationState.FAIL)
+            self.assertEqual(self.check(), calls + 1)
+        self.assertFalse(CheckResult.objects.exists())
+
+    def test_limits_change(self):
+        self.add_checker('lib/rules.sh',
+                         'echo "MemoryError" > "$1.errlog"\nexit 1\n')
+        self.assertEqual(self.check(), 1)
+        self.assertEqual(self.check(), 1)
+        Task.objects.filter(pk=self.task.pk).update(checker_memory_mb=64 * 1024)
+        self.sub.task.refresh_from_db()
+        self.assertEqual(self.check(), 2)
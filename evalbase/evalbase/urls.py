@@ -53,6 +53,8 @@ urlpatterns = ([
 
     path('conf/<str:conf>/<str:task>/submit', views.submit_run,
          name='submit'),
+    path('conf/<str:conf>/<str:task>/runtag', views.runtag_check,
+         name='runtag-check'),
     path('conf/<str:conf>/<str:task>/list', views.list_submissions,
          name='task_submissions'),
     path('conf/<str:conf>/<str:task>/evals', views.download_all_my_evals, name='evals-zip'),
@@ -61,8 +63,11 @@ urlpatterns = ([
     path('run/<str:conf>/<str:task>/<str:runtag>', views.view_submission, name='run'),
     path('run/<str:conf>/<str:task>/<str:runtag>/run', views.download_submission_file, name='runfile'),
     path('run/<str:conf>/<str:task>/<str:runtag>/delete', views.delete_submission, name='run-delete'),
+    path('run/<str:conf>/<str:task>/<str:runtag>/status', views.run_status, name='run-status'),
     path('conf/<str:conf>/<str:task>/<str:runtag>/edit', views.edit_submission, name='edit-task'),
     path('run/<str:conf>/<str:task>/<str:runtag>/<str:eval>', views.view_eval, name='eval'),
+    path('run/<str:conf>/<str:task>/<str:runtag>/<str:eval>/view', views.eval_viewer, name='eval-viewer'),
+    path('run/<str:conf>/<str:task>/<str:runtag>/<str:eval>/lines', views.eval_lines, name='eval-lines'),
     path('howto/', views.howto_view, name="howto"),
     path('', views.home_view, name='home'),
 
@@ -1,5 +1,68 @@
 import collections
+import hashlib
+import io
+import zipfile
+from pathlib import Path
 
 def infinite_defaultdict():
     '''A bottomless defaultdict.''' 
     return collections.defaultdict(infinite_defaultdict)
+
+# how many file digests to keep in memory
+MAX_DIGESTS = 1024
+
+_digests = {}
+
+def file_digest(path):
+    '''The sha256 hex digest of a file.  Digests are remembered until
+    the file's size or modification time changes.'''
+    path = Path(path)
+    stat = path.stat()
+    resolved = str(path.resolve())
+    memo_key = (resolved, stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _digests:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b''):
+                sha.update(chunk)
+        for key in [k for k in _digests if k[0] == resolved]:
+            del _digests[key]
+        while len(_digests) >= MAX_DIGESTS:
+            del _digests[next(iter(_digests))]
+        _digests[memo_key] = sha.hexdigest()
+    return _digests[memo_key]
+
+
+class _ZipOutput(io.RawIOBase):
+    '''A write-only, unseekable file for ZipFile to write to, which holds
+    on to what's written until it's taken with pop().'''
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_zip(files, chunk_size=1 << 16):
+    '''Generate a ZIP archive of files, a list of (path, name in the archive),
+    a piece at a time.  Each file is compressed as it's read, so only about
+    chunk_size bytes of it are in memory at once.'''
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
+        for path, arcname in files:
+            zinfo = zipfile.ZipInfo.from_file(path, arcname=arcname)
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            with open(path, 'rb') as src, zipf.open(zinfo, 'w') as dest:
+                for chunk in iter(lambda: src.read(chunk_size), b''):
+                    dest.write(chunk)
+                    yield output.pop()
+            yield output.pop()
+    yield output.pop()
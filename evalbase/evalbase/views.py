@@ -1,10 +1,11 @@
 import json
+import hashlib
+import os
+import re
 import time
 import uuid
 import logging
 import collections
-import zipfile
-import tempfile
 from django.conf import settings
 from django.contrib.auth import authenticate, login, get_user_model
 from django.contrib.auth.models import User
@@ -12,14 +13,22 @@ from django.core.mail import send_mail
 from django.urls import reverse_lazy
 from django.utils.datastructures import MultiValueDictKeyError
 from django.views.decorators.http import require_http_methods
-from django.http import HttpResponseRedirect, Http404, HttpResponse
+from django.http import HttpResponseRedirect, Http404, HttpResponse, StreamingHttpResponse, FileResponse, JsonResponse
+from django.core.paginator import Paginator
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.views.decorators.cache import never_cache
+from django.db import transaction
 from django.db.models.query import QuerySet
+from django.db.models import OuterRef, Subquery, Count, F, Max
 from django.contrib import messages
 import secrets
 import jwt
+import pandas as pd
 
 import requests
 import urllib
@@ -27,8 +36,8 @@ import urllib
 from .models import *
 from .forms import *
 from .decorators import *
-from .tasks import run_check_script
-from .utils import infinite_defaultdict
+from .tasks import run_check_script, check_status
+from .utils import stream_zip
 
 def site_is_down(request):
     return render(request, 'evalbase/site-down.html')
@@ -458,56 +467,118 @@ def home_view(request, *args, **kwargs):
 # user has submitted runs, they are listed here.
 
 
+# How long the conference page keeps a conference's tracks and tasks.
+# Changes clear it sooner, this is just a backstop.
+CONFERENCE_TREE_TIMEOUT = 60 * 60
+
+def _build_conference_tree(conf):
+    testing = set(SubmitForm.objects
+                  .filter(task__track__conference=conf)
+                  .filter(testing=True)
+                  .values_list('task_id', flat=True))
+    task_appendices = collections.defaultdict(list)
+    for task_id, name in (Appendix.objects
+                          .filter(task__track__conference=conf)
+                          .order_by('pk')
+                          .values_list('task_id', 'name')):
+        task_appendices[task_id].append(name)
+
+    track_tasks = collections.defaultdict(list)
+    for task in Task.objects.filter(track__conference=conf).order_by('pk'):
+        track_tasks[task.track_id].append({
+            'pk': task.pk,
+            'shortname': task.shortname,
+            'longname': task.longname,
+            'task_open': task.task_open,
+            'deadline': task.deadline,
+            'required': task.required,
+            'testing_form': task.pk in testing,
+            'appendices': task_appendices[task.pk],
+        })
+
+    tracks = []
+    papers = None
+    appendices = []
+    for track in Track.objects.filter(conference=conf).order_by('longname', 'pk'):
+        entry = {
+            'pk': track.pk,
+            'shortname': track.shortname,
+            'longname': track.longname,
+            'url': track.url,
+            'tasks': track_tasks[track.pk],
+        }
+        if track.shortname == 'papers':
+            papers = entry
+        else:
+            tracks.append(entry)
+        for task in entry['tasks']:
+            for name in task['appendices']:
+                appendices.append({
+                    'track': entry,
+                    'task': task,
+                    'name': name,
+                })
+    appendices.sort(key=lambda a: (a['track']['shortname'], a['task']['shortname']))
+    return {'tracks': tracks, 'papers': papers, 'appendices': appendices}
+
+
+def conference_tree(conf):
+    '''The tracks of a conference, their tasks with whether they're open,
+    deadlines and testing forms, and the tasks' appendices.  This is the
+    same for everyone, so it's cached, and the cached copy is cleared when
+    a Track, Task, SubmitForm or Appendix is saved or deleted.'''
+    key = conference_tree_key(conf.pk)
+    tree = cache.get(key)
+    if tree is None:
+        tree = _build_conference_tree(conf)
+        cache.set(key, tree, CONFERENCE_TREE_TIMEOUT)
+    return tree
+
+
 @evalbase_login_required
 @user_is_participant
 @require_http_methods(['GET'])
 def conf_tracks(request, *args, **kwargs):
     '''List the tracks in a conference.'''
-    conf = Conference.objects.get(shortname=kwargs['conf'])
-    agreements = conf.agreements.exclude(signature__user=request.user.pk)
+    auth = request_auth(request, kwargs)
+    conf = auth.conf
+    agreements = auth.unsigned_agreements
     if agreements:
         return HttpResponseRedirect(reverse_lazy('sign-agreement',
                                      kwargs={'conf': conf,
                                              'agreement': agreements[0]}))
-    tracks = (Track.objects
-              .filter(conference=conf)
-              .exclude(shortname='papers'))
-    papers = (Track.objects
-              .filter(conference=conf)
-              .filter(shortname='papers')
-              .first())
-    tasks = (Task.objects
-             .filter(track__conference=conf))
-    orgs = (Organization.objects
-            .filter(members__pk=request.user.pk)
-            .filter(conference=conf))
+    tree = conference_tree(conf)
+
+    # The rest depends on who's asking
+    tracks_i_coordinate = {track['shortname'] for track in tree['tracks'] + [tree['papers']]
+                           if track and track['pk'] in auth.coordinated_tracks}
+    tasks_with_runs = set()
+    if tracks_i_coordinate or request.user.is_staff:
+        tasks_with_runs = set(Submission.objects
+                              .filter(task__track__conference=conf)
+                              .values_list('task_id', flat=True)
+                              .distinct())
     myruns = (Submission.objects
               .filter(task__track__conference=conf)
-              .filter(org__in=orgs)
+              .filter(org__in=auth.orgs)
+              .select_related('task__track', 'org', 'submitted_by')
               .order_by('task', 'date'))
-    appendices = None
-    if conf.event_phase or conf.complete:
-        appendices = (Appendix.objects
-                      .filter(task__track__conference=conf)
-                      .order_by('task__track__shortname', 'task__shortname'))
-        appendices = { app.task.shortname: [ app ] for app in appendices }
- 
-    tracks_i_coordinate = set()
-    for track in Track.objects.filter(coordinators__pk=request.user.pk):
-        tracks_i_coordinate.add(track.shortname)
-
-    task_dict = collections.defaultdict(list)
-    for task in tasks:
-        task_dict[task.track.shortname].append(task)
+    # Tasks of mine that have been evaluated (for anyone, not just me)
+    tasks_with_evals = set(Evaluation.objects
+                           .filter(submission__task__in=myruns.values('task'))
+                           .values_list('submission__task_id', flat=True)
+                           .distinct())
 
     return render(request, 'evalbase/tasks.html',
-                  { 'tracks': tracks,
-                    'papers': papers,
+                  { 'tracks': tree['tracks'],
+                    'papers': tree['papers'],
                     'tracks_i_coordinate': tracks_i_coordinate,
-                    'tasks': task_dict,
+                    'tasks_with_runs': tasks_with_runs,
+                    'tasks_with_evals': tasks_with_evals,
                     'conf': conf,
                     'myruns': myruns,
-                    'appendices': appendices,
+                    'show_appendices': conf.event_phase or conf.complete,
+                    'appendices': tree['appendices'],
                     'agreements': agreements })
 
 
@@ -522,9 +593,7 @@ def sign_agreement(request, conf, agreement):
     template = 'evalbase/' + agrobj.template
 
     # Check if the form was already signed
-    existing = Signature.objects.filter(user=request.user,
-                                        agreement=agrobj)
-    if existing:
+    if has_signed(request.user, agrobj):
         return HttpResponseRedirect(reverse('tracks', kwargs={'conf': conf}))
 
     if request.method == 'POST':
@@ -568,22 +637,15 @@ def submit_run(request, *args, **kwargs):
     '''
     template_name = 'evalbase/submit.html'
 
-    conf = kwargs['conf']
-    task = kwargs['task']
+    auth = request_auth(request, kwargs)
+    conf = auth.conf
+    task = auth.task
     try:
-        conf = Conference.objects.get(shortname=conf)
-        task = Task.objects.get(shortname=task, track__conference=conf)
         submitform = SubmitForm.objects.get(task=task)
     except Exception as e:
         raise Http404(e)
 
-    is_coord = (Track.objects
-                .filter(conference=conf)
-                .filter(task=task)
-                .filter(coordinators__pk=request.user.pk)
-                .exists())
-
-    if not (request.user.is_staff or is_coord or task.task_open):
+    if not (auth.is_coordinator(task.track) or task.task_open):
         raise Http404('Task is not open')
 
     context = {}
@@ -592,9 +654,7 @@ def submit_run(request, *args, **kwargs):
     context['track'] = task.track
     context['form'] = submitform
     context['user'] = request.user
-    context['orgs'] = (Organization.objects
-                       .filter(members__pk=request.user.pk)
-                       .filter(conference=conf))
+    context['orgs'] = auth.orgs
     context['mode'] = 'submit'
     context['testing'] = submitform.testing
     context['open'] = task.task_open
@@ -602,19 +662,16 @@ def submit_run(request, *args, **kwargs):
     form_class = SubmitFormForm.get_form_class(context)
 
     if request.method == 'GET':
-        sff = form_class()
+        sff = form_class(context=context)
         context['gen_form'] = sff
         return render(request, template_name, context=context)
 
     elif request.method == 'POST':
-        form = form_class(request.POST, request.FILES)
+        form = form_class(request.POST, request.FILES, context=context)
         if form.is_valid():
             stuff = form.cleaned_data
-            org = (Organization.objects
-                   .filter(shortname=stuff['org'])
-                   .filter(members__pk=request.user.pk)
-                   .filter(conference=context['conf']))[0]
-            
+            org = [org for org in auth.orgs if org.shortname == stuff['org']][0]
+
             if context['track'].shortname == 'papers':
                 num_papers = (Submission.objects
                               .filter(task__track__conference=context['conf'])
@@ -634,25 +691,16 @@ def submit_run(request, *args, **kwargs):
                              has_evaluation=False
                              )
 
-            sub.save()
-
-            custom_fields = SubmitFormField.objects.filter(submit_form=context['form'])
-            for field in custom_fields:
-                if isinstance(stuff[field.meta_key], QuerySet):
-                    for thing in stuff[field.meta_key]:
-                        key = field.meta_key
-                        value = thing.shortname
-                        smeta = SubmitMeta(submission=sub,
-                                           form_field=field,
-                                           key=key,
-                                           value=value)
-                        smeta.save()
-                else:
-                    smeta = SubmitMeta(submission=sub, 
-                                       form_field=field,
-                                       key=field.meta_key,
-                                       value=stuff[field.meta_key])
-                    smeta.save()
+            custom_fields = list(SubmitFormField.objects.filter(submit_form=context['form']))
+            try:
+                with transaction.atomic():
+                    sub.save()
+                    SubmitMeta.objects.bulk_create(submit_metas(sub, custom_fields, stuff))
+            except ValidationError as e:
+                # Someone else took the runtag since the form was checked
+                form.add_error('runtag' if 'runtag' in form.fields else None, e)
+                context['gen_form'] = form
+                return render(request, template_name, context=context)
 
             if task.checker_file and task.checker_file != 'NONE':
                 run_check_script(sub, task.checker_file)
@@ -664,6 +712,41 @@ def submit_run(request, *args, **kwargs):
             return render(request, 'evalbase/submit.html', context=context)
 
 
+@evalbase_login_required
+@user_is_participant
+@require_http_methods(['GET'])
+def runtag_check(request, *args, **kwargs):
+    '''Whether the 'runtag' parameter can be used for a new run to this
+    conference, as JSON.  The submit form asks while the runtag is typed.'''
+    runtag = request.GET.get('runtag', '')
+    field = RuntagField(conference=kwargs['_conf'])
+    try:
+        field.clean(runtag)
+    except ValidationError as e:
+        return JsonResponse({'runtag': runtag, 'ok': False, 'errors': e.messages})
+    return JsonResponse({'runtag': runtag, 'ok': True, 'errors': []})
+
+
+def submit_metas(sub, fields, data):
+    '''The SubmitMetas for a submission's custom fields, from the cleaned
+    form data.  Tracks picked in a TRACKS checkbox get one each.'''
+    metas = []
+    for field in fields:
+        value = data[field.meta_key]
+        if isinstance(value, QuerySet):
+            metas.extend(SubmitMeta(submission=sub,
+                                    form_field=field,
+                                    key=field.meta_key,
+                                    value=thing.shortname)
+                         for thing in value)
+        else:
+            metas.append(SubmitMeta(submission=sub,
+                                    form_field=field,
+                                    key=field.meta_key,
+                                    value=value))
+    return metas
+
+
 def safe_parse_list(s):
     '''Database entries for checkbox values are lists, in Python format.
     Turn them into real lists of values, without using eval or
@@ -692,6 +775,7 @@ def edit_submission(request, *args, **kwargs):
     template_name = 'evalbase/edit.html'
 
     context = {}
+    auth = request_auth(request, kwargs)
     conf = kwargs['_conf']
     task = kwargs['_task']
     submitform = SubmitForm.objects.get(task=task)
@@ -701,19 +785,12 @@ def edit_submission(request, *args, **kwargs):
     context['track'] = task.track
     context['form'] = submitform
     context['user'] = request.user
-    context['orgs'] = (Organization.objects
-                       .filter(members__pk=request.user.pk)
-                       .filter(conference=conf))
+    context['orgs'] = auth.orgs
     context['mode'] = 'edit'
     form_class = SubmitFormForm.get_form_class(context)
 
-    run_list = (Submission.objects
-                .filter(submitted_by=request.user)
-                .filter(task__track__conference__shortname=kwargs['conf'])
-                .filter(runtag=kwargs['runtag']))
-    if run_list:
-        run = run_list[0]
-    else:
+    run = kwargs['_sub']
+    if run.submitted_by_id != request.user.pk:
         raise PermissionDenied("You don't have access to this run.")
 
     form_info = {'conf': conf,
@@ -723,45 +800,53 @@ def edit_submission(request, *args, **kwargs):
                  'email': run.submitted_by.email,
                  'runtag': run.runtag,
                  'runfile': run.file}
-    other_infos = SubmitMeta.objects.filter(submission=run)
+    other_infos = (SubmitMeta.objects
+                   .filter(submission=run)
+                   .select_related('form_field')
+                   .order_by('pk'))
     for run_meta in other_infos:
-        info_field = SubmitFormField.objects.filter(meta_key=run_meta.key)[0]
-        if info_field.question_type == SubmitFormField.QuestionType.CHECKBOX:
+        if run_meta.form_field.question_type == SubmitFormField.QuestionType.CHECKBOX:
             form_info[run_meta.key] = safe_parse_list(run_meta.value)
         else:
             form_info[run_meta.key] = run_meta.value
 
     if request.method == 'GET':
-        sff = form_class(form_info)
+        sff = form_class(form_info, context=context)
         context['gen_form'] = sff
         return render(request, template_name, context=context)
 
     elif request.method == 'POST':
-        form = form_class(request.POST)
+        form = form_class(request.POST, context=context)
         if form.is_valid():
             stuff = form.cleaned_data
-            run = (Submission.objects
-                   .filter(submitted_by_id=request.user.id)
-                   .filter(task__track__conference__shortname=kwargs['conf'])
-                   .filter(runtag=run.runtag)[0])
-            org = (Organization.objects
-                   .filter(members__pk=request.user.pk)
-                   .filter(shortname=stuff['org'])
-                   .filter(conference__shortname=kwargs['conf']))
+            org = [org for org in auth.orgs if org.shortname == stuff['org']]
             if not org:
                 raise Http404()
 
             run.org = org[0]
-            run.save()
 
-            custom_fields = SubmitFormField.objects.filter(submit_form=context['form'])
+            # Reuse the existing rows for each field, and add or remove
+            # rows where the number of values changed.
+            existing = collections.defaultdict(list)
+            for meta in other_infos:
+                existing[meta.key].append(meta)
+            changed, added, removed = [], [], []
+            custom_fields = list(SubmitFormField.objects.filter(submit_form=context['form']))
             for field in custom_fields:
-                original = (SubmitMeta.objects
-                            .filter(key=field.meta_key)
-                            .filter(submission_id=run.id)[0])
-                original.value = stuff[field.meta_key]
-                original.save()
-
+                new_metas = submit_metas(run, [field], stuff)
+                old_metas = existing.get(field.meta_key, [])
+                for old, new in zip(old_metas, new_metas):
+                    if old.value != str(new.value):
+                        old.value = new.value
+                        changed.append(old)
+                added.extend(new_metas[len(old_metas):])
+                removed.extend(old_metas[len(new_metas):])
+
+            with transaction.atomic():
+                run.save(update_fields=['org'])
+                SubmitMeta.objects.bulk_update(changed, ['value'])
+                SubmitMeta.objects.bulk_create(added)
+                SubmitMeta.objects.filter(pk__in=[m.pk for m in removed]).delete()
 
             return HttpResponseRedirect(reverse_lazy('run',
                                                      kwargs={'conf': conf,
@@ -793,39 +878,47 @@ def delete_submission(request, *args, **kwargs):
             reverse_lazy('tracks', kwargs={'conf': kwargs['conf']}))
 
 
-@evalbase_login_required
-@check_conf_and_task
-@require_http_methods(['GET'])
-def view_submission(request, *args, **kwargs):
-    '''View a submission.'''
-    template_name = 'evalbase/run.html'
+def _get_run(request, kwargs):
+    '''The Submission named in the URL, if the user may see it.'''
+    auth = request_auth(request, kwargs)
+    run = auth.sub
+    if run.task_id != auth.task.pk:
+        raise Http404('No such run')
 
-    context = {}
-    conf = get_object_or_404(Conference, shortname=kwargs['conf'])
-    run = Submission.objects.filter(runtag=kwargs['runtag']).filter(task__shortname=kwargs['task'])[0]
-
-    is_coord =             run.task.track.coordinators.filter(pk=request.user.pk)
+    is_coord = auth.is_coordinator(run.task.track)
     if not (request.user.is_staff or
-            request.user == run.submitted_by or
-            request.user == run.org.owner or
+            request.user.pk == run.submitted_by_id or
+            request.user.pk == run.org.owner_id or
             kwargs['_conf'].event_phase or
             is_coord):
         result = []
         if not request.user.is_staff:
             result.append('staff')
-        if not request.user == run.submitted_by:
+        if not request.user.pk == run.submitted_by_id:
             result.append('submitter')
-        if not request.user == run.org.owner:
+        if not request.user.pk == run.org.owner_id:
             result.append('org lead')
         if not is_coord:
             result.append('track coordinator')
         raise PermissionDenied(f'User is not one of [{", ".join(result)}]')
+    return run
+
+@evalbase_login_required
+@check_conf_and_task
+@require_http_methods(['GET'])
+def view_submission(request, *args, **kwargs):
+    '''View a submission.'''
+    template_name = 'evalbase/run.html'
+
+    context = {}
+    run = _get_run(request, kwargs)
 
     context['submission'] = run
     context['metas'] = (SubmitMeta.objects
-                        .filter(submission_id=run.id))
-    context['may_edit'] = (request.user == run.submitted_by or
-                           request.user == run.org.owner)
+                        .filter(submission_id=run.id)
+                        .select_related('form_field'))
+    context['may_edit'] = (request.user.pk == run.submitted_by_id or
+                           request.user.pk == run.org.owner_id)
     field_descs = {}
     for meta in context['metas']:
         field_descs[meta.key] = meta.form_field.question
@@ -835,35 +928,171 @@ def view_submission(request, *args, **kwargs):
     return render(request, template_name, context)
 
 
+@evalbase_login_required
+@check_conf_and_task
+@require_http_methods(['GET'])
+def run_status(request, *args, **kwargs):
+    '''The state of a submission's check as JSON, for the run page to poll.
+    See tasks.check_status.  The ETag lets unchanged statuses come back as
+    304s.'''
+    run = _get_run(request, kwargs)
+    body = json.dumps(check_status(run), sort_keys=True)
+    etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _byte_range(request, size, etag, last_modified):
+    '''The (start, end) of the byte range requested, inclusive, or None for
+    the whole file.  Only single ranges are supported; anything else gets the
+    whole file.  Raises ValueError if the range can't be satisfied.'''
+    range_header = request.headers.get('Range')
+    if not range_header:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        # The file has changed since the client got the first part
+        return None
+
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', range_header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    if match.group(1) == '':
+        # The last N bytes
+        start, end = max(size - int(match.group(2)), 0), size - 1
+        if int(match.group(2)) == 0:
+            raise ValueError(range_header)
+    else:
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    if start > end or start >= size:
+        raise ValueError(range_header)
+    return start, end
+
+def _read_range(path, start, length, chunk_size=1 << 16):
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        while length > 0:
+            chunk = fp.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def file_response(request, path, content_type, filename=None):
+    '''Respond with the file at path.  This answers conditional GETs
+    (ETag, Last-Modified) and single byte-range requests.
+
+    If settings.SENDFILE_HEADER is set, the file itself is sent by the front
+    end (uWSGI's offload threads or Apache's mod_xsendfile): the response just
+    carries the file's path in that header.  Otherwise Django streams it.'''
+    stat = os.stat(path)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    last_modified = int(stat.st_mtime)
+    headers = {'ETag': etag,
+               'Last-Modified': http_date(last_modified),
+               'Accept-Ranges': 'bytes'}
+    if filename:
+        headers['Content-Disposition'] = f'inline; filename="{filename}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        for header in ('ETag', 'Last-Modified'):
+            response.headers[header] = headers[header]
+        return response
+
+    if settings.SENDFILE_HEADER:
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response[settings.SENDFILE_HEADER] = str(path)
+        return response
+
+    try:
+        byte_range = _byte_range(request, stat.st_size, etag, last_modified)
+    except ValueError:
+        return HttpResponse(status=416,
+                            headers={'Content-Range': f'bytes */{stat.st_size}'})
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1),
+                                         status=206,
+                                         content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+def _get_eval(request, kwargs):
+    '''The Evaluation named in the URL, if the user may see it.'''
+    run = _get_run(request, kwargs)
+
+    eval = run.evaluation_set.filter(name=kwargs['eval']).first()
+    if eval is None:
+        raise Http404
+    return eval
+
 @evalbase_login_required
 @check_conf_and_task
 @require_http_methods(['GET'])
 def view_eval(request, *args, **kwargs):
     '''View an evaluation score output.'''
-    run = Submission.objects.filter(runtag=kwargs['runtag']).filter(task__shortname=kwargs['task'])[0]
+    eval = _get_eval(request, kwargs)
+    return file_response(request, eval.filename.path, 'text/plain')
 
-    is_coord = run.task.track.coordinators.filter(pk=request.user.pk)
-    if not (request.user.is_staff or
-            request.user == run.submitted_by or
-            request.user == run.org.owner or
-            kwargs['_conf'].event_phase or
-            is_coord):
-        result = []
-        if not request.user.is_staff:
-            result.append('staff')
-        if not request.user == run.submitted_by:
-            result.append('submitter')
-        if not request.user == run.org.owner:
-            result.append('org lead')
-        if not is_coord:
-            result.append('track coordinator')
-        raise PermissionDenied(f'User is not one of [{", ".join(result)}]')
 
-    eval = run.evaluation_set.filter(name=kwargs['eval'])[0]
-    with open(eval.filename.path, 'r') as eval_fp:
-        eval_txt = eval_fp.read()
-    return HttpResponse(eval_txt,
-                        headers={'Content-Type': 'text/plain'})
+# lines per page in eval_lines, and the most that can be asked for
+EVAL_PAGE_SIZE = 100
+EVAL_MAX_PAGE_SIZE = 1000
+
+@evalbase_login_required
+@check_conf_and_task
+@require_http_methods(['GET'])
+def eval_viewer(request, *args, **kwargs):
+    '''Page through an evaluation output.  The lines come from eval_lines.'''
+    template_name = 'evalbase/eval-viewer.html'
+    eval = _get_eval(request, kwargs)
+    context = {
+        'eval': eval,
+        'conf': kwargs['_conf'],
+        'task': kwargs['_task'],
+        'page_size': EVAL_PAGE_SIZE,
+    }
+    return render(request, template_name, context=context)
+
+
+@evalbase_login_required
+@check_conf_and_task
+@require_http_methods(['GET'])
+def eval_lines(request, *args, **kwargs):
+    '''A page of lines from an evaluation output, as JSON.  The lines can
+    be limited to a measure and/or a topic with the 'measure' and 'topic'
+    parameters.  'page' is the page number and 'size' the lines per page.'''
+    eval = _get_eval(request, kwargs)
+    index = eval.line_index()
+
+    try:
+        size = min(int(request.GET.get('size', EVAL_PAGE_SIZE)), EVAL_MAX_PAGE_SIZE)
+    except ValueError:
+        size = EVAL_PAGE_SIZE
+    selected = index.select(measure=request.GET.get('measure') or None,
+                            topic=request.GET.get('topic') or None)
+    page = Paginator(selected, max(size, 1)).get_page(request.GET.get('page'))
+
+    return JsonResponse({
+        'measures': index.measures,
+        'topics': index.topics,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'num_lines': page.paginator.count,
+        'first_line': int(page.object_list[0]) + 1 if len(page.object_list) else None,
+        'lines': index.read_lines(eval.filename.path, page.object_list),
+    })
 
 
 @evalbase_login_required
@@ -884,22 +1113,47 @@ def download_all_my_evals(request, *args, **kwargs):
     if not evals.exists():
         raise Http404
 
-    with tempfile.SpooledTemporaryFile() as tmp:
-        with zipfile.ZipFile(tmp, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
-            for e in evals:
-                zipf.write(e.filename.path, 
-                           arcname=f'{e.submission.runtag}.{e.name}')
-            for s in StatsFile.objects.filter(task=task):
-                zipf.write(s.filename.path, 
-                           arcname=f'{s.task.shortname}.{s.name}')
-            zipf.close()
-
-        tmp.flush()
-        tmp.seek(0)
-        data = tmp.read()
-        return HttpResponse(content=data,
-                            headers={'Content-Type': 'application/zip',
-                                     'Content-Disposition': 'attachment; filename=evals.zip'})
+    files = [(e.filename.path, f'{e.submission.runtag}.{e.name}')
+             for e in evals]
+    files += [(s.filename.path, f'{s.task.shortname}.{s.name}')
+              for s in StatsFile.objects.filter(task=task)]
+
+    # The archive is compressed and sent as it's written, rather than
+    # built in memory first.
+    return StreamingHttpResponse(stream_zip(files),
+                                 headers={'Content-Type': 'application/zip',
+                                          'Content-Disposition': 'attachment; filename=evals.zip'})
+
+def appendix_means(appendix, evals):
+    '''The mean scores for an appendix, as a DataFrame with a row per runtag
+    and a column per measure, sorted on the appendix's sort column (numerically,
+    best first).  Also returns the runs' ranks on the sort column (or None if
+    there isn't one) and their orgs' shortnames, as Series indexed by runtag.'''
+    score_rows = (Score.objects
+                  .filter(evaluation__in=evals, topic=None)
+                  .order_by('pk')
+                  .values_list('evaluation__submission__runtag',
+                               'evaluation__submission__org__shortname',
+                               'measure', 'value'))
+    if appendix.measures != "all":
+        score_rows = score_rows.filter(measure__in=appendix.measures)
+    scores = pd.DataFrame.from_records(list(score_rows),
+                                       columns=['runtag', 'org', 'measure', 'value'])
+
+    if appendix.measures == "all":
+        measures = list(scores['measure'].unique())
+    else:
+        measures = list(appendix.measures)
+    means = (scores
+             .pivot_table(index='runtag', columns='measure', values='value', aggfunc='last', sort=False)
+             .reindex(columns=measures))
+    orgs = scores.groupby('runtag', sort=False)['org'].first()
+
+    ranks = None
+    if appendix.sort_column and appendix.sort_column in means:
+        ranks = means[appendix.sort_column].rank(ascending=False, method='min')
+        means = means.sort_values(appendix.sort_column, ascending=False, na_position='last', kind='stable')
+    return means, ranks, orgs
 
 @evalbase_login_required
 @check_conf_and_task
@@ -918,53 +1172,36 @@ def show_appendix(request, *args, **kwargs):
     if appendix.queryset_field and appendix.queryset_qtype and appendix.queryset_target:
         filter = appendix.queryset_field + '__' + appendix.queryset_qtype
         evals = evals.filter(**{filter: appendix.queryset_target})
-    means = collections.defaultdict(dict)
-    scores = infinite_defaultdict()
-    runs = {}
-    if appendix.measures == "all":
-        measures = {}
-    else:
-        measures = { m: 0 for m in appendix.measures }
-        
-    for eval in evals:
-        runs[eval.submission.runtag] = eval.submission.org
-        with open(eval.filename.path, 'r') as eval_file:
-            for line in eval_file:
-                # assumes a trec_eval format file
-                fields = line.strip().split()
-                measure = fields[appendix.measure_name_field]
-                topic = fields[appendix.topic_field]
-                score = fields[appendix.score_field]
-                if measure == 'runid':
-                    continue
-                if topic == appendix.average_topic:
-                    if appendix.measures == 'all':
-                        means[eval.submission.runtag][measure] = score
-                        measures[measure] = 1
-                    elif measure in measures:
-                        means[eval.submission.runtag][measure] = score
-                else:
-                    if appendix.measures == 'all':
-                        scores[eval.submission.runtag][measure][topic] = score
-                        measures[measure] = 1
-                    elif measure in measures:
-                        scores[eval.submission.runtag][measure][topic] = score
-            for measure in measures:
-                if measure not in means[eval.submission.runtag]:
-                    sum_score = sum([float(s) for s in scores[eval.submission.runtag][measure].values()])
-                    avg = sum_score / len(scores[eval.submission.runtag][measure])
-                    means[eval.submission.runtag][measure] = f'{avg:6.4f}'
-    if appendix.sort_column and appendix.sort_column in measures:
-        sorted_keys = sorted(means, 
-                             key=lambda x: means[x][appendix.sort_column], 
-                             reverse=True)
-        tmp_dict = { runtag: means[runtag] for runtag in sorted_keys }
-        means = tmp_dict
-        
+    # Scores are parsed when an eval is imported; catch up on any that
+    # haven't been, or were dropped because the appendix changed.
+    for eval in evals.filter(scores_loaded__isnull=True):
+        if eval.scores_stale():
+            eval.load_scores()
+
+    # The table only changes when evals are added, removed or parsed again
+    # (editing the appendix has them parsed again).  The cache holds one
+    # table per appendix, with the version it was made from.
+    latest = evals.aggregate(count=Count('pk'), loaded=Max('scores_loaded'))
+    version = (latest['count'], latest['loaded'])
+    cache_key = f'appendix:{appendix.pk}:{kwargs.get("name", "")}'
+    cached_version, table = cache.get(cache_key, (None, None))
+    if cached_version != version:
+        means, ranks, orgs = appendix_means(appendix, evals)
+        rows = []
+        for runtag, vals in means.iterrows():
+            rank = '' if ranks is None or pd.isna(ranks[runtag]) else int(ranks[runtag])
+            rows.append((runtag, orgs[runtag], rank,
+                         ['' if pd.isna(v) else f'{v:6.4f}' for v in vals]))
+        table = render_to_string('evalbase/appendix-table.html',
+                                 context={'measures': list(means.columns),
+                                          'ranked': ranks is not None,
+                                          'rows': rows,
+                                          'conf': kwargs['_conf'],
+                                          'task': kwargs['_task']})
+        cache.set(cache_key, (version, table), timeout=None)
+
     context = {}
-    context['scores'] = dict(means)
-    context['runs'] = runs
-    context['measures'] = measures.keys()
+    context['table'] = table
     context['task'] = kwargs['_task']
     context['conf'] = kwargs['_conf']
     context['name'] = appendix.name
@@ -976,29 +1213,53 @@ def show_appendix(request, *args, **kwargs):
 @require_http_methods(['GET'])
 def download_submission_file(request, *args, **kwargs):
     '''Get the actual submitted run.'''
-    run = Submission.objects.filter(runtag=kwargs['runtag']).filter(task__shortname=kwargs['task'])[0]
+    auth = request_auth(request, kwargs)
+    run = auth.sub
+    if run.task_id != auth.task.pk:
+        raise Http404('No such run')
 
-    is_coord = run.task.track.coordinators.filter(pk=request.user.pk)
+    is_coord = auth.is_coordinator(run.task.track)
     if not (request.user.is_staff or
-            request.user == run.submitted_by or
-            request.user == run.org.owner or
+            request.user.pk == run.submitted_by_id or
+            request.user.pk == run.org.owner_id or
             is_coord):
         result = []
         if not request.user.is_staff:
             result.append('staff')
-        if not request.user == run.submitted_by:
+        if not request.user.pk == run.submitted_by_id:
             result.append('submitter')
-        if not request.user == run.org.owner:
+        if not request.user.pk == run.org.owner_id:
             result.append('org lead')
         if not is_coord:
             result.append('track coordinator')
         raise PermissionDenied(f'User is not one of [{", ".join(result)}]')
 
-    with open(run.file.path, 'rb') as run_fp:
-        run_content = run_fp.read()
-    return HttpResponse(run_content,
-                        headers={'Content-Type': 'application/octet-stream',
-                                 'Content-Disposition': f'inline; filename="{run.runtag}'})
+    return file_response(request, run.file.path, 'application/octet-stream',
+                         filename=run.runtag)
+
+
+# Runs per page in the list of all submissions to a task
+RUNS_PAGE_SIZE = 100
+
+# Columns of the submissions list that sort on a Submission field
+RUN_SORT_FIELDS = {
+    'runtag': 'runtag',
+    'org': 'org__shortname',
+    'date': 'date',
+}
+
+def run_meta_table(run_ids):
+    '''The metadata of the given runs as a table, {run pk: {key: value}}, from
+    one query.  Fields with several values (checkboxes) are joined with commas.'''
+    table = collections.defaultdict(dict)
+    metas = (SubmitMeta.objects
+             .filter(submission__in=run_ids)
+             .order_by('pk')
+             .values_list('submission_id', 'key', 'value'))
+    for run_id, key, value in metas:
+        row = table[run_id]
+        row[key] = f'{row[key]}, {value}' if key in row else value
+    return table
 
 
 @evalbase_login_required
@@ -1006,24 +1267,57 @@ def download_submission_file(request, *args, **kwargs):
 @check_conf_and_task
 @require_http_methods(['GET'])
 def list_submissions(request, *args, **kwargs):
-    '''List all submissions to a task.'''
+    '''List all submissions to a task, a page at a time.  'sort' is a
+    column, runtag, org, date or a metadata key, with a leading '-' to
+    sort descending, and 'page' is the page number.'''
     template_name = 'evalbase/all_runs.html'
+    task = kwargs['_task']
 
-    runs = (Submission.objects
-        .filter(task=kwargs['_task'])
-        .filter(task__track__conference=kwargs['_conf']))
+    keys = []
+    for key in (SubmitFormField.objects
+                .filter(submit_form__task=task)
+                .order_by('sequence')
+                .values_list('meta_key', flat=True)):
+        if key not in keys:
+            keys.append(key)
 
-    run_meta = collections.defaultdict(dict)
-    metas = (SubmitMeta.objects
-        .filter(submission__task__track__conference=kwargs['_conf'])
-        .filter(submission__task=kwargs['_task']))
-    for m in metas:
-        run_meta[m.submission.runtag][m.key] = m.value
+    runs = (Submission.objects
+            .filter(task=task)
+            .filter(task__track__conference=kwargs['_conf'])
+            .select_related('org'))
+
+    sort = request.GET.get('sort', 'runtag')
+    column = sort.removeprefix('-')
+    if column in RUN_SORT_FIELDS:
+        order = F(RUN_SORT_FIELDS[column])
+    elif column in keys:
+        runs = runs.annotate(sort_value=Subquery(
+            SubmitMeta.objects
+            .filter(submission=OuterRef('pk'), key=column)
+            .order_by('pk')
+            .values('value')[:1]))
+        order = F('sort_value')
+    else:
+        sort = column = 'runtag'
+        order = F('runtag')
+    order = order.desc(nulls_last=True) if sort.startswith('-') else order.asc(nulls_last=True)
+    runs = runs.order_by(order, 'pk')
+
+    page = Paginator(runs, RUNS_PAGE_SIZE).get_page(request.GET.get('page'))
+    page_runs = list(page.object_list)
+    metas = run_meta_table([run.pk for run in page_runs])
+    # metadata from fields no longer on the form goes at the end
+    keys += sorted({k for row in metas.values() for k in row} - set(keys))
+    rows = [(run, [metas[run.pk].get(key, '') for key in keys])
+            for run in page_runs]
 
     return render(request, template_name, {
         'conf': kwargs['_conf'],
-        'runs': runs,
-        'metas': run_meta})
+        'task': task,
+        'keys': keys,
+        'rows': rows,
+        'page': page,
+        'sort': sort})
 
 def _user_is_staff(user):
     return user.is_staff
@@ -3,5 +3,9 @@
 cd evalbase
 nohup python manage.py run_huey > huey.log 2>&1 &
 echo $! > huey.pid 
+for queue in `python manage.py run_checkers list`; do
+    nohup python manage.py run_checkers $queue > checkers-$queue.log 2>&1 &
+    echo $! > checkers-$queue.pid
+done
 nohup uwsgi --http localhost:5000 --py-auto-reload --ini uwsgi.ini > uwsgi.out 2>&1 &
 
@@ -10,7 +10,17 @@ nohup python passage_validator_servicer.py files/ikat_2023_passages_hashes.sqlit
 echo $! > ../../ikat-validator.pid
 cd ../..
 
+# For check-biogen-driver.sh
+cd checkers
+nohup python -m trec_biogen_validator.service aux/pubmed_ids_last_20_years.json.gz aux/BioGen2024topics-json.txt -s biogen-validator.sock > ../biogen-validator.log 2>&1 &
+echo $! > ../biogen-validator.pid
+cd ..
+
 nohup python manage.py run_huey > huey.log 2>&1 &
 echo $! > huey.pid 
+for queue in `python manage.py run_checkers list`; do
+    nohup python manage.py run_checkers $queue > checkers-$queue.log 2>&1 &
+    echo $! > checkers-$queue.pid
+done
 nohup uwsgi --ini uwsgi.ini > uwsgi.out 2>&1 &
 
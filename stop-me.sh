@@ -3,4 +3,8 @@ SCRIPT_DIR=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
 
 kill -9 `cat $SCRIPT_DIR/evalbase/uwsgi.pid`
 kill -9 `cat $SCRIPT_DIR/evalbase/huey.pid`
+for pidfile in $SCRIPT_DIR/evalbase/checkers-*.pid; do
+    kill `cat $pidfile`
+done
 kill -9 `cat $SCRIPT_DIR/evalbase/ikat-validator.pid`
+kill `cat $SCRIPT_DIR/evalbase/biogen-validator.pid`